@@ -0,0 +1,114 @@
+"""
+Mesure de la contribution du plugin au démarrage d'un processus Pretix (import time)
+
+Lance plusieurs fois `python -X importtime` sur django.setup() (qui importe le plugin et
+exécute SortirPluginConfig.ready()), puis additionne le temps cumulé des imports de
+premier niveau du plugin (pretix_sortir.*, avec les dépendances qu'ils chargent en
+premier). Signale aussi les dépendances lourdes importées par le plugin au démarrage,
+qui doivent rester chargées au premier usage (requests, urllib3, cryptography).
+
+Usage (dans l'environnement Pretix) :
+    DJANGO_SETTINGS_MODULE=pretix.settings python benchmarks/bench_import_time.py [--repeat=5] [--budget-ms=0]
+
+Avec --budget-ms, le code de retour est 1 si la médiane dépasse le budget (CI).
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+PLUGIN_PACKAGE = 'pretix_sortir'
+LAZY_DEPENDENCIES = ('requests', 'urllib3', 'cryptography')
+
+CHILD_CODE = 'import django; django.setup()'
+
+
+def parse_importtime(stderr):
+    """
+    Arbre des imports de -X importtime : [(module, cumul µs, enfants)].
+
+    Chaque module est écrit après ses sous-imports, indenté de 2 espaces par niveau :
+    les enfants d'une ligne sont les lignes précédentes plus profondes.
+    """
+    pending = []  # (profondeur, nœud)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _self_us, cumulative_us, name = line.split('|')
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip(' '))) // 2
+        children = []
+        while pending and pending[-1][0] > depth:
+            children.insert(0, pending.pop()[1])
+        pending.append((depth, (name.strip(), int(cumulative_us), children)))
+    return [node for _depth, node in pending]
+
+
+def plugin_contribution(roots):
+    """Temps cumulé des imports du plugin les plus hauts, et dépendances lourdes chargées dessous"""
+    total_us = 0
+    heavy = set()
+
+    def walk(node, in_plugin):
+        nonlocal total_us
+        module, cumulative_us, children = node
+        package = module.split('.')[0]
+        if package == PLUGIN_PACKAGE and not in_plugin:
+            # Les imports du plugin imbriqués sont compris dans ce temps cumulé
+            total_us += cumulative_us
+            in_plugin = True
+        if in_plugin and package in LAZY_DEPENDENCIES:
+            heavy.add(package)
+        for child in children:
+            walk(child, in_plugin)
+
+    for root in roots:
+        walk(root, False)
+    return total_us, heavy
+
+
+def run_once(python):
+    result = subprocess.run(
+        [python, '-X', 'importtime', '-c', CHILD_CODE],
+        capture_output=True, text=True, env=os.environ.copy(),
+    )
+    if result.returncode != 0:
+        sys.exit(f'django.setup() a échoué :\n{result.stderr[-2000:]}')
+    return plugin_contribution(parse_importtime(result.stderr))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=0, help='Budget de la médiane en ms (0 = aucun)')
+    parser.add_argument('--python', default=sys.executable)
+    args = parser.parse_args()
+
+    if not os.environ.get('DJANGO_SETTINGS_MODULE'):
+        os.environ['DJANGO_SETTINGS_MODULE'] = 'pretix.settings'
+
+    timings = []
+    heavy = set()
+    for _ in range(max(args.repeat, 1)):
+        total_us, loaded = run_once(args.python)
+        timings.append(total_us / 1000)
+        heavy |= loaded
+
+    median_ms = statistics.median(timings)
+    print(f'{PLUGIN_PACKAGE} au démarrage (django.setup, {len(timings)} mesures)')
+    print(f'  médiane : {median_ms:.1f} ms   min : {min(timings):.1f} ms   max : {max(timings):.1f} ms')
+    if heavy:
+        print(f'  dépendances importées par le plugin au démarrage : {", ".join(sorted(heavy))}')
+    else:
+        print(f'  aucune de {", ".join(LAZY_DEPENDENCIES)} importée par le plugin au démarrage')
+
+    if args.budget_ms and median_ms > args.budget_ms:
+        print(f'  budget dépassé : {median_ms:.1f} ms > {args.budget_ms:.1f} ms')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -16,22 +16,23 @@ from enum import Enum
 from typing import Dict, Optional, Tuple, Union
 from urllib.parse import urljoin
 
-import requests
 from django.core.cache import cache
 from django.utils.translation import gettext_lazy as _
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 
 
 logger = logging.getLogger('pretix.plugins.sortir')
 
 # Applique les filtres de redaction des logs (Sécurité)
+from .assets import namespaced_key
+from .logevents import get_event_logger
 from .logging_filters import SensitiveDataFilter, SortirSecurityFilter
 if not any(isinstance(f, SensitiveDataFilter) for f in logger.filters):
     logger.addFilter(SensitiveDataFilter())
 if not any(isinstance(f, SortirSecurityFilter) for f in logger.filters):
     logger.addFilter(SortirSecurityFilter())
 
+event_log = get_event_logger()
+
 
 class APRASErrorCode(Enum):
     """Codes d'erreur de l'API APRAS."""
@@ -93,6 +94,11 @@ class APRASClient:
             token: Token d'authentification fourni par l'APRAS
             timeout: Timeout en secondes pour les appels API
         """
+        # Importés au premier client : les processus sans appel APRAS ne chargent pas requests
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
         self.base_url = base_url.rstrip('/')
         self.token = token
         self.timeout = timeout
@@ -121,7 +127,7 @@ class APRASClient:
         """Génère une clé de cache pour un numéro de carte."""
         # Utilise seulement les 4 derniers chiffres pour la clé
         suffix = card_number[-4:] if len(card_number) >= 4 else card_number
-        return f"sortir_api_404_{suffix}"
+        return namespaced_key(f"sortir_api_404_{suffix}")
 
     def _is_circuit_breaker_open(self) -> bool:
         """Vérifie si le circuit breaker est ouvert (API down)."""
@@ -130,7 +136,7 @@ class APRASClient:
     def _open_circuit_breaker(self):
         """Ouvre le circuit breaker pour 5 minutes."""
         cache.set('sortir_api_circuit_breaker', True, 300)
-        logger.error("Circuit breaker ouvert - API APRAS indisponible")
+        event_log.error('apras_circuit_open')
 
     def _close_circuit_breaker(self):
         """Ferme le circuit breaker."""
@@ -151,6 +157,8 @@ class APRASClient:
         Returns:
             Tuple (succès, ServiceKey ou message d'erreur)
         """
+        import requests
+
         # Validation format
         if not card_number or not card_number.isdigit() or len(card_number) != 10:
             return False, _("Numéro de carte invalide (10 chiffres requis)")
@@ -169,7 +177,7 @@ class APRASClient:
         url = urljoin(self.base_url, f'/api/partners/{card_number}')
 
         try:
-            logger.info(f"Vérification droits Sortir! pour carte ***{card_number[-4:]}")
+            event_log.info('apras_check', card=card_number)
             response = self.session.get(url, timeout=self.timeout)
 
             if response.status_code == APRASErrorCode.SUCCESS.value:
@@ -186,12 +194,12 @@ class APRASClient:
                     card_number_suffix=card_number[-4:]
                 )
 
-                logger.info(f"Droits valides pour carte ***{card_number[-4:]} - service_key reçu: {len(service_key_value)} caractères")
+                event_log.info('apras_rights_valid', card=card_number, service_key_length=len(service_key_value))
                 return True, service_key
 
             elif response.status_code == APRASErrorCode.UNAUTHORIZED.value:
                 error_msg = _("Token API invalide ou manquant")
-                logger.error(f"Erreur auth API: {error_msg}")
+                event_log.error('apras_auth_error', error=error_msg)
                 self._open_circuit_breaker()
                 return False, error_msg
 
@@ -203,25 +211,25 @@ class APRASClient:
             elif response.status_code == APRASErrorCode.NOT_FOUND.value:
                 error_msg = _("Numéro de carte inconnu ou droits expirés")
                 cache.set(cache_key, error_msg, 300)  # Cache 5 min
-                logger.info(f"Carte invalide: ***{card_number[-4:]}")
+                event_log.info('apras_card_invalid', card=card_number)
                 return False, error_msg
 
             else:
                 error_msg = _("Erreur lors de la vérification")
-                logger.error(f"Code retour inattendu: {response.status_code}")
+                event_log.error('apras_unexpected_status', status=response.status_code)
                 return False, error_msg
 
         except requests.Timeout:
-            logger.error("Timeout lors de l'appel API APRAS")
+            event_log.error('apras_timeout', call='check')
             return False, _("Délai d'attente dépassé. Veuillez réessayer.")
 
         except requests.ConnectionError:
-            logger.error("Erreur de connexion à l'API APRAS")
+            event_log.error('apras_connection_error', call='check')
             self._open_circuit_breaker()
             return False, _("Impossible de contacter le service. Veuillez réessayer plus tard.")
 
         except Exception as e:
-            logger.exception(f"Erreur inattendue: {e}")
+            event_log.exception('apras_unexpected_error', call='check', error=e)
             return False, _("Une erreur inattendue s'est produite")
 
     def post_grant(self, service_key: str, activite_id: Optional[int] = None) -> Tuple[bool, Union[GrantResponse, str]]:
@@ -235,13 +243,15 @@ class APRASClient:
         Returns:
             Tuple (succès, GrantResponse ou message d'erreur)
         """
+        import requests
+
         if not service_key:
             return False, _("Clé de service manquante")
 
         # Vérification circuit breaker
         if self._is_circuit_breaker_open():
             # En cas de circuit breaker ouvert, on met en queue pour retry
-            logger.warning("Circuit breaker ouvert - mise en queue de la demande")
+            event_log.warning('apras_circuit_open', call='grant')
             return False, _("Demande mise en attente - sera traitée ultérieurement")
 
         url = urljoin(self.base_url, '/api/partners/grant')
@@ -253,7 +263,7 @@ class APRASClient:
             payload['activite'] = activite_id
 
         try:
-            logger.info("Envoi demande grant à l'API APRAS")
+            event_log.info('apras_grant_send')
             response = self.session.post(
                 url,
                 json=payload,
@@ -274,7 +284,7 @@ class APRASClient:
                     aide_additionnelle=data.get('aide_additionnelle', 0)
                 )
 
-                logger.info(f"Demande grant enregistrée avec succès: ID={grant.id}")
+                event_log.info('apras_grant_accepted', grant=grant.id)
                 return True, grant
 
             elif response.status_code == APRASErrorCode.BAD_REQUEST.value:
@@ -285,20 +295,20 @@ class APRASClient:
                 return False, _("Erreur d'authentification")
 
             else:
-                logger.error(f"Erreur grant: code {response.status_code}")
+                event_log.error('apras_unexpected_status', call='grant', status=response.status_code)
                 return False, _("Erreur lors de l'enregistrement de la demande")
 
         except requests.Timeout:
-            logger.error("Timeout lors du POST grant")
+            event_log.error('apras_timeout', call='grant')
             return False, _("Délai dépassé - demande mise en attente")
 
         except requests.ConnectionError:
-            logger.error("Erreur connexion lors du POST grant")
+            event_log.error('apras_connection_error', call='grant')
             self._open_circuit_breaker()
             return False, _("Erreur de connexion - demande mise en attente")
 
         except Exception as e:
-            logger.exception(f"Erreur inattendue grant: {e}")
+            event_log.exception('apras_unexpected_error', call='grant', error=e)
             return False, _("Erreur inattendue")
 
 
@@ -312,4 +322,4 @@ def get_inscrit_info(card_suffix: str) -> Optional[InscritInfo]:
     Returns:
         InscritInfo ou None
     """
-    return cache.get(f"sortir_inscrit_{card_suffix}")
\ No newline at end of file
+    return cache.get(namespaced_key(f"sortir_inscrit_{card_suffix}"))
\ No newline at end of file
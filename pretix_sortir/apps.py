@@ -42,78 +42,22 @@ class SortirPluginConfig(PluginConfig):
         SortirEventSettings.objects.get_or_create(event=event, defaults={'enabled': False})
 
     def ready(self):
-        """Appelé quand Django est prêt et le plugin chargé."""
+        """
+        Appelé quand Django est prêt et le plugin chargé.
+
+        Aucun accès à la base ni au cache ici (exécuté au démarrage de chaque worker) :
+        l'activation de l'API est faite par migration, la publication des assets par
+        sortir_publish_assets.
+        """
         from . import signals  # noqa: F401
         from . import navigation  # noqa: F401
+        from . import tasks  # noqa: F401
 
         super().ready()
 
-        # Auto-activation de l'API si le plugin est installé
-        self._auto_enable_api()
-
-        # Auto-collectstatic au démarrage pour s'assurer que les assets sont à jour
-        # Ceci est exécuté une seule fois au démarrage de Pretix
-        import os
-        import logging
-        from django.core.management import call_command
-        from django.core.cache import cache
-
-        logger = logging.getLogger(__name__)
-
-        # Variable d'environnement pour désactiver si besoin (ex: en dev)
-        if os.environ.get('SORTIR_SKIP_AUTOCOLLECT') != '1':
-            try:
-                # Vérifier si on doit faire un collectstatic
-                # On utilise un flag en cache pour éviter de le faire plusieurs fois
-                cache_key = f'sortir_collectstatic_v{self.PretixPluginMeta.version}'
-
-                if not cache.get(cache_key):
-                    logger.info('[Sortir] Running collectstatic for updated assets...')
-                    call_command('collectstatic', '--noinput', verbosity=0)
-
-                    # Vider le cache pour forcer le rechargement des assets
-                    # Seulement les clés liées à sortir pour ne pas impacter tout Pretix
-                    for key in cache.keys('*sortir*'):
-                        cache.delete(key)
-
-                    # Marquer comme fait pour cette version (expire après 24h)
-                    cache.set(cache_key, True, 86400)
-                    logger.info('[Sortir] Collectstatic completed successfully')
-                else:
-                    logger.debug('[Sortir] Collectstatic already done for this version')
-
-            except Exception as e:
-                # Ne pas faire planter Pretix si le collectstatic échoue
-                logger.warning(f'[Sortir] Could not run collectstatic: {e}')
-
-    def _auto_enable_api(self):
-        """Active automatiquement l'API pour les organisateurs qui ont le plugin."""
-        try:
-            from django.db import connection
-            from .models import SortirOrganizerSettings
-
-            # Vérifier que les tables existent
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT EXISTS (
-                        SELECT FROM information_schema.tables
-                        WHERE table_name = 'pretix_sortir_sortirorganizersettings'
-                    );
-                """)
-                if not cursor.fetchone()[0]:
-                    return  # Table n'existe pas encore
-
-            # Activer l'API pour tous les organisateurs qui ont le plugin mais API désactivée
-            updated = SortirOrganizerSettings.objects.filter(api_enabled=False).update(api_enabled=True)
-
-            if updated > 0:
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.info(f'[Sortir] API automatiquement activée pour {updated} organisateur(s)')
-
-        except Exception:
-            # Silencieusement ignorer les erreurs (peut arriver pendant les migrations)
-            pass
+        # Écriture des logs du plugin par un thread dédié (SORTIR_LOG_QUEUE)
+        from .logqueue import install_queue_logging
+        install_queue_logging()
 
 
 default_app_config = 'pretix_sortir.SortirPluginConfig'
\ No newline at end of file
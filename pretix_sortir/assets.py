@@ -0,0 +1,85 @@
+"""
+Assets statiques du plugin Sortir! et espace de noms de ses clés de cache
+
+Les assets sont publiés par une étape explicite de build/déploiement :
+
+    python -m pretix sortir_publish_assets [--collect] [--bump-cache]
+
+qui écrit le manifeste versionné static/pretix_sortir/manifest.json :
+
+    {"version": "3f2a9c1e0b7d", "namespace": 4, "files": {"sortir.js": "a1b2c3d4e5f6", ...}}
+
+- files : empreinte du contenu de chaque asset, utilisée comme paramètre ?v= des URLs
+  (le navigateur ne recharge un fichier que s'il a changé) ;
+- namespace : numéro inclus dans les clés de cache du plugin (namespaced_key), incrémenté
+  quand un asset change ou avec --bump-cache. Les anciennes clés ne sont plus lues et
+  expirent d'elles-mêmes : aucune suppression, aucun parcours des clés du cache.
+
+Le manifeste est lu une fois par processus, au premier usage (jamais au démarrage).
+"""
+
+import functools
+import hashlib
+import json
+import os
+
+ASSET_DIR = os.path.join(os.path.dirname(__file__), 'static', 'pretix_sortir')
+MANIFEST_PATH = os.path.join(ASSET_DIR, 'manifest.json')
+ASSETS = ('sortir.css', 'sortir.js')
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def read_manifest():
+    """Manifeste publié, ou None s'il n'existe pas"""
+    try:
+        with open(MANIFEST_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def build_manifest(previous=None, bump=False):
+    """
+    Calcule le manifeste des assets actuels.
+
+    Le namespace du manifeste précédent est conservé si aucun asset n'a changé
+    (publication idempotente), incrémenté sinon ou si bump est demandé.
+    """
+    files = {name: _file_hash(os.path.join(ASSET_DIR, name)) for name in ASSETS}
+    version = hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()[:12]
+
+    namespace = previous.get('namespace', 0) if previous else 0
+    if bump or not previous or previous.get('version') != version:
+        namespace += 1
+    return {'version': version, 'namespace': namespace, 'files': files}
+
+
+def write_manifest(manifest):
+    tmp_path = f'{MANIFEST_PATH}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+@functools.lru_cache(maxsize=None)
+def get_manifest():
+    """Manifeste du processus (lu une seule fois) ; calculé en mémoire s'il n'a pas été publié"""
+    return read_manifest() or build_manifest()
+
+
+def asset_url(name):
+    """URL statique de l'asset, avec l'empreinte de son contenu comme cache buster"""
+    from django.templatetags.static import static
+
+    manifest = get_manifest()
+    return f"{static(f'pretix_sortir/{name}')}?v={manifest['files'].get(name, manifest['version'])}"
+
+
+def namespaced_key(key):
+    """Clé de cache dans l'espace de noms courant du plugin"""
+    return f"sortir:{get_manifest()['namespace']}:{key}"
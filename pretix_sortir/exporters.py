@@ -0,0 +1,305 @@
+"""
+Exports des données Sortir! (utilisations et journal d'audit) en CSV ou JSON Lines.
+
+Les lignes sont lues par curseur serveur (QuerySet.iterator) et écrites au fil de l'eau :
+la mémoire consommée ne dépend pas du nombre de lignes exportées.
+Utilisé par les exporteurs Pretix et par la commande sortir_export.
+"""
+
+import csv
+import io
+import json
+from collections import OrderedDict
+from datetime import datetime, time, timedelta
+from django import forms
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.translation import gettext_lazy as _
+from pretix.base.exporter import BaseExporter
+
+EXPORT_FORMATS = [
+    ('csv', _('CSV')),
+    ('jsonl', _('JSON Lines')),
+]
+
+# Taille des lots lus par le curseur serveur
+EXPORT_CHUNK_SIZE = 2000
+
+# Colonnes exportées (jamais de hash complet ni de clé de service)
+USAGE_FIELDS = [
+    ('id', 'id'),
+    ('event', 'event__slug'),
+    ('order', 'order__code'),
+    ('card_suffix', 'sortir_number_suffix'),
+    ('item_id', 'item_id'),
+    ('variation_id', 'variation_id'),
+    ('status', 'status'),
+    ('created_at', 'created_at'),
+    ('validated_at', 'validated_at'),
+    ('used_at', 'used_at'),
+    ('apras_request_id', 'apras_request_id'),
+]
+
+# Organisateur, événement et commande sont lus par identifiant puis résolus par lot
+# (AUDIT_RELATED) : le journal d'audit peut vivre sur une base dédiée, sans jointure possible
+AUDIT_FIELDS = [
+    ('id', 'id'),
+    ('timestamp', 'timestamp'),
+    ('organizer', 'organizer_id'),
+    ('event', 'event_id'),
+    ('order', 'order_id'),
+    ('action', 'action'),
+    ('severity', 'severity'),
+    ('card_suffix', 'card_suffix'),
+    ('ip_address', 'ip_address'),
+    ('user_agent', 'user_agent_ref__value'),
+    ('message', 'message'),
+    ('details', 'details'),
+]
+
+# Colonne -> (modèle, champ affiché à la place de l'identifiant)
+AUDIT_RELATED = {
+    'organizer': ('pretixbase.Organizer', 'slug'),
+    'event': ('pretixbase.Event', 'slug'),
+    'order': ('pretixbase.Order', 'code'),
+}
+
+
+def _day_bounds(date_from=None, date_to=None):
+    """Convertit des dates (incluses) en bornes datetime [début, fin[."""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(date_from, time.min), tz) if date_from else None
+    end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min), tz) if date_to else None
+    return start, end
+
+
+def usage_queryset(events=None, organizer=None, date_from=None, date_to=None, status=None):
+    """Construit la requête d'export des SortirUsage."""
+    from .models import SortirUsage
+    from .routers import read_database
+
+    queryset = SortirUsage.objects.using(read_database(SortirUsage))
+    if events is not None:
+        queryset = queryset.filter(event__in=events)
+    if organizer is not None:
+        queryset = queryset.filter(event__organizer=organizer)
+    start, end = _day_bounds(date_from, date_to)
+    if start:
+        queryset = queryset.filter(created_at__gte=start)
+    if end:
+        queryset = queryset.filter(created_at__lt=end)
+    if status:
+        queryset = queryset.filter(status=status)
+    return queryset.order_by('pk')
+
+
+def audit_queryset(events=None, organizer=None, date_from=None, date_to=None, severity=None):
+    """Construit la requête d'export du journal d'audit."""
+    from .models import SortirAuditLog
+    from .routers import read_database
+
+    queryset = SortirAuditLog.objects.using(read_database(SortirAuditLog))
+    # Identifiants évalués à part : pas de sous-requête vers les tables Pretix
+    event_ids = list(events.values_list('pk', flat=True)) if events is not None else None
+    if event_ids is not None and organizer is not None:
+        # Inclut les entrées de niveau organisateur (sans événement)
+        queryset = queryset.filter(Q(event_id__in=event_ids) | Q(event_id__isnull=True, organizer_id=organizer.pk))
+    elif event_ids is not None:
+        queryset = queryset.filter(event_id__in=event_ids)
+    elif organizer is not None:
+        queryset = queryset.filter(organizer_id=organizer.pk)
+    start, end = _day_bounds(date_from, date_to)
+    if start:
+        queryset = queryset.filter(timestamp__gte=start)
+    if end:
+        queryset = queryset.filter(timestamp__lt=end)
+    if severity:
+        queryset = queryset.filter(severity=severity)
+    return queryset.order_by('pk')
+
+
+def _resolve_related(rows, columns, related):
+    """Remplace, dans un lot de lignes, les identifiants des colonnes `related` par leur libellé."""
+    from django.apps import apps
+    from django_scopes import scopes_disabled
+
+    rows = [list(row) for row in rows]
+    for column, (model_label, label_field) in related.items():
+        index = columns.index(column)
+        ids = {row[index] for row in rows if row[index] is not None}
+        if not ids:
+            continue
+        with scopes_disabled():
+            labels = dict(apps.get_model(model_label).objects.filter(pk__in=ids).values_list('pk', label_field))
+        for row in rows:
+            if row[index] is not None:
+                row[index] = labels.get(row[index])
+    return rows
+
+
+def _iter_rows(queryset, fields, chunk_size, related=None):
+    """Lignes de la requête, lues par lots (et résolues lot par lot si `related`)."""
+    columns = [name for name, _path in fields]
+    rows = queryset.values_list(*[path for _name, path in fields]).iterator(chunk_size=chunk_size)
+    if not related:
+        yield from rows
+        return
+
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield from _resolve_related(chunk, columns, related)
+            chunk = []
+    if chunk:
+        yield from _resolve_related(chunk, columns, related)
+
+
+def write_export(queryset, fields, fmt, fp, chunk_size=EXPORT_CHUNK_SIZE, related=None):
+    """
+    Écrit les lignes de la requête dans le flux texte fp.
+
+    Args:
+        queryset: Requête à exporter
+        fields: Liste de (nom de colonne, chemin ORM)
+        fmt: 'csv' ou 'jsonl'
+        fp: Flux texte de sortie
+        chunk_size: Taille des lots lus par le curseur serveur
+        related: Colonnes d'identifiants à remplacer par un libellé (voir AUDIT_RELATED)
+
+    Returns:
+        Le nombre de lignes écrites
+    """
+    columns = [name for name, _path in fields]
+    rows = _iter_rows(queryset, fields, chunk_size, related)
+
+    count = 0
+    if fmt == 'jsonl':
+        encoder = DjangoJSONEncoder(ensure_ascii=False)
+        for row in rows:
+            fp.write(encoder.encode(dict(zip(columns, row))))
+            fp.write('\n')
+            count += 1
+    else:
+        writer = csv.writer(fp)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([
+                json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False) if isinstance(value, (dict, list))
+                else (value.isoformat() if isinstance(value, datetime) else value)
+                for value in row
+            ])
+            count += 1
+    return count
+
+
+class BaseSortirExporter(BaseExporter):
+    """
+    Base commune des exporteurs Pretix Sortir! (événement ou multi-événements).
+
+    Les sous-classes définissent fields (et related) et get_queryset(form_data).
+    """
+
+    category = _('Sortir!')
+    fields = []
+    related = None
+
+    @property
+    def export_form_fields(self):
+        from pretix.base.forms.widgets import DatePickerWidget
+
+        return OrderedDict([
+            ('_format', forms.ChoiceField(label=_('Format'), choices=EXPORT_FORMATS, initial='csv')),
+            ('date_from', forms.DateField(
+                label=_('Depuis le'), required=False, widget=DatePickerWidget()
+            )),
+            ('date_to', forms.DateField(
+                label=_('Jusqu\'au'), required=False, widget=DatePickerWidget()
+            )),
+        ])
+
+    @staticmethod
+    def _parse_date(value):
+        if not value:
+            return None
+        return value if not isinstance(value, str) else parse_date(value)
+
+    def render(self, form_data, output_file=None):
+        """
+        Génère l'export. Si Pretix fournit output_file, les lignes y sont écrites au fil de l'eau.
+        """
+        fmt = form_data.get('_format') or 'csv'
+        extension, content_type = ('jsonl', 'application/jsonl') if fmt == 'jsonl' else ('csv', 'text/csv')
+        slug = self.event.slug if self.event else self.organizer.slug
+        filename = f'{slug}_{self.identifier}.{extension}'
+
+        target = output_file if output_file is not None else io.BytesIO()
+        fp = io.TextIOWrapper(target, encoding='utf-8', newline='')
+        try:
+            write_export(self.get_queryset(form_data), self.fields, fmt, fp, related=self.related)
+            fp.flush()
+        finally:
+            # Ne ferme pas le fichier sous-jacent, géré par Pretix
+            fp.detach()
+
+        if output_file is not None:
+            return filename, content_type, None
+        return filename, content_type, target.getvalue()
+
+
+class SortirUsageExporter(BaseSortirExporter):
+    identifier = 'sortir_usages'
+    verbose_name = _('Sortir! - Utilisations')
+    description = _('Utilisations de cartes Sortir! (4 derniers chiffres uniquement)')
+    fields = USAGE_FIELDS
+
+    @property
+    def export_form_fields(self):
+        from .models import SortirUsage
+
+        form_fields = super().export_form_fields
+        form_fields['status'] = forms.ChoiceField(
+            label=_('Statut'),
+            choices=[('', _('Tous'))] + SortirUsage.STATUS_CHOICES,
+            required=False
+        )
+        return form_fields
+
+    def get_queryset(self, form_data):
+        return usage_queryset(
+            events=self.events,
+            date_from=self._parse_date(form_data.get('date_from')),
+            date_to=self._parse_date(form_data.get('date_to')),
+            status=form_data.get('status') or None,
+        )
+
+
+class SortirAuditLogExporter(BaseSortirExporter):
+    identifier = 'sortir_audit_log'
+    verbose_name = _('Sortir! - Journal d\'audit')
+    description = _('Journal d\'audit Sortir! (demandes d\'accès RGPD, contrôles)')
+    fields = AUDIT_FIELDS
+    related = AUDIT_RELATED
+
+    @property
+    def export_form_fields(self):
+        from .models import SortirAuditLog
+
+        form_fields = super().export_form_fields
+        form_fields['severity'] = forms.ChoiceField(
+            label=_('Gravité'),
+            choices=[('', _('Toutes'))] + SortirAuditLog.SEVERITY_CHOICES,
+            required=False
+        )
+        return form_fields
+
+    def get_queryset(self, form_data):
+        return audit_queryset(
+            events=self.events,
+            organizer=self.organizer if self.is_multievent else None,
+            date_from=self._parse_date(form_data.get('date_from')),
+            date_to=self._parse_date(form_data.get('date_to')),
+            severity=form_data.get('severity') or None,
+        )
@@ -4,142 +4,330 @@ Champs de base de données chiffrés pour le plugin Sortir!
 
 import os
 import logging
+import threading
 from pathlib import Path
 from django.db import models
+from django.db.models.query_utils import DeferredAttribute
 from django.conf import settings
-from cryptography.fernet import Fernet, InvalidToken
+from django.core.exceptions import ImproperlyConfigured
 
 logger = logging.getLogger('pretix.plugins.sortir')
 
+# Trousseau partagé par tout le processus (voir get_keyring)
+_keyring = None
+_keyring_lock = threading.Lock()
 
-def get_encryption_key():
+
+def _split_keys(value):
+    """Liste de clés (la plus récente en premier) depuis une liste ou une chaîne séparée par virgules/lignes."""
+    if isinstance(value, bytes):
+        value = value.decode()
+    if isinstance(value, str):
+        value = value.replace('\n', ',').split(',')
+    return [key.strip().encode() for key in value if key and key.strip()]
+
+
+def _key_file():
+    data_dir = getattr(settings, 'DATA_DIR', '/data')
+    return Path(data_dir) / '.sortir_encryption_key'
+
+
+def load_encryption_keys():
     """
-    Récupère ou génère automatiquement une clé de chiffrement.
-    La clé est stockée dans un fichier dans le datadir de Pretix pour persistance.
+    Charge les clés de chiffrement, la plus récente en premier.
+
+    Sources, par ordre de priorité :
+    - variable d'environnement SORTIR_ENCRYPTION_KEY
+    - setting Django SORTIR_ENCRYPTION_KEY
+    - fichier .sortir_encryption_key du datadir de Pretix (généré s'il n'existe pas)
+
+    Chaque source peut contenir plusieurs clés (séparées par des virgules ou une par ligne) :
+    la première chiffre, les suivantes permettent encore de déchiffrer après une rotation.
     """
     # Essaie d'abord les variables d'environnement (pour compatibilité)
-    key = os.environ.get('SORTIR_ENCRYPTION_KEY')
-
-    if key:
+    keys = _split_keys(os.environ.get('SORTIR_ENCRYPTION_KEY') or '')
+    if keys:
         logger.debug("[Sortir] Utilisation de la clé depuis variable d'environnement")
-        return key.encode() if isinstance(key, str) else key
+        return keys
 
     # Essaie les settings Django
-    key = getattr(settings, 'SORTIR_ENCRYPTION_KEY', None)
-
-    if key:
+    keys = _split_keys(getattr(settings, 'SORTIR_ENCRYPTION_KEY', None) or '')
+    if keys:
         logger.debug("[Sortir] Utilisation de la clé depuis settings Django")
-        return key.encode() if isinstance(key, str) else key
+        return keys
 
     # Sinon, utilise un fichier de clé persistant dans le datadir
-    data_dir = getattr(settings, 'DATA_DIR', '/data')
-    key_file = Path(data_dir) / '.sortir_encryption_key'
+    key_file = _key_file()
 
     try:
         if key_file.exists():
-            with open(key_file, 'r') as f:
-                key = f.read().strip()
+            keys = _split_keys(key_file.read_text())
+            if keys:
                 logger.debug(f"[Sortir] Clé de chiffrement chargée depuis {key_file}")
-                return key.encode() if isinstance(key, str) else key
-        else:
-            # Génère une nouvelle clé
-            new_key = Fernet.generate_key()
+                return keys
 
-            # Crée le répertoire si nécessaire
-            key_file.parent.mkdir(parents=True, exist_ok=True)
+        # Génère une nouvelle clé
+        from cryptography.fernet import Fernet
 
-            # Sauvegarde la clé
-            with open(key_file, 'wb') as f:
-                f.write(new_key)
-
-            # Change les permissions pour sécuriser le fichier
-            try:
-                os.chmod(key_file, 0o600)
-            except:
-                pass  # Peut échouer sur certains systèmes
+        new_key = Fernet.generate_key()
+        _write_key_file(key_file, [new_key])
 
-            logger.info(f"[Sortir] Nouvelle clé de chiffrement générée et sauvegardée dans {key_file}")
-            logger.warning("[Sortir] IMPORTANT: Sauvegardez cette clé pour les migrations/restaurations!")
+        logger.info(f"[Sortir] Nouvelle clé de chiffrement générée et sauvegardée dans {key_file}")
+        logger.warning("[Sortir] IMPORTANT: Sauvegardez cette clé pour les migrations/restaurations!")
 
-            return new_key
+        return [new_key]
 
     except (IOError, OSError) as e:
+        # Pas de clé temporaire : des tokens chiffrés avec elle seraient perdus au redémarrage
         logger.error(f"[Sortir] Erreur lors de la gestion du fichier de clé: {e}")
-        # En dernier recours, génère une clé temporaire (non persistante)
-        logger.warning("[Sortir] Utilisation d'une clé temporaire - Les données chiffrées ne seront pas persistantes!")
-        return Fernet.generate_key()
+        raise ImproperlyConfigured(
+            f"Clé de chiffrement Sortir! introuvable : définissez SORTIR_ENCRYPTION_KEY ou rendez {key_file} accessible"
+        )
 
 
-class EncryptedTextField(models.TextField):
+def _write_key_file(key_file, keys):
+    # Crée le répertoire si nécessaire
+    key_file.parent.mkdir(parents=True, exist_ok=True)
+
+    # Sauvegarde les clés (une par ligne, la plus récente en premier)
+    tmp_file = key_file.with_name(key_file.name + '.tmp')
+    with open(tmp_file, 'wb') as f:
+        f.write(b'\n'.join(keys) + b'\n')
+
+    # Change les permissions pour sécuriser le fichier
+    try:
+        os.chmod(tmp_file, 0o600)
+    except OSError:
+        pass  # Peut échouer sur certains systèmes
+    os.replace(tmp_file, key_file)
+
+
+def get_encryption_key():
+    """Clé de chiffrement courante (la plus récente)."""
+    return load_encryption_keys()[0]
+
+
+def add_encryption_key():
     """
-    Champ TextField qui chiffre automatiquement les données au repos.
-    Utilise Fernet (AES-128 CBC avec HMAC SHA-256) de la librairie cryptography.
+    Rotation : génère une nouvelle clé et l'ajoute en tête du fichier de clés.
 
-    La clé de chiffrement doit être stockée dans SORTIR_ENCRYPTION_KEY (settings).
+    Les anciennes clés sont conservées pour déchiffrer les valeurs pas encore
+    rechiffrées (voir la commande sortir_reencrypt). Impossible si les clés viennent
+    de l'environnement ou des settings : elles doivent alors être modifiées à la source.
 
-    Utilisation:
-        api_token = EncryptedTextField(blank=True, help_text="Token chiffré")
+    Returns:
+        La version de la nouvelle clé
     """
+    if os.environ.get('SORTIR_ENCRYPTION_KEY') or getattr(settings, 'SORTIR_ENCRYPTION_KEY', None):
+        raise ImproperlyConfigured(
+            "Les clés viennent de SORTIR_ENCRYPTION_KEY : ajoutez la nouvelle clé en tête de cette valeur"
+        )
 
-    description = "TextField chiffré avec Fernet (AES-128)"
+    from cryptography.fernet import Fernet
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._fernet = None
+    keys = load_encryption_keys()
+    _write_key_file(_key_file(), [Fernet.generate_key()] + keys)
+    reset_keyring()
+    logger.warning("[Sortir] Nouvelle clé de chiffrement ajoutée : sauvegardez le fichier de clés !")
+    return len(keys) + 1
 
-    @property
-    def fernet(self):
-        """Lazy loading de l'instance Fernet"""
-        if self._fernet is None:
-            key = get_encryption_key()
-            self._fernet = Fernet(key)
-        return self._fernet
 
-    def from_db_value(self, value, expression, connection):
-        """Déchiffre la valeur lue depuis la base"""
-        if value is None or value == '':
-            return value
+class EncryptionKeyring:
+    """
+    Trousseau de clés Fernet versionnées (MultiFernet).
 
-        # Si la valeur commence par 'gAAAAA', c'est un token chiffré avec Fernet
-        if value.startswith('gAAAAA'):
+    La clé la plus récente chiffre ; toutes déchiffrent. Les versions sont numérotées
+    de la plus ancienne (1) à la plus récente (len(keys)).
+    """
+
+    def __init__(self, keys):
+        # cryptography n'est chargé qu'au premier chiffrement/déchiffrement du processus
+        from cryptography.fernet import Fernet, MultiFernet
+
+        self.fernets = [Fernet(key) for key in keys]
+        self.multi = MultiFernet(self.fernets)
+        self.current_version = len(self.fernets)
+
+    def encrypt(self, value: str) -> str:
+        return self.multi.encrypt(value.encode()).decode('utf-8')
+
+    def decrypt(self, token: str) -> str:
+        """Déchiffre avec la première clé qui convient (lève InvalidToken sinon)."""
+        return self.multi.decrypt(token.encode()).decode('utf-8')
+
+    def key_version(self, token: str):
+        """Version de la clé qui a chiffré token, ou None si aucune ne convient."""
+        from cryptography.fernet import InvalidToken
+
+        for index, fernet in enumerate(self.fernets):
             try:
-                # Déchiffre et retourne la valeur en clair
-                decrypted = self.fernet.decrypt(value.encode()).decode('utf-8')
-                return decrypted
+                fernet.decrypt(token.encode())
+            except InvalidToken:
+                continue
+            return self.current_version - index
+        return None
+
+    def rotate(self, token: str) -> str:
+        """Rechiffre token avec la clé courante (lève InvalidToken si aucune clé ne convient)."""
+        return self.multi.rotate(token.encode()).decode('utf-8')
+
+
+def get_keyring():
+    """Trousseau du processus, chargé une seule fois (fichier de clés lu au premier usage)."""
+    global _keyring
+    if _keyring is None:
+        with _keyring_lock:
+            if _keyring is None:
+                _keyring = EncryptionKeyring(load_encryption_keys())
+    return _keyring
+
+
+def reset_keyring():
+    """Oublie le trousseau chargé : les clés seront relues au prochain usage."""
+    global _keyring
+    with _keyring_lock:
+        _keyring = None
+
+
+def _decrypt_with_reload(token):
+    """
+    Déchiffre token avec le trousseau du processus, relu une fois en cas d'échec.
+
+    Après une rotation (sortir_reencrypt --rotate), un processus démarré avant l'ajout
+    de la clé ne la connaît pas : le fichier de clés est relu avant de conclure que le
+    token est indéchiffrable (lève InvalidToken).
+    """
+    from cryptography.fernet import InvalidToken
+
+    try:
+        return get_keyring().decrypt(token)
+    except InvalidToken:
+        logger.info("[Sortir] Token chiffré avec une clé inconnue du processus : rechargement des clés")
+        reset_keyring()
+        return get_keyring().decrypt(token)
+
+
+class EncryptedValue:
+    """
+    Valeur chiffrée lue en base, déchiffrée seulement au premier accès.
+
+    Les requêtes qui chargent des lignes sans lire le champ (listes, purges, admin)
+    ne paient pas le déchiffrement Fernet.
+    """
+
+    __slots__ = ('token', '_plaintext')
+
+    def __init__(self, token):
+        self.token = token
+        self._plaintext = None
+
+    def decrypt(self):
+        """Déchiffre (une seule fois) et retourne la valeur en clair"""
+        if self._plaintext is None:
+            from cryptography.fernet import InvalidToken
+
+            try:
+                self._plaintext = _decrypt_with_reload(self.token)
             except InvalidToken:
                 logger.warning(
                     "[Sortir] Token impossible à déchiffrer (clé incorrecte). "
                     "Retour d'une valeur vide - veuillez re-saisir le token dans l'interface."
                 )
-                return ""  # Retourne une chaîne vide au lieu de lever une exception
+                self._plaintext = ""  # Retourne une chaîne vide au lieu de lever une exception
             except Exception as e:
                 logger.error(f"[Sortir] Erreur lors du déchiffrement: {e}")
-                return ""  # Retourne une chaîne vide en cas d'erreur
-        else:
-            # Token en clair (anciennes données) - retourner tel quel
-            # À la prochaine sauvegarde, il sera automatiquement chiffré
-            logger.debug(
-                "[Sortir] Token en clair détecté - Il sera chiffré lors de la prochaine sauvegarde"
-            )
+                self._plaintext = ""  # Retourne une chaîne vide en cas d'erreur
+        return self._plaintext
+
+    def __str__(self):
+        return self.decrypt()
+
+    def __bool__(self):
+        return bool(self.token)
+
+    def __repr__(self):
+        # Jamais la valeur en clair dans les représentations (logs, débogueur)
+        return '<EncryptedValue>'
+
+
+class DecryptingAttribute(DeferredAttribute):
+    """Descripteur du champ : déchiffre la valeur au premier accès puis la garde en clair sur l'instance"""
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if isinstance(value, EncryptedValue):
+            value = value.decrypt()
+            instance.__dict__[self.field.attname] = value
+        return value
+
+
+class EncryptedTextField(models.TextField):
+    """
+    Champ TextField qui chiffre automatiquement les données au repos.
+    Utilise Fernet (AES-128 CBC avec HMAC SHA-256) de la librairie cryptography.
+
+    Les clés viennent du trousseau du processus (voir get_keyring) : la plus récente
+    chiffre, les précédentes restent utilisables pour déchiffrer après une rotation.
+    Le déchiffrement est paresseux : il a lieu au premier accès à l'attribut (voir
+    EncryptedValue), et une instance sauvegardée sans que le champ ait été lu
+    réécrit le chiffré tel quel.
+
+    Utilisation:
+        api_token = EncryptedTextField(blank=True, help_text="Token chiffré")
+    """
+
+    description = "TextField chiffré avec Fernet (AES-128)"
+    descriptor_class = DecryptingAttribute
+
+    def from_db_value(self, value, expression, connection):
+        """Enveloppe la valeur chiffrée lue depuis la base (déchiffrée au premier accès)"""
+        if value is None or value == '':
             return value
 
+        # Si la valeur commence par 'gAAAAA', c'est un token chiffré avec Fernet
+        if value.startswith('gAAAAA'):
+            return EncryptedValue(value)
+
+        # Token en clair (anciennes données) - retourner tel quel
+        # À la prochaine sauvegarde, il sera automatiquement chiffré
+        logger.debug(
+            "[Sortir] Token en clair détecté - Il sera chiffré lors de la prochaine sauvegarde"
+        )
+        return value
+
+    def pre_save(self, model_instance, add):
+        # Valeur brute de l'instance : pas de déchiffrement si le champ n'a pas été lu
+        if self.attname in model_instance.__dict__:
+            return model_instance.__dict__[self.attname]
+        return super().pre_save(model_instance, add)
+
     def get_prep_value(self, value):
         """Chiffre la valeur avant de l'enregistrer en base"""
         if value is None or value == '':
             return value
 
+        # Valeur lue en base et jamais déchiffrée : le chiffré est conservé
+        if isinstance(value, EncryptedValue):
+            return value.token
+
         # Si la valeur est déjà chiffrée (commence par gAAAAA...), ne pas rechiffrer
         if isinstance(value, str) and value.startswith('gAAAAA'):
             return value
 
         try:
-            # Chiffre la valeur
-            encrypted = self.fernet.encrypt(value.encode()).decode('utf-8')
-            return encrypted
+            # Chiffre la valeur avec la clé courante
+            return get_keyring().encrypt(value)
         except Exception as e:
             logger.error(f"Erreur lors du chiffrement: {e}")
             raise
 
+    def to_python(self, value):
+        if isinstance(value, EncryptedValue):
+            return value.decrypt()
+        return super().to_python(value)
+
     def deconstruct(self):
         """
         Retourne une définition qui peut être utilisée pour les migrations.
@@ -147,3 +335,91 @@ class EncryptedTextField(models.TextField):
         """
         name, path, args, kwargs = super().deconstruct()
         return name, path, args, kwargs
+
+
+class HexBinaryField(models.BinaryField):
+    """
+    Condensat stocké en binaire (bytea), exposé en hexadécimal côté Python.
+
+    Un SHA-256 occupe 32 octets au lieu des 64 caractères de sa forme hexadécimale :
+    les index qui le contiennent sont deux fois plus petits. Les requêtes, les lectures
+    et les affectations continuent d'utiliser la chaîne hexadécimale.
+
+    Utilisation:
+        sortir_number_hash = HexBinaryField(db_index=True)
+    """
+
+    description = "Condensat binaire exposé en hexadécimal"
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('editable', True)
+        super().__init__(*args, **kwargs)
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return bytes(value).hex()
+
+    def to_python(self, value):
+        if isinstance(value, (bytes, memoryview)):
+            return bytes(value).hex()
+        return value
+
+    def get_prep_value(self, value):
+        if isinstance(value, str):
+            try:
+                return bytes.fromhex(value)
+            except ValueError:
+                raise ValueError(f"Le champ {self.name} attend une valeur hexadécimale, reçu {value!r}")
+        return value
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
+
+
+class CodedChoiceField(models.PositiveSmallIntegerField):
+    """
+    Choix stocké sous forme d'entier court, exposé sous forme de chaîne côté Python.
+
+    codes associe chaque valeur de choices à son code en base (2 octets au lieu d'un
+    varchar). Les filtres (status='pending', status__in=[...]), les mises à jour et
+    get_FOO_display() continuent d'utiliser les chaînes.
+
+    Utilisation:
+        status = CodedChoiceField(codes={'pending': 1, 'used': 2}, choices=STATUS_CHOICES)
+    """
+
+    description = "Choix codé en entier court"
+
+    def __init__(self, *args, codes=None, **kwargs):
+        self.codes = dict(codes or {})
+        self.names = {code: name for name, code in self.codes.items()}
+        super().__init__(*args, **kwargs)
+
+    @property
+    def validators(self):
+        # Les bornes d'entier ne s'appliquent pas à la valeur Python (chaîne)
+        return list(self._validators)
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return self.names.get(value, value)
+
+    def to_python(self, value):
+        if isinstance(value, int) and value in self.names:
+            return self.names[value]
+        return value
+
+    def get_prep_value(self, value):
+        if value is None or isinstance(value, int):
+            return value
+        try:
+            return self.codes[value]
+        except KeyError:
+            raise ValueError(f"Valeur inconnue pour le champ {self.name} : {value!r}")
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['codes'] = self.codes
+        return name, path, args, kwargs
@@ -0,0 +1,127 @@
+"""
+Journalisation structurée des événements du plugin Sortir!
+
+Chaque entrée est un nom d'événement et des champs typés :
+
+    event_log = get_event_logger()
+    event_log.info('card_validated', card=card_number, event=event.slug, usage=usage.pk)
+
+Le message n'est mis en forme que si un handler l'émet (le record porte un EventMessage,
+converti en texte par getMessage). Les champs sont masqués un par un au moment de la mise
+en forme : numéro de carte réduit aux 4 derniers chiffres, secrets remplacés par ***,
+autres chaînes passées par la redaction de logging_filters.
+
+Format texte par défaut :
+    [Sortir] card_validated card=***1234 event=concert usage=42
+Format JSON (setting SORTIR_LOG_FORMAT = 'json') :
+    {"event_name": "card_validated", "card": "***1234", "event": "concert", "usage": 42}
+
+Les handlers structurés peuvent aussi lire record.sortir_event.as_dict().
+"""
+
+import json
+import logging
+
+from .logging_filters import LogRateLimitFilter, redact
+
+LOGGER_NAME = 'pretix.plugins.sortir'
+
+# Champs réduits aux 4 derniers caractères
+SUFFIX_FIELDS = frozenset({'card'})
+
+# Champs jamais écrits
+SECRET_FIELDS = frozenset({'token', 'api_token', 'service_key', 'authorization'})
+
+
+def _log_format():
+    from django.conf import settings
+
+    return getattr(settings, 'SORTIR_LOG_FORMAT', 'text')
+
+
+def _render_value(name, value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = str(value)
+    if name in SUFFIX_FIELDS:
+        return f'***{text[-4:]}' if text else ''
+    if name in SECRET_FIELDS:
+        return '***'
+    return redact(text)
+
+
+class EventMessage:
+    """Message d'un événement, mis en forme (et masqué) seulement à l'émission"""
+
+    __slots__ = ('name', 'fields', '_rendered')
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self._rendered = None
+
+    def as_dict(self):
+        """Champs masqués, prêts à sérialiser (le nom de l'événement sous la clé 'event_name')"""
+        data = {'event_name': self.name}
+        for key, value in self.fields.items():
+            data[key] = _render_value(key, value)
+        return data
+
+    def __str__(self):
+        if self._rendered is None:
+            if _log_format() == 'json':
+                self._rendered = json.dumps(self.as_dict(), ensure_ascii=False, default=str)
+            else:
+                parts = [f'[Sortir] {self.name}']
+                for key, value in self.fields.items():
+                    value = _render_value(key, value)
+                    if isinstance(value, str) and (not value or any(c.isspace() or c == '"' for c in value)):
+                        value = json.dumps(value, ensure_ascii=False)
+                    parts.append(f'{key}={value}')
+                self._rendered = ' '.join(parts)
+        return self._rendered
+
+    def __repr__(self):
+        return f'<EventMessage {self.name}>'
+
+
+class EventLogger:
+    """Enveloppe d'un logger standard pour les événements structurés"""
+
+    def __init__(self, logger):
+        self.logger = logger
+
+    def _emit(self, level, name, exc_info, fields):
+        # Rien n'est construit si le niveau est désactivé
+        if not self.logger.isEnabledFor(level):
+            return
+        message = EventMessage(name, fields)
+        # stacklevel : fichier/ligne de l'appelant de info(), warning()...
+        self.logger.log(level, message, exc_info=exc_info, extra={'sortir_event': message}, stacklevel=3)
+
+    def log(self, level, name, /, **fields):
+        self._emit(level, name, None, fields)
+
+    def debug(self, name, /, **fields):
+        self._emit(logging.DEBUG, name, None, fields)
+
+    def info(self, name, /, **fields):
+        self._emit(logging.INFO, name, None, fields)
+
+    def warning(self, name, /, **fields):
+        self._emit(logging.WARNING, name, None, fields)
+
+    def error(self, name, /, **fields):
+        self._emit(logging.ERROR, name, None, fields)
+
+    def exception(self, name, /, **fields):
+        """Comme error(), avec la trace de l'exception en cours"""
+        self._emit(logging.ERROR, name, True, fields)
+
+
+def get_event_logger(name=LOGGER_NAME):
+    logger = logging.getLogger(name)
+    if not any(isinstance(f, LogRateLimitFilter) for f in logger.filters):
+        # En tête : les messages écartés ne passent pas par la redaction
+        logger.filters.insert(0, LogRateLimitFilter())
+    return EventLogger(logger)
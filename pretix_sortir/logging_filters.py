@@ -4,6 +4,77 @@ Filtres de logs pour redaction des données sensibles (Sécurité PHASE 2 - Poin
 
 import logging
 import re
+import threading
+import time
+
+# Un seul passage : numéros de carte (10+ chiffres consécutifs) OU préfixe de token suivi
+# de sa valeur (après token=, api_key=, clé=, Authorization: [Bearer], Bearer)
+SENSITIVE_PATTERN = re.compile(
+    r'(?P<card>\b\d{10,}\b)'
+    r'|(?P<prefix>(?:token|api_key|clé)[=:\s]+|authorization[=:\s]+(?:bearer\s+)?|bearer\s+)(?P<value>[^\s,}]+)',
+    re.IGNORECASE
+)
+
+# Pré-test bon marché (recherches de sous-chaînes) : sans suite de 10 chiffres ni
+# mot-clé, le motif complet n'est pas exécuté
+SENSITIVE_KEYWORDS = ('token', 'api_key', 'authorization', 'bearer', 'clé')
+_DIGITS_RUN = re.compile(r'\d{10}')
+
+
+def _may_contain_sensitive(text):
+    lowered = text.lower()
+    for keyword in SENSITIVE_KEYWORDS:
+        if keyword in lowered:
+            return True
+    return _DIGITS_RUN.search(text) is not None
+
+
+def _replace_sensitive(match):
+    card = match.group('card')
+    if card is not None:
+        # Garde les 4 derniers chiffres
+        return '*' * (len(card) - 4) + card[-4:]
+
+    # Garde les 10 premiers caractères du token
+    token_value = match.group('value')
+    if len(token_value) > 10:
+        redacted = token_value[:10] + '*' * 10
+    else:
+        redacted = '*' * len(token_value)
+    return match.group('prefix') + redacted
+
+
+def redact(text):
+    """
+    Masque numéros de carte et tokens d'une chaîne.
+
+    Exemples: "1234567890" -> "******7890", "token=abc123def456ghi789" -> "token=abc123def4**********"
+    """
+    if not _may_contain_sensitive(text):
+        return text
+    return SENSITIVE_PATTERN.sub(_replace_sensitive, text)
+
+
+def will_be_emitted(record):
+    """
+    Indique si au moins un handler atteint par le record accepte son niveau.
+
+    Parcourt les loggers comme Logger.callHandlers (propagate, lastResort) ; les filtres
+    des handlers ne sont pas évalués, la réponse est donc prudente (True en cas de doute).
+    """
+    logger = logging.getLogger(record.name)
+    found = False
+    while logger:
+        for handler in logger.handlers:
+            found = True
+            if record.levelno >= handler.level:
+                return True
+        if not logger.propagate:
+            break
+        logger = logger.parent
+    if not found:
+        return logging.lastResort is not None and record.levelno >= logging.lastResort.level
+    return False
 
 
 class SensitiveDataFilter(logging.Filter):
@@ -14,19 +85,11 @@ class SensitiveDataFilter(logging.Filter):
     - Numéros de carte (10 chiffres consécutifs)
     - Tokens API (mots-clés: token, api_key, authorization)
     - Clés de service
-    """
-
-    # Pattern pour détecter les numéros de carte (10+ chiffres consécutifs)
-    CARD_NUMBER_PATTERN = re.compile(r'\b\d{10,}\b')
 
-    # Pattern pour détecter les tokens (après token=, api_key=, Authorization:, etc.)
-    TOKEN_PATTERNS = [
-        re.compile(r'(token[=:\s]+)[^\s,}]+', re.IGNORECASE),
-        re.compile(r'(api_key[=:\s]+)[^\s,}]+', re.IGNORECASE),
-        re.compile(r'(authorization[=:\s]+)[^\s,}]+', re.IGNORECASE),
-        re.compile(r'(bearer\s+)[^\s,}]+', re.IGNORECASE),
-        re.compile(r'(clé[=:\s]+)[^\s,}]+', re.IGNORECASE),
-    ]
+    Un seul motif combiné, précédé d'un pré-test, et seulement pour les records qu'un
+    handler émettra effectivement (un INFO sans handler INFO n'est pas analysé).
+    Coût mesuré par benchmarks/bench_log_redaction.py.
+    """
 
     def filter(self, record):
         """
@@ -38,68 +101,21 @@ class SensitiveDataFilter(logging.Filter):
         Returns:
             True pour garder le log (toujours True, on le modifie juste)
         """
-        if hasattr(record, 'msg') and isinstance(record.msg, str):
-            # Redacte les numéros de carte (sauf 4 derniers chiffres)
-            record.msg = self._redact_card_numbers(record.msg)
+        if not will_be_emitted(record):
+            return True
 
-            # Redacte les tokens API
-            record.msg = self._redact_tokens(record.msg)
+        if isinstance(record.msg, str):
+            record.msg = redact(record.msg)
 
         # Filtre aussi les arguments du log
-        if hasattr(record, 'args') and record.args:
+        if record.args:
             if isinstance(record.args, dict):
-                record.args = {k: self._redact_value(v) for k, v in record.args.items()}
+                record.args = {k: redact(v) if isinstance(v, str) else v for k, v in record.args.items()}
             elif isinstance(record.args, tuple):
-                record.args = tuple(self._redact_value(v) for v in record.args)
+                record.args = tuple(redact(v) if isinstance(v, str) else v for v in record.args)
 
         return True
 
-    def _redact_card_numbers(self, text):
-        """
-        Redacte les numéros de carte, ne garde que les 4 derniers chiffres.
-
-        Exemple: "1234567890" -> "******7890"
-        """
-        def replace_card(match):
-            card = match.group(0)
-            if len(card) >= 10:
-                # Garde les 4 derniers chiffres
-                return '*' * (len(card) - 4) + card[-4:]
-            return card
-
-        return self.CARD_NUMBER_PATTERN.sub(replace_card, text)
-
-    def _redact_tokens(self, text):
-        """
-        Redacte les tokens API, ne garde que les 10 premiers caractères.
-
-        Exemple: "token=abc123def456ghi789" -> "token=abc123def4**********"
-        """
-        for pattern in self.TOKEN_PATTERNS:
-            def replace_token(match):
-                prefix = match.group(1)  # "token=", "Authorization:", etc.
-                full_match = match.group(0)
-                token_value = full_match[len(prefix):]
-
-                # Garde les 10 premiers caractères du token
-                if len(token_value) > 10:
-                    redacted = token_value[:10] + '*' * 10
-                else:
-                    redacted = '*' * len(token_value)
-
-                return prefix + redacted
-
-            text = pattern.sub(replace_token, text)
-
-        return text
-
-    def _redact_value(self, value):
-        """Redacte une valeur si c'est une chaîne contenant des données sensibles."""
-        if isinstance(value, str):
-            value = self._redact_card_numbers(value)
-            value = self._redact_tokens(value)
-        return value
-
 
 class SortirSecurityFilter(logging.Filter):
     """
@@ -118,3 +134,144 @@ class SortirSecurityFilter(logging.Filter):
                 record.msg = f"[SORTIR SECURITY] {record.msg}"
 
         return True
+
+
+# Limites par clé de message (nom d'événement, ou gabarit du message) sur une fenêtre
+# glissante : 'rate' = messages émis au plus par fenêtre, 'sample' = fraction conservée
+# (0.1 : un message sur 10). 'default' s'applique aux clés non listées, sous WARNING.
+# Surchargé clé par clé par le setting SORTIR_LOG_LIMITS.
+LOG_LIMIT_WINDOW = 60
+DEFAULT_LOG_LIMITS = {
+    'default': {'rate': 120},
+    'cart_validation': {'rate': 10},
+    'cart_item_requires_sortir': {'rate': 10},
+    'item_requires_sortir': {'rate': 10},
+}
+
+# Au-delà, les nouvelles clés ne sont plus limitées (mémoire bornée)
+MAX_LOG_KEYS = 1000
+
+
+def _message_key(record):
+    event = getattr(record, 'sortir_event', None)
+    if event is not None:
+        return event.name
+    if isinstance(record.msg, str):
+        return record.msg
+    return None
+
+
+def _sampled(seen, sample):
+    """Échantillonnage déterministe : 1er, (1 + 1/sample)e... message de la fenêtre"""
+    if sample is None or sample >= 1:
+        return True
+    if sample <= 0:
+        return False
+    return (seen - 1) % max(round(1 / sample), 1) == 0
+
+
+class _KeyWindow:
+    __slots__ = ('start', 'seen', 'passed', 'suppressed', 'levelno')
+
+    def __init__(self, start):
+        self.start = start
+        self.seen = 0
+        self.passed = 0
+        self.suppressed = 0
+        self.levelno = logging.NOTSET
+
+
+class LogRateLimitFilter(logging.Filter):
+    """
+    Échantillonnage et limitation de débit des logs répétitifs, par clé de message.
+
+    Les messages écartés sont comptés ; à la fin de la fenêtre, un seul événement
+    logs_suppressed (clé, nombre, durée de la fenêtre) les résume, au niveau le plus
+    élevé des messages écartés. WARNING et au-delà ne sont limités que pour les clés
+    explicitement configurées.
+    """
+
+    def __init__(self, limits=None, window=LOG_LIMIT_WINDOW, clock=time.monotonic):
+        super().__init__()
+        self._limits = limits
+        self.window = window
+        self.clock = clock
+        self._windows = {}
+        self._lock = threading.Lock()
+        self._next_sweep = 0
+
+    @property
+    def limits(self):
+        if self._limits is None:
+            from django.conf import settings
+
+            limits = dict(DEFAULT_LOG_LIMITS)
+            limits.update(getattr(settings, 'SORTIR_LOG_LIMITS', {}))
+            self._limits = limits
+        return self._limits
+
+    def _limit_for(self, key, levelno):
+        limit = self.limits.get(key)
+        if limit is None and levelno < logging.WARNING:
+            limit = self.limits.get('default')
+        return limit
+
+    def filter(self, record):
+        if getattr(record, 'sortir_summary', False):
+            return True
+
+        key = _message_key(record)
+        limit = self._limit_for(key, record.levelno) if key is not None else None
+        now = self.clock()
+        summaries = []
+        with self._lock:
+            if now >= self._next_sweep:
+                # Fenêtres terminées des clés qui ne reviennent pas
+                self._next_sweep = now + self.window
+                self._sweep(now, summaries)
+            keep = limit is None or self._allow(key, limit, record.levelno, now, summaries)
+
+        # Hors verrou : le résumé repasse par ce filtre
+        for summary in summaries:
+            self._emit_summary(record.name, *summary)
+        return keep
+
+    def _close(self, key, window, summaries):
+        del self._windows[key]
+        if window.suppressed:
+            summaries.append((key, window.suppressed, window.levelno))
+
+    def _sweep(self, now, summaries):
+        for key, window in list(self._windows.items()):
+            if now - window.start >= self.window:
+                self._close(key, window, summaries)
+
+    def _allow(self, key, limit, levelno, now, summaries):
+        window = self._windows.get(key)
+        if window is not None and now - window.start >= self.window:
+            self._close(key, window, summaries)
+            window = None
+        if window is None:
+            if len(self._windows) >= MAX_LOG_KEYS:
+                return True
+            window = self._windows[key] = _KeyWindow(now)
+
+        window.seen += 1
+        rate = limit.get('rate')
+        if _sampled(window.seen, limit.get('sample')) and (rate is None or window.passed < rate):
+            window.passed += 1
+            return True
+
+        window.suppressed += 1
+        window.levelno = max(window.levelno, levelno)
+        return False
+
+    def _emit_summary(self, logger_name, key, suppressed, levelno):
+        from .logevents import EventMessage
+
+        message = EventMessage('logs_suppressed', {
+            'key': key, 'suppressed': suppressed, 'window_seconds': self.window,
+        })
+        logging.getLogger(logger_name).log(
+            levelno, message, extra={'sortir_event': message, 'sortir_summary': True}
+        )
@@ -0,0 +1,151 @@
+"""
+Écriture des logs du plugin Sortir! hors du thread de la requête (optionnel)
+
+Avec SORTIR_LOG_QUEUE = True (settings Django), les handlers qui recevaient les logs
+'pretix.plugins.sortir' (ceux du logger et de ses parents, fichier, syslog, Sentry...)
+sont déplacés derrière une file : le thread de la requête ne fait que mettre en forme et
+masquer le record avant de le déposer dans la file, un thread d'écriture l'émet ensuite.
+
+- La redaction (logging_filters.redact) est appliquée au message final, trace comprise,
+  avant la mise en file : aucun record non masqué ne quitte le thread appelant.
+- La file est bornée (SORTIR_LOG_QUEUE_SIZE, 10000 par défaut) : si le thread d'écriture
+  ne suit plus, les records sont abandonnés plutôt que de bloquer la requête, et leur
+  nombre est signalé dès que la file a de nouveau de la place.
+- À l'arrêt du processus, la file est vidée avant la fermeture des handlers ; après un
+  fork (workers gunicorn, Celery), le processus enfant démarre sa propre file.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+from .logging_filters import redact
+
+LOGGER_NAME = 'pretix.plugins.sortir'
+DEFAULT_QUEUE_SIZE = 10000
+
+_lock = threading.Lock()
+_handler = None
+_listener = None
+
+
+class SortirQueueHandler(QueueHandler):
+    """QueueHandler qui masque le message mis en forme et ne bloque jamais"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = super().prepare(record)
+        # Message final (args et trace inclus) : une seule redaction couvre tout
+        record.msg = record.message = redact(record.msg)
+        return record
+
+    def enqueue(self, record):
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            notice = logging.LogRecord(
+                record.name, logging.WARNING, __file__, 0,
+                f'[Sortir] {dropped} message(s) de log abandonné(s) : file d\'écriture pleine', None, None,
+            )
+            try:
+                self.queue.put_nowait(notice)
+            except queue.Full:
+                self.dropped += dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SortirQueueListener(QueueListener):
+    """QueueListener dont le signal d'arrêt attend une place dans la file bornée"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+def _target_handlers(logger):
+    """Handlers atteints par les records du logger (même parcours que Logger.callHandlers)"""
+    handlers = []
+    current = logger
+    while current:
+        handlers.extend(current.handlers)
+        if not current.propagate:
+            break
+        current = current.parent
+    return handlers
+
+
+def _start(handlers, queue_size):
+    global _handler, _listener
+
+    log_queue = queue.Queue(queue_size)
+    if _handler is None:
+        _handler = SortirQueueHandler(log_queue)
+        # Niveau du handler le plus bavard : will_be_emitted() reste exact
+        _handler.setLevel(min(handler.level for handler in handlers))
+    else:
+        _handler.queue = log_queue
+        _handler.dropped = 0
+    _listener = SortirQueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_after_fork():
+    # Le thread d'écriture n'existe pas dans l'enfant et la file a pu être copiée verrouillée
+    global _lock
+    _lock = threading.Lock()
+    if _listener is not None:
+        _start(_listener.handlers, _handler.queue.maxsize)
+
+
+def install_queue_logging():
+    """
+    Place les handlers du logger du plugin derrière une file, si SORTIR_LOG_QUEUE est activé.
+
+    Appelée au chargement de l'application ; sans effet si le réglage est absent, si aucun
+    handler n'est configuré, ou si la file est déjà en place.
+    """
+    from django.conf import settings
+
+    if not getattr(settings, 'SORTIR_LOG_QUEUE', False):
+        return False
+
+    with _lock:
+        if _listener is not None:
+            return True
+
+        logger = logging.getLogger(LOGGER_NAME)
+        handlers = _target_handlers(logger)
+        if not handlers:
+            return False
+
+        _start(handlers, getattr(settings, 'SORTIR_LOG_QUEUE_SIZE', DEFAULT_QUEUE_SIZE))
+        logger.handlers = [_handler]
+        logger.propagate = False
+
+        # Enregistré après le atexit du module logging : exécuté avant logging.shutdown()
+        atexit.register(stop_queue_logging)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=_restart_after_fork)
+    return True
+
+
+def stop_queue_logging():
+    """Vide la file (les records en attente sont écrits) et arrête le thread d'écriture"""
+    global _listener
+
+    with _lock:
+        if _listener is None:
+            return
+        listener, _listener = _listener, None
+        logger = logging.getLogger(LOGGER_NAME)
+        if _handler in logger.handlers:
+            # Écritures synchrones à nouveau après l'arrêt
+            logger.handlers = list(listener.handlers)
+    listener.stop()
@@ -0,0 +1,135 @@
+"""
+Commande de mise en place de la base dédiée au journal d'audit Sortir! (SORTIR_AUDIT_DATABASE)
+
+Usage:
+    python -m pretix sortir_audit_database --init
+    python -m pretix sortir_audit_database --copy [--batch-size=10000]
+
+--init crée les tables du journal d'audit sur la base dédiée à partir des modèles actuels
+et y marque les migrations Sortir! comme appliquées (les migrations historiques créaient des
+contraintes vers les tables Pretix, absentes de cette base). Les migrations suivantes s'y
+appliquent normalement avec `migrate --database=<alias>`.
+
+--copy recopie le journal existant depuis la base principale, par lots de clés primaires
+(identifiants conservés) ; une copie interrompue reprend après la dernière entrée copiée.
+
+Les migrations Sortir! doivent être appliquées sur la base principale avant d'activer
+SORTIR_AUDIT_DATABASE : les migrations de données du journal (0020) lisent les modèles
+d'audit, que le routeur enverrait vers la base dédiée encore vide.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max
+
+
+class Command(BaseCommand):
+    help = 'Prépare la base dédiée au journal d\'audit Sortir! et y recopie le journal existant'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--init',
+            action='store_true',
+            help='Crée les tables du journal d\'audit sur la base dédiée',
+        )
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='Recopie le journal d\'audit de la base principale vers la base dédiée',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Nombre d\'entrées recopiées par transaction (défaut: 10000)',
+        )
+
+    def handle(self, *args, **options):
+        from pretix_sortir.models import SortirAuditLog, SortirUserAgent
+        from pretix_sortir.routers import audit_database
+
+        alias = audit_database()
+        if not alias:
+            raise CommandError('SORTIR_AUDIT_DATABASE n\'est pas configuré')
+        if alias not in connections:
+            raise CommandError(f'Base "{alias}" absente de DATABASES')
+        if alias == DEFAULT_DB_ALIAS:
+            raise CommandError('SORTIR_AUDIT_DATABASE doit désigner une base autre que la base principale')
+        if not options['init'] and not options['copy']:
+            raise CommandError('Précisez --init et/ou --copy')
+        self.check_main_database_migrated()
+
+        # SortirUserAgent d'abord : référencé par SortirAuditLog
+        models = [SortirUserAgent, SortirAuditLog]
+
+        if options['init']:
+            self.init_database(alias, models)
+        if options['copy']:
+            for model in models:
+                self.copy_model(alias, model, max(options['batch_size'], 1))
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Journal d\'audit prêt sur la base "{alias}"'))
+
+    def check_main_database_migrated(self):
+        from django.db.migrations.loader import MigrationLoader
+        from pretix_sortir.routers import APP_LABEL
+
+        loader = MigrationLoader(connections[DEFAULT_DB_ALIAS])
+        pending = sorted(
+            name for app_label, name in loader.disk_migrations
+            if app_label == APP_LABEL and (app_label, name) not in loader.applied_migrations
+        )
+        if pending:
+            raise CommandError(
+                f'Migrations Sortir! non appliquées sur la base principale ({", ".join(pending)}). '
+                'Appliquez-les avec `python -m pretix migrate` sans SORTIR_AUDIT_DATABASE, puis relancez.'
+            )
+
+    def init_database(self, alias, models):
+        from django.db.migrations.loader import MigrationLoader
+        from django.db.migrations.recorder import MigrationRecorder
+        from pretix_sortir.routers import APP_LABEL
+
+        connection = connections[alias]
+        existing = set(connection.introspection.table_names())
+        if any(model._meta.db_table in existing for model in models):
+            raise CommandError('Les tables du journal d\'audit existent déjà sur cette base')
+
+        with transaction.atomic(using=alias):
+            with connection.schema_editor() as schema_editor:
+                for model in models:
+                    schema_editor.create_model(model)
+
+            recorder = MigrationRecorder(connection)
+            recorder.ensure_schema()
+            loader = MigrationLoader(connection)
+            for app_label, name in sorted(loader.disk_migrations):
+                if app_label == APP_LABEL and (app_label, name) not in loader.applied_migrations:
+                    recorder.record_applied(app_label, name)
+
+        self.stdout.write(self.style.SUCCESS('✓ Tables créées, migrations Sortir! marquées comme appliquées'))
+
+    def copy_model(self, alias, model, batch_size):
+        source = model.objects.using(DEFAULT_DB_ALIAS)
+        target = model.objects.using(alias)
+        last_pk = target.aggregate(last=Max('pk'))['last'] or 0
+        copied = 0
+
+        while True:
+            batch = list(source.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic(using=alias):
+                target.bulk_create(batch)
+            copied += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f'  {model._meta.verbose_name} : {copied} copiée(s) (id ≤ {last_pk})')
+
+        # Les identifiants ont été conservés : la séquence reprend après le plus grand
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [model]):
+                cursor.execute(sql)
+
+        self.stdout.write(self.style.SUCCESS(f'✓ {copied} {model._meta.verbose_name_plural} recopiée(s)'))
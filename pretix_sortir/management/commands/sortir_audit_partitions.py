@@ -0,0 +1,61 @@
+"""
+Commande de gestion du partitionnement mensuel du journal d'audit Sortir! (PostgreSQL)
+
+Usage:
+    python -m pretix sortir_audit_partitions [--convert] [--months-ahead=3] [--batch-size=10000]
+    python -m pretix sortir_audit_partitions --list
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Convertit le journal d\'audit Sortir! en table partitionnée par mois et gère ses partitions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            help='Convertit la table d\'audit en table partitionnée (reprend une conversion interrompue)',
+        )
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=3,
+            help='Nombre de mois futurs pour lesquels créer une partition (défaut: 3)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Nombre d\'entrées recopiées par transaction lors de la conversion (défaut: 10000)',
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='Affiche les partitions existantes',
+        )
+
+    def handle(self, *args, **options):
+        from pretix_sortir import partitioning
+
+        if not partitioning.is_supported():
+            raise CommandError('Le partitionnement du journal d\'audit nécessite PostgreSQL')
+
+        if options['convert']:
+            partitioning.convert_to_partitioned(
+                months_ahead=options['months_ahead'],
+                batch_size=options['batch_size'],
+                stdout=self.stdout,
+            )
+        elif not partitioning.is_partitioned():
+            raise CommandError('La table d\'audit n\'est pas partitionnée (utilisez --convert)')
+        else:
+            for name in partitioning.ensure_partitions(options['months_ahead']):
+                self.stdout.write(self.style.SUCCESS(f'✓ Partition {name} créée'))
+
+        if options['list']:
+            for month, name in partitioning.list_partitions():
+                self.stdout.write(f'  {month:%Y-%m} : {name}')
+
+        self.stdout.write(self.style.SUCCESS('✓ Partitions du journal d\'audit à jour'))
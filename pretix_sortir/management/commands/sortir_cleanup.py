@@ -3,16 +3,33 @@ Commande de maintenance pour purger les anciennes données Sortir! (RGPD - PHASE
 
 Usage:
     python -m pretix sortir_cleanup [--dry-run] [--days-usage=90] [--days-audit=365]
+                                    [--batch-size=1000] [--sleep=0.1] [--max-runtime=0] [--restart]
+
+Les suppressions se font par lots de clés primaires (transactions courtes, pas de
+chargement d'instances) avec une pause entre les lots. La progression est enregistrée
+en cache : une exécution interrompue (ou arrêtée par --max-runtime) reprend où elle s'était arrêtée.
 """
 
 import logging
+import time
 from datetime import timedelta
+from django.core.cache import cache
 from django.core.management.base import BaseCommand
+from django.db.models import Count, DateTimeField, DurationField, ExpressionWrapper, F, Max, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.utils import timezone
 from django_scopes import scopes_disabled
 
 logger = logging.getLogger('pretix.plugins.sortir')
 
+# Progression de la dernière exécution interrompue
+CHECKPOINT_CACHE_KEY = 'sortir_cleanup_checkpoint'
+CHECKPOINT_TIMEOUT = 7 * 24 * 3600
+
+
+class RuntimeBudgetExceeded(Exception):
+    """Levée quand --max-runtime est atteint : la progression est conservée pour la reprise."""
+
 
 class Command(BaseCommand):
     help = 'Purge les anciennes données Sortir! selon la politique de rétention RGPD'
@@ -35,112 +52,260 @@ class Command(BaseCommand):
             default=None,
             help='Nombre de jours de rétention pour AuditLog (défaut: depuis config organisateur)',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Nombre de lignes supprimées par transaction (défaut: 1000)',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.1,
+            help='Pause en secondes entre deux lots (défaut: 0.1)',
+        )
+        parser.add_argument(
+            '--max-runtime',
+            type=int,
+            default=0,
+            help='Durée maximale d\'exécution en secondes, 0 = illimitée (la suite reprend au prochain lancement)',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore la progression enregistrée et repart du début',
+        )
 
     def handle(self, *args, **options):
-        from pretix_sortir.models import SortirUsage, SortirAuditLog, SortirOrganizerSettings
+        from pretix_sortir.models import SortirOrganizerSettings
 
-        dry_run = options['dry_run']
+        self.dry_run = options['dry_run']
+        self.batch_size = max(options['batch_size'], 1)
+        self.sleep = options['sleep']
+        self.deadline = time.monotonic() + options['max_runtime'] if options['max_runtime'] else None
+        self.checkpoint = {} if options['restart'] else (cache.get(CHECKPOINT_CACHE_KEY) or {})
         custom_days_usage = options['days_usage']
         custom_days_audit = options['days_audit']
 
         self.stdout.write(self.style.SUCCESS('=== Sortir! Data Cleanup - RGPD ==='))
-        if dry_run:
+        if self.dry_run:
             self.stdout.write(self.style.WARNING('MODE DRY-RUN : Aucune suppression réelle'))
+        elif self.checkpoint:
+            self.stdout.write(self.style.WARNING('Reprise de l\'exécution précédente interrompue'))
+
+        # Compteurs tenus par les étapes (à jour même si --max-runtime les interrompt)
+        self.deleted_usage = 0
+        self.deleted_audit = 0
 
         with scopes_disabled():
-            # 1. NETTOYAGE DES PENDING ORPHELINS (paniers abandonnés > 10 min)
-            self.stdout.write('\n--- Nettoyage SortirUsage pending orphelins ---')
-            expiry_threshold = timezone.now() - timedelta(minutes=10)
-
-            old_pending = SortirUsage.objects.filter(
-                status='pending',
-                order__isnull=True,
-                created_at__lt=expiry_threshold
-            )
+            # Une ligne par organisateur, sans instancier les settings (ni déchiffrer les tokens)
+            org_retentions = list(SortirOrganizerSettings.objects.values_list(
+                'organizer_id', 'organizer__name', 'audit_retention_days'
+            ).order_by('organizer_id'))
 
-            count_pending = old_pending.count()
-            if count_pending > 0:
-                if not dry_run:
-                    old_pending.delete()
-                self.stdout.write(self.style.SUCCESS(f'✓ {count_pending} SortirUsage pending orphelins supprimés (paniers abandonnés)'))
+            try:
+                self.purge_pending_usages()
+                self.purge_expired_usages(custom_days_usage)
+                self.purge_audit_log(org_retentions, custom_days_audit)
+            except RuntimeBudgetExceeded:
+                cache.set(CHECKPOINT_CACHE_KEY, self.checkpoint, CHECKPOINT_TIMEOUT)
+                self.stdout.write(self.style.WARNING(
+                    '\nDurée maximale atteinte : progression enregistrée, relancez la commande pour continuer'
+                ))
             else:
-                self.stdout.write('  Aucun pending orphelin à nettoyer')
-
-            # 2. Purge SortirUsage anciens (RGPD)
-            self.stdout.write('\n--- Purge SortirUsage (RGPD) ---')
-            total_deleted_usage = 0
-
-            for org_settings in SortirOrganizerSettings.objects.all():
-                retention_days = custom_days_usage if custom_days_usage else org_settings.data_retention_days
-                cutoff_date = timezone.now() - timedelta(days=retention_days)
-
-                # Trouve les événements terminés
-                old_usages = SortirUsage.objects.filter(
-                    event__organizer=org_settings.organizer,
-                    created_at__lt=cutoff_date
-                ).select_related('event')
-
-                count = old_usages.count()
-                if count > 0:
-                    self.stdout.write(
-                        f'  Organisateur: {org_settings.organizer.name} '
-                        f'({count} SortirUsage de plus de {retention_days} jours)'
-                    )
-
-                    if not dry_run:
-                        deleted = old_usages.delete()
-                        self.stdout.write(self.style.SUCCESS(f'    ✓ Supprimé: {deleted[0]} enregistrements'))
-                        total_deleted_usage += deleted[0]
-                    else:
-                        for usage in old_usages[:5]:  # Affiche les 5 premiers
-                            self.stdout.write(
-                                f'    - Usage ID {usage.id}: Carte ***{usage.sortir_number_suffix} '
-                                f'(Event: {usage.event.slug}, Date: {usage.created_at.date()})'
-                            )
-                        if count > 5:
-                            self.stdout.write(f'    ... et {count - 5} autres')
-
-            # Purge AuditLog
-            self.stdout.write('\n--- Purge AuditLog ---')
-            total_deleted_audit = 0
-
-            for org_settings in SortirOrganizerSettings.objects.all():
-                retention_days = custom_days_audit if custom_days_audit else org_settings.audit_retention_days
-                cutoff_date = timezone.now() - timedelta(days=retention_days)
-
-                old_audits = SortirAuditLog.objects.filter(
-                    organizer=org_settings.organizer,
-                    timestamp__lt=cutoff_date
-                )
-
-                count = old_audits.count()
-                if count > 0:
-                    self.stdout.write(
-                        f'  Organisateur: {org_settings.organizer.name} '
-                        f'({count} AuditLog de plus de {retention_days} jours)'
-                    )
-
-                    if not dry_run:
-                        deleted = old_audits.delete()
-                        self.stdout.write(self.style.SUCCESS(f'    ✓ Supprimé: {deleted[0]} enregistrements'))
-                        total_deleted_audit += deleted[0]
-                    else:
-                        for audit in old_audits[:5]:
-                            self.stdout.write(
-                                f'    - Audit ID {audit.id}: {audit.action} '
-                                f'({audit.severity}, Date: {audit.timestamp.date()})'
-                            )
-                        if count > 5:
-                            self.stdout.write(f'    ... et {count - 5} autres')
+                if not self.dry_run:
+                    cache.delete(CHECKPOINT_CACHE_KEY)
 
             # Résumé
+            total_deleted_usage, total_deleted_audit = self.deleted_usage, self.deleted_audit
             self.stdout.write('\n=== Résumé ===')
-            if not dry_run:
+            if not self.dry_run:
                 self.stdout.write(self.style.SUCCESS(f'✓ SortirUsage supprimés : {total_deleted_usage}'))
                 self.stdout.write(self.style.SUCCESS(f'✓ AuditLog supprimés : {total_deleted_audit}'))
                 self.stdout.write(self.style.SUCCESS(f'✓ Total : {total_deleted_usage + total_deleted_audit}'))
             else:
                 self.stdout.write(self.style.WARNING('Mode DRY-RUN : Aucune suppression effectuée'))
-                self.stdout.write(f'  Seraient supprimés : {total_deleted_usage} SortirUsage + {total_deleted_audit} AuditLog')
+                self.stdout.write(
+                    f'  Seraient supprimés : {total_deleted_usage} SortirUsage + {total_deleted_audit} AuditLog'
+                )
 
             self.stdout.write(self.style.SUCCESS('\n✓ Nettoyage terminé'))
+
+    def purge_pending_usages(self):
+        """Réservations 'pending' orphelines (paniers abandonnés depuis plus de 10 minutes)"""
+        from pretix_sortir.models import SortirUsage
+
+        self.stdout.write('\n--- Nettoyage SortirUsage pending orphelins ---')
+        expiry_threshold = timezone.now() - timedelta(minutes=10)
+
+        count_pending = self.purge('pending', SortirUsage.objects.filter(
+            status='pending',
+            order__isnull=True,
+            created_at__lt=expiry_threshold
+        ))
+        if count_pending > 0:
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ {count_pending} SortirUsage pending orphelins supprimés (paniers abandonnés)'
+            ))
+        else:
+            self.stdout.write('  Aucun pending orphelin à nettoyer')
+
+    def purge_expired_usages(self, custom_days):
+        """
+        SortirUsage d'événements terminés depuis plus que la durée de conservation (RGPD).
+
+        Rétention comptée depuis la fin de l'événement, calculée en SQL pour tous
+        les organisateurs à la fois (une seule requête, voir expired_usages).
+        """
+        self.stdout.write('\n--- Purge SortirUsage (RGPD) ---')
+
+        expired = self.expired_usages(custom_days)
+        if self.dry_run:
+            for organizer_name, count in expired.values_list('event__organizer__name').annotate(
+                count=Count('pk')
+            ).order_by('event__organizer__name'):
+                self.stdout.write(f'  Organisateur: {organizer_name} ({count} SortirUsage expirés)')
+
+        self.deleted_usage = self.purge('usage', expired)
+        if self.deleted_usage > 0:
+            self.stdout.write(self.style.SUCCESS(
+                f'  ✓ {self.deleted_usage} SortirUsage d\'événements terminés '
+                f'depuis plus que la durée de conservation'
+            ))
+        else:
+            self.stdout.write('  Aucun SortirUsage expiré')
+
+    def purge_audit_log(self, org_retentions, custom_days):
+        """Entrées du journal d'audit plus anciennes que la durée de conservation de leur organisateur"""
+        from pretix_sortir.models import SortirAuditLog, SortirOrganizerSettings
+
+        self.stdout.write('\n--- Purge AuditLog ---')
+        self.drop_audit_partitions(org_retentions, custom_days)
+
+        for organizer_id, organizer_name, audit_retention_days in org_retentions:
+            retention_days = custom_days if custom_days else audit_retention_days
+            cutoff_date = timezone.now() - timedelta(days=retention_days)
+
+            deleted = self.purge(f'audit:{organizer_id}', SortirAuditLog.objects.filter(
+                organizer_id=organizer_id,
+                timestamp__lt=cutoff_date
+            ))
+            if deleted > 0:
+                self.stdout.write(self.style.SUCCESS(
+                    f'  ✓ Organisateur {organizer_name} : {deleted} AuditLog de plus de {retention_days} jours'
+                ))
+                self.deleted_audit += deleted
+
+        # Entrées d'organisateurs supprimés ou sans configuration Sortir! (conservées
+        # après suppression, voir SortirAuditLog) : durée de conservation par défaut
+        default_retention = SortirOrganizerSettings._meta.get_field('audit_retention_days').default
+        retention_days = custom_days or default_retention
+        deleted = self.purge('audit:orphans', SortirAuditLog.objects.exclude(
+            organizer_id__in=[organizer_id for organizer_id, _name, _days in org_retentions]
+        ).filter(
+            timestamp__lt=timezone.now() - timedelta(days=retention_days)
+        ))
+        if deleted > 0:
+            self.stdout.write(self.style.SUCCESS(
+                f'  ✓ {deleted} AuditLog sans organisateur configuré de plus de {retention_days} jours'
+            ))
+            self.deleted_audit += deleted
+
+    def drop_audit_partitions(self, org_retentions, custom_days):
+        """
+        Table partitionnée : les mois entièrement expirés pour TOUS les organisateurs
+        (rétention la plus longue) sont supprimés d'un bloc, sans DELETE.
+        """
+        from pretix_sortir import partitioning
+
+        if not partitioning.is_partitioned():
+            return
+        longest_retention = custom_days or max(
+            (audit_days for _id, _name, audit_days in org_retentions), default=None
+        )
+        if not longest_retention:
+            return
+        dropped = partitioning.drop_partitions_before(
+            timezone.now() - timedelta(days=longest_retention), dry_run=self.dry_run
+        )
+        for name in dropped:
+            self.stdout.write(self.style.SUCCESS(f'  ✓ Partition {name} supprimée'))
+
+    def expired_usages(self, custom_days=None):
+        """
+        SortirUsage dont l'événement est terminé depuis plus longtemps que la durée de conservation.
+
+        Fin d'événement = COALESCE(date_to, date_from), ou pour une série (has_subevents) la
+        plus tardive de ses dates : Event.date_from n'y est que la première date, et une série
+        encore en cours ne doit pas être purgée. Durée = data_retention_days de l'organisateur
+        (ou --days-usage). Les événements éligibles sont calculés dans une sous-requête, les
+        usages sont ensuite trouvés par l'index (event, ...).
+
+        Les usages 'validated' (grant APRAS pas encore envoyé) ne sont jamais purgés.
+        """
+        from pretix.base.models import Event
+        from pretix_sortir.models import SortirUsage
+
+        if custom_days:
+            retention = Value(timedelta(days=custom_days), output_field=DurationField())
+        else:
+            retention = ExpressionWrapper(
+                F('organizer__sortir_settings__data_retention_days') * Value(timedelta(days=1)),
+                output_field=DurationField()
+            )
+
+        event_end = Coalesce('date_to', 'date_from')
+        # Fin de chaque date de la série, puis la plus tardive (une date sans date_to compte
+        # pour sa date_from, même si d'autres dates plus anciennes ont une date_to)
+        series_end = Coalesce(Max(Coalesce('subevents__date_to', 'subevents__date_from')), event_end)
+
+        expired_events = Event.objects.annotate(
+            sortir_purge_after=ExpressionWrapper(
+                Greatest(series_end, event_end) + retention,
+                output_field=DateTimeField()
+            )
+        ).filter(
+            organizer__sortir_settings__isnull=False,
+            sortir_purge_after__lt=timezone.now()
+        ).values('pk')
+
+        return SortirUsage.objects.filter(event_id__in=expired_events).exclude(status='validated')
+
+    def purge(self, step, queryset):
+        """
+        Supprime les lignes de la requête par lots de clés primaires croissantes.
+
+        Chaque lot est un SELECT de pk borné suivi d'un DELETE ... WHERE pk IN (...) :
+        aucune instance n'est chargée (pas de cascade ni de signal sur ces modèles).
+        Après chaque lot, la dernière pk traitée est enregistrée dans le checkpoint de l'étape.
+
+        Returns:
+            Le nombre de lignes supprimées (ou qui le seraient en dry-run)
+        """
+        if self.dry_run:
+            return queryset.count()
+
+        deleted = 0
+        last_pk = self.checkpoint.get(step, 0)
+        model = queryset.model
+
+        while True:
+            if self.deadline and time.monotonic() >= self.deadline:
+                raise RuntimeBudgetExceeded()
+
+            pks = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:self.batch_size])
+            if not pks:
+                break
+
+            deleted += model.objects.filter(pk__in=pks).delete()[0]
+            last_pk = pks[-1]
+            self.checkpoint[step] = last_pk
+            cache.set(CHECKPOINT_CACHE_KEY, self.checkpoint, CHECKPOINT_TIMEOUT)
+
+            if len(pks) < self.batch_size:
+                break
+            if self.sleep:
+                time.sleep(self.sleep)
+
+        self.checkpoint.pop(step, None)
+        return deleted
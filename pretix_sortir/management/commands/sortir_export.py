@@ -0,0 +1,111 @@
+"""
+Commande d'export des données Sortir! (reporting APRAS, demandes d'accès RGPD)
+
+Usage:
+    python -m pretix sortir_export usages|audit [--format=csv|jsonl] [--organizer=slug] [--event=slug]
+                                  [--from=AAAA-MM-JJ] [--to=AAAA-MM-JJ] [--status=...] [--severity=...]
+                                  [--output=fichier] [--chunk-size=2000]
+"""
+
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from django_scopes import scopes_disabled
+
+
+class Command(BaseCommand):
+    help = 'Exporte les utilisations ou le journal d\'audit Sortir! en CSV ou JSON Lines (flux continu)'
+
+    def add_arguments(self, parser):
+        from pretix_sortir.models import SortirAuditLog, SortirUsage
+
+        parser.add_argument(
+            'dataset',
+            choices=['usages', 'audit'],
+            help='Données à exporter : utilisations (SortirUsage) ou journal d\'audit (SortirAuditLog)',
+        )
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            default='csv',
+            help='Format de sortie (défaut: csv)',
+        )
+        parser.add_argument('--organizer', help='Slug de l\'organisateur')
+        parser.add_argument('--event', help='Slug de l\'événement (nécessite --organizer)')
+        parser.add_argument('--from', dest='date_from', help='Date de début incluse (AAAA-MM-JJ)')
+        parser.add_argument('--to', dest='date_to', help='Date de fin incluse (AAAA-MM-JJ)')
+        parser.add_argument(
+            '--status',
+            choices=[status for status, _label in SortirUsage.STATUS_CHOICES],
+            help='Statut des utilisations (usages uniquement)',
+        )
+        parser.add_argument(
+            '--severity',
+            choices=[severity for severity, _label in SortirAuditLog.SEVERITY_CHOICES],
+            help='Gravité des entrées d\'audit (audit uniquement)',
+        )
+        parser.add_argument(
+            '--output',
+            help='Fichier de sortie (défaut: sortie standard)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Nombre de lignes lues par lot via le curseur serveur (défaut: 2000)',
+        )
+
+    def _parse_date(self, value, option):
+        if not value:
+            return None
+        date = parse_date(value)
+        if date is None:
+            raise CommandError(f'Date invalide pour {option} : {value} (format attendu AAAA-MM-JJ)')
+        return date
+
+    def handle(self, *args, **options):
+        from pretix.base.models import Event, Organizer
+        from pretix_sortir.exporters import (
+            AUDIT_FIELDS, AUDIT_RELATED, USAGE_FIELDS, audit_queryset, usage_queryset, write_export,
+        )
+
+        if options['event'] and not options['organizer']:
+            raise CommandError('--event nécessite --organizer')
+
+        date_from = self._parse_date(options['date_from'], '--from')
+        date_to = self._parse_date(options['date_to'], '--to')
+
+        with scopes_disabled():
+            organizer = None
+            events = None
+            if options['organizer']:
+                try:
+                    organizer = Organizer.objects.get(slug=options['organizer'])
+                except Organizer.DoesNotExist:
+                    raise CommandError(f'Organisateur introuvable : {options["organizer"]}')
+            if options['event']:
+                events = Event.objects.filter(organizer=organizer, slug=options['event'])
+                if not events.exists():
+                    raise CommandError(f'Événement introuvable : {options["event"]}')
+                organizer = None
+
+            if options['dataset'] == 'usages':
+                queryset = usage_queryset(events=events, organizer=organizer, date_from=date_from,
+                                          date_to=date_to, status=options['status'])
+                fields = USAGE_FIELDS
+                related = None
+            else:
+                queryset = audit_queryset(events=events, organizer=organizer, date_from=date_from,
+                                          date_to=date_to, severity=options['severity'])
+                fields = AUDIT_FIELDS
+                related = AUDIT_RELATED
+
+            if options['output']:
+                with open(options['output'], 'w', encoding='utf-8', newline='') as fp:
+                    count = write_export(queryset, fields, options['format'], fp, chunk_size=options['chunk_size'],
+                                         related=related)
+            else:
+                count = write_export(queryset, fields, options['format'], sys.stdout, chunk_size=options['chunk_size'],
+                                     related=related)
+
+        self.stderr.write(self.style.SUCCESS(f'✓ {count} ligne(s) exportée(s)'))
@@ -0,0 +1,55 @@
+"""
+Commande de publication des assets statiques Sortir! (étape de build/déploiement)
+
+Usage:
+    python -m pretix sortir_publish_assets [--check] [--collect] [--bump-cache]
+
+Met à jour static/pretix_sortir/manifest.json (empreintes des assets, espace de noms du
+cache). Idempotente : sans changement d'asset, le manifeste n'est pas réécrit.
+À lancer après modification de sortir.js / sortir.css (avant de construire le paquet) ou au
+déploiement, suivie de `python -m pretix rebuild` (ou avec --collect).
+"""
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Publie les assets Sortir! : manifeste versionné, collectstatic, espace de noms du cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Échoue si le manifeste n\'est pas à jour, sans rien écrire (CI)',
+        )
+        parser.add_argument(
+            '--collect',
+            action='store_true',
+            help='Lance collectstatic après la mise à jour du manifeste',
+        )
+        parser.add_argument(
+            '--bump-cache',
+            action='store_true',
+            help='Change l\'espace de noms du cache même si aucun asset n\'a changé',
+        )
+
+    def handle(self, *args, **options):
+        from pretix_sortir.assets import build_manifest, read_manifest, write_manifest
+
+        previous = read_manifest()
+        manifest = build_manifest(previous, bump=options['bump_cache'])
+
+        if manifest == previous:
+            self.stdout.write(f'  Manifeste à jour (version {manifest["version"]})')
+        elif options['check']:
+            raise CommandError('Manifeste des assets Sortir! obsolète : lancez sortir_publish_assets')
+        else:
+            write_manifest(manifest)
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ Manifeste version {manifest["version"]}, espace de noms du cache {manifest["namespace"]}'
+            ))
+
+        if options['collect'] and not options['check']:
+            call_command('collectstatic', interactive=False, verbosity=0)
+            self.stdout.write(self.style.SUCCESS('✓ Fichiers statiques collectés'))
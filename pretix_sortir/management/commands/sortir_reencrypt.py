@@ -0,0 +1,127 @@
+"""
+Commande de rechiffrement des tokens API Sortir! après une rotation de clé
+
+Usage:
+    python -m pretix sortir_reencrypt --rotate
+    python -m pretix sortir_reencrypt [--dry-run] [--batch-size=500]
+
+Rotation sans interruption :
+1. Ajouter une nouvelle clé en tête (--rotate pour le fichier de clés du datadir, sinon
+   en tête de SORTIR_ENCRYPTION_KEY). --rotate ne fait que cela : aucun token n'est
+   rechiffré dans la même exécution.
+2. Déployer la nouvelle clé et redémarrer TOUS les processus Pretix (web, Celery) : la
+   nouvelle clé chiffre, les anciennes déchiffrent toujours. Un processus qui tourne
+   encore avec l'ancien trousseau ne saurait pas lire un token rechiffré.
+3. Lancer cette commande sans --rotate : chaque api_token est rechiffré avec la clé courante.
+4. Une fois tous les tokens rechiffrés, les anciennes clés peuvent être retirées.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import TextField
+from django.db.models.functions import Cast
+
+
+class Command(BaseCommand):
+    help = 'Rechiffre les tokens API Sortir! avec la clé de chiffrement courante'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rotate',
+            action='store_true',
+            help='Ajoute une nouvelle clé en tête du fichier de clés du datadir, sans rien rechiffrer',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Affiche le nombre de tokens à rechiffrer sans les modifier',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Nombre de configurations traitées par transaction (défaut: 500)',
+        )
+
+    def handle(self, *args, **options):
+        from pretix_sortir.fields import get_keyring
+        from pretix_sortir.models import SortirOrganizerSettings
+
+        if options['rotate']:
+            # Étape séparée : les processus en cours n'ont pas encore la nouvelle clé
+            if not options['dry_run']:
+                self.rotate_key()
+            return
+
+        keyring = get_keyring()
+        batch_size = max(options['batch_size'], 1)
+        counts = {'current': 0, 'reencrypted': 0, 'encrypted': 0, 'invalid': 0}
+
+        # Valeur brute en base (Cast : pas de déchiffrement par EncryptedTextField)
+        queryset = SortirOrganizerSettings.objects.exclude(api_token='').annotate(
+            raw_token=Cast('api_token', output_field=TextField())
+        )
+
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'raw_token')[:batch_size])
+            if not batch:
+                break
+
+            with transaction.atomic():
+                for pk, raw_token in batch:
+                    new_value = self.reencrypted_value(keyring, pk, raw_token, counts)
+                    if new_value is not None and not options['dry_run']:
+                        # Ne modifie pas un token changé entre-temps depuis l'interface
+                        queryset.filter(pk=pk, raw_token=raw_token).update(api_token=new_value)
+
+            last_pk = batch[-1][0]
+
+        prefix = 'Seraient rechiffrés' if options['dry_run'] else 'Rechiffrés'
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {prefix} : {counts["reencrypted"]} token(s), chiffrés : {counts["encrypted"]} token(s) en clair, '
+            f'déjà à jour : {counts["current"]}, indéchiffrables : {counts["invalid"]}'
+        ))
+
+    def rotate_key(self):
+        """Ajoute une nouvelle clé en tête du fichier de clés du datadir"""
+        from django.core.exceptions import ImproperlyConfigured
+        from pretix_sortir.fields import add_encryption_key
+
+        try:
+            version = add_encryption_key()
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.WARNING(
+            f'Nouvelle clé (version {version}) ajoutée. Aucun token n\'a été rechiffré : déployez la clé, '
+            f'redémarrez tous les processus Pretix (web, Celery), puis lancez sortir_reencrypt sans --rotate'
+        ))
+
+    def reencrypted_value(self, keyring, pk, raw_token, counts):
+        """
+        Nouvelle valeur à écrire pour un token brut, et mise à jour des compteurs.
+
+        Returns:
+            La valeur à écrire, ou None si le token est déjà à jour ou indéchiffrable
+        """
+        from cryptography.fernet import InvalidToken
+
+        if not raw_token.startswith('gAAAAA'):
+            # Ancien token en clair : chiffré par EncryptedTextField à l'écriture
+            counts['encrypted'] += 1
+            return raw_token
+
+        if keyring.key_version(raw_token) == keyring.current_version:
+            counts['current'] += 1
+            return None
+
+        try:
+            new_value = keyring.rotate(raw_token)
+        except InvalidToken:
+            counts['invalid'] += 1
+            self.stdout.write(self.style.ERROR(
+                f'  Configuration {pk} : token indéchiffrable avec les clés connues (à ressaisir)'
+            ))
+            return None
+        counts['reencrypted'] += 1
+        return new_value
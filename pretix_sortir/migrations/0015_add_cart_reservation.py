@@ -0,0 +1,27 @@
+# Generated manually for deterministic cart reservations
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pretix_sortir', '0014_auto_enable_api'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sortirusage',
+            name='cart_id',
+            field=models.CharField(blank=True, default='', help_text='Panier Pretix auquel la réservation est rattachée', max_length=255, verbose_name='ID de panier'),
+        ),
+        migrations.AddField(
+            model_name='sortirusage',
+            name='cart_position_id',
+            field=models.PositiveIntegerField(blank=True, help_text='Position de panier qui a réclamé cette réservation', null=True, verbose_name='Position de panier'),
+        ),
+        migrations.AddIndex(
+            model_name='sortirusage',
+            index=models.Index(fields=['event', 'cart_id', 'status'], name='pretix_sort_cart_id_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated manually for order cancellation release
+"""
+Libère les SortirUsage des commandes déjà annulées/expirées avant l'ajout du handler
+release_order_usages, pour que la vérification anti-réutilisation puisse se contenter
+d'un filtre sur le statut.
+"""
+
+from django.db import migrations
+
+
+def release_cancelled_orders(apps, schema_editor):
+    """Passe en 'cancelled' les usages actifs des commandes annulées ou expirées"""
+    SortirUsage = apps.get_model('pretix_sortir', 'SortirUsage')
+
+    # Statuts Order Pretix : 'c' = annulée, 'e' = expirée
+    updated = SortirUsage.objects.filter(
+        status__in=['pending', 'validated', 'used'],
+        order__status__in=['c', 'e'],
+        event__organizer__sortir_settings__release_on_cancel=True,
+    ).update(status='cancelled')
+
+    if updated > 0:
+        print(f"[Sortir] {updated} utilisation(s) libérée(s) pour des commandes annulées/expirées")
+
+
+def noop(apps, schema_editor):
+    """Rollback: ne fait rien, les usages libérés restent annulés"""
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pretix_sortir', '0015_add_cart_reservation'),
+    ]
+
+    operations = [
+        migrations.RunPython(release_cancelled_orders, noop),
+    ]
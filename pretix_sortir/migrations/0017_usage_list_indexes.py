@@ -0,0 +1,29 @@
+# Generated manually for usage list keyset pagination and search
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pretix_sortir', '0016_release_cancelled_orders'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sortirusage',
+            index=models.Index(fields=['event', 'created_at', 'id'], name='pretix_sort_event_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sortirusage',
+            index=models.Index(fields=['event', 'status', 'created_at', 'id'], name='pretix_sort_evt_status_crt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sortirusage',
+            index=models.Index(fields=['event', 'sortir_number_suffix'], name='pretix_sort_event_suffix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sortirusage',
+            index=models.Index(fields=['event', 'apras_request_id'], name='pretix_sort_event_apras_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated manually for SQL-based retention purge
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pretix_sortir', '0017_usage_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sortirusage',
+            index=models.Index(condition=models.Q(('order__isnull', True), ('status', 'pending')), fields=['created_at'], name='pretix_sort_pending_orphan_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sortirauditlog',
+            index=models.Index(fields=['organizer', 'timestamp'], name='pretix_sort_audit_org_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated manually for deduplicated audit user agents
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pretix_sortir', '0018_retention_purge_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SortirUserAgent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False)),
+                ('value_hash', models.CharField(max_length=64, unique=True, verbose_name='Hash du user agent')),
+                ('value', models.TextField(verbose_name='User Agent')),
+            ],
+            options={
+                'verbose_name': 'User agent Sortir!',
+                'verbose_name_plural': 'User agents Sortir!',
+            },
+        ),
+        migrations.AddField(
+            model_name='sortirauditlog',
+            name='user_agent_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='pretix_sortir.sortiruseragent', verbose_name='User Agent'),
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated manually for deduplicated audit user agents
+"""
+Convertit les user agents existants du journal d'audit vers la table SortirUserAgent,
+puis supprime la colonne texte.
+
+Les lignes sont traitées par lots de clés primaires croissantes, chaque lot dans sa
+propre transaction (migration non atomique) : pas de verrou long sur la table d'audit.
+Les adresses IPv4 encapsulées en IPv6 sont ramenées à leur forme IPv4 au passage.
+"""
+
+import hashlib
+import ipaddress
+from collections import defaultdict
+from django.db import migrations, transaction
+
+BATCH_SIZE = 5000
+
+
+def _compact_ip(value):
+    try:
+        ip = ipaddress.ip_address(value)
+    except ValueError:
+        return None
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return str(ip)
+
+
+def convert_user_agents(apps, schema_editor):
+    """Remplit user_agent_ref et normalise ip_address, lot par lot"""
+    SortirAuditLog = apps.get_model('pretix_sortir', 'SortirAuditLog')
+    SortirUserAgent = apps.get_model('pretix_sortir', 'SortirUserAgent')
+
+    ua_ids = {}
+    last_pk = 0
+    converted = 0
+
+    while True:
+        batch = list(
+            SortirAuditLog.objects.filter(pk__gt=last_pk).order_by('pk').values_list(
+                'pk', 'user_agent', 'ip_address'
+            )[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+
+        pks_by_ua = defaultdict(list)
+        ips = {}
+        for pk, user_agent, ip_address in batch:
+            if user_agent:
+                pks_by_ua[user_agent].append(pk)
+            if ip_address and ip_address.lower().startswith('::ffff:'):
+                ips[pk] = _compact_ip(ip_address)
+
+        with transaction.atomic():
+            for user_agent, pks in pks_by_ua.items():
+                if user_agent not in ua_ids:
+                    ua_ids[user_agent] = SortirUserAgent.objects.get_or_create(
+                        value_hash=hashlib.sha256(user_agent.encode('utf-8')).hexdigest(),
+                        defaults={'value': user_agent}
+                    )[0].pk
+                converted += SortirAuditLog.objects.filter(pk__in=pks).update(user_agent_ref_id=ua_ids[user_agent])
+            for pk, ip_address in ips.items():
+                SortirAuditLog.objects.filter(pk=pk).update(ip_address=ip_address)
+
+        last_pk = batch[-1][0]
+
+    if converted > 0:
+        print(f"[Sortir] {converted} entrée(s) d'audit converties ({len(ua_ids)} user agent(s) distinct(s))")
+
+
+def restore_user_agents(apps, schema_editor):
+    """Rollback: recopie la valeur du user agent dans la colonne texte"""
+    SortirAuditLog = apps.get_model('pretix_sortir', 'SortirAuditLog')
+    SortirUserAgent = apps.get_model('pretix_sortir', 'SortirUserAgent')
+
+    for ua_id, value in SortirUserAgent.objects.values_list('pk', 'value').iterator():
+        SortirAuditLog.objects.filter(user_agent_ref_id=ua_id).update(user_agent=value)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('pretix_sortir', '0019_audit_user_agent_lookup'),
+    ]
+
+    operations = [
+        migrations.RunPython(convert_user_agents, restore_user_agents),
+        migrations.RemoveField(
+            model_name='sortirauditlog',
+            name='user_agent',
+        ),
+    ]
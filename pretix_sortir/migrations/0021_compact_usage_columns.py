@@ -0,0 +1,38 @@
+# Generated manually for compact SortirUsage hash and status columns
+"""
+Ajoute les colonnes compactes (hash binaire, statut en entier court) à côté des colonnes
+existantes. Elles sont remplies par 0022 puis prennent la place des anciennes dans 0023.
+"""
+
+import pretix_sortir.fields
+from django.db import migrations
+
+STATUS_CHOICES = [
+    ('pending', 'En attente'),
+    ('validated', 'Validé'),
+    ('used', 'Utilisé'),
+    ('cancelled', 'Annulé'),
+    ('expired', 'Expiré'),
+]
+
+STATUS_CODES = {'pending': 1, 'validated': 2, 'used': 3, 'cancelled': 4, 'expired': 5}
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pretix_sortir', '0020_convert_audit_user_agents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sortirusage',
+            name='sortir_number_hash_bin',
+            field=pretix_sortir.fields.HexBinaryField(editable=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sortirusage',
+            name='status_code',
+            field=pretix_sortir.fields.CodedChoiceField(choices=STATUS_CHOICES, codes=STATUS_CODES, null=True),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated manually for compact SortirUsage hash and status columns
+"""
+Remplit les colonnes compactes de SortirUsage par lots de clés primaires croissantes.
+
+Migration non atomique : chaque lot est une transaction courte, la table reste utilisable
+pendant la conversion. Les lignes créées ou modifiées entre-temps sont rattrapées par 0023.
+"""
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 5000
+
+
+def fill_compact_columns(apps, schema_editor):
+    """Copie sortir_number_hash et status vers leurs colonnes compactes, lot par lot"""
+    SortirUsage = apps.get_model('pretix_sortir', 'SortirUsage')
+
+    last_pk = 0
+    converted = 0
+
+    while True:
+        batch = list(
+            SortirUsage.objects.filter(pk__gt=last_pk).order_by('pk').values_list(
+                'pk', 'sortir_number_hash', 'status'
+            )[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+
+        usages = [
+            SortirUsage(pk=pk, sortir_number_hash_bin=number_hash, status_code=status)
+            for pk, number_hash, status in batch
+        ]
+        with transaction.atomic():
+            SortirUsage.objects.bulk_update(usages, ['sortir_number_hash_bin', 'status_code'], batch_size=1000)
+
+        converted += len(batch)
+        last_pk = batch[-1][0]
+
+    if converted > 0:
+        print(f"[Sortir] {converted} utilisation(s) converties au format compact")
+
+
+def noop(apps, schema_editor):
+    """Rollback: les colonnes compactes sont supprimées par le rollback de 0021"""
+    pass
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('pretix_sortir', '0021_compact_usage_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_compact_columns, noop),
+    ]
@@ -0,0 +1,163 @@
+# Generated manually for compact SortirUsage hash and status columns
+"""
+Remplace sortir_number_hash (varchar 64) et status (varchar 20) par leurs colonnes compactes.
+
+Les lignes écrites ou modifiées pendant 0022 sont d'abord rattrapées, puis les index et la contrainte
+d'unicité sont recréés sur les nouvelles colonnes (32 octets + entier court par entrée).
+"""
+
+import pretix_sortir.fields
+from django.db import migrations, models
+
+STATUS_CHOICES = [
+    ('pending', 'En attente'),
+    ('validated', 'Validé'),
+    ('used', 'Utilisé'),
+    ('cancelled', 'Annulé'),
+    ('expired', 'Expiré'),
+]
+
+STATUS_CODES = {'pending': 1, 'validated': 2, 'used': 3, 'cancelled': 4, 'expired': 5}
+
+BATCH_SIZE = 5000
+
+
+def catch_up_compact_columns(apps, schema_editor):
+    """
+    Rattrape les utilisations créées ou modifiées depuis le remplissage par lots.
+
+    Chaque ligne est comparée colonne à colonne (ancienne valeur contre valeur compacte) :
+    une ligne déjà convertie puis modifiée pendant 0022 n'a plus de colonne compacte vide.
+    """
+    SortirUsage = apps.get_model('pretix_sortir', 'SortirUsage')
+
+    last_pk = 0
+    caught_up = 0
+
+    while True:
+        batch = list(
+            SortirUsage.objects.filter(pk__gt=last_pk).order_by('pk').values_list(
+                'pk', 'sortir_number_hash', 'sortir_number_hash_bin', 'status', 'status_code'
+            )[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+
+        stale = [
+            SortirUsage(pk=pk, sortir_number_hash_bin=number_hash, status_code=status)
+            for pk, number_hash, number_hash_bin, status, status_code in batch
+            if number_hash_bin != number_hash.lower() or status_code != status
+        ]
+        if stale:
+            SortirUsage.objects.bulk_update(stale, ['sortir_number_hash_bin', 'status_code'], batch_size=1000)
+
+        caught_up += len(stale)
+        last_pk = batch[-1][0]
+
+    if caught_up > 0:
+        print(f"[Sortir] {caught_up} utilisation(s) rattrapée(s) avant bascule au format compact")
+
+
+def noop(apps, schema_editor):
+    """Rollback: rien à rattraper"""
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pretix_sortir', '0022_fill_compact_usage_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(catch_up_compact_columns, noop),
+        migrations.RemoveConstraint(
+            model_name='sortirusage',
+            name='unique_card_per_event_active',
+        ),
+        migrations.RemoveIndex(
+            model_name='sortirusage',
+            name='pretix_sort_event_i_9db569_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='sortirusage',
+            name='pretix_sort_event_i_a67f40_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='sortirusage',
+            name='pretix_sort_order_i_3b0bde_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='sortirusage',
+            name='pretix_sort_cart_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='sortirusage',
+            name='pretix_sort_evt_status_crt_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='sortirusage',
+            name='pretix_sort_pending_orphan_idx',
+        ),
+        migrations.RemoveField(
+            model_name='sortirusage',
+            name='sortir_number_hash',
+        ),
+        migrations.RemoveField(
+            model_name='sortirusage',
+            name='status',
+        ),
+        migrations.RenameField(
+            model_name='sortirusage',
+            old_name='sortir_number_hash_bin',
+            new_name='sortir_number_hash',
+        ),
+        migrations.RenameField(
+            model_name='sortirusage',
+            old_name='status_code',
+            new_name='status',
+        ),
+        migrations.AlterField(
+            model_name='sortirusage',
+            name='sortir_number_hash',
+            field=pretix_sortir.fields.HexBinaryField(db_index=True, editable=True),
+        ),
+        migrations.AlterField(
+            model_name='sortirusage',
+            name='status',
+            field=pretix_sortir.fields.CodedChoiceField(choices=STATUS_CHOICES, codes=STATUS_CODES, db_index=True, default='pending'),
+        ),
+        migrations.AddIndex(
+            model_name='sortirusage',
+            index=models.Index(fields=['event', 'sortir_number_hash'], name='pretix_sort_event_hash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sortirusage',
+            index=models.Index(fields=['event', 'status'], name='pretix_sort_event_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sortirusage',
+            index=models.Index(fields=['order', 'status'], name='pretix_sort_order_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sortirusage',
+            index=models.Index(fields=['event', 'cart_id', 'status'], name='pretix_sort_cart_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sortirusage',
+            index=models.Index(fields=['event', 'status', 'created_at', 'id'], name='pretix_sort_evt_status_crt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sortirusage',
+            index=models.Index(condition=models.Q(('order__isnull', True), ('status', 'pending')), fields=['created_at'], name='pretix_sort_pending_orphan_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='sortirusage',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('status__in', ['validated', 'used', 'pending'])),
+                fields=('event', 'sortir_number_hash'),
+                name='unique_card_per_event_active',
+                violation_error_message='Cette carte a déjà été utilisée pour cet événement'
+            ),
+        ),
+    ]
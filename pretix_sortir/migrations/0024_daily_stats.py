@@ -0,0 +1,56 @@
+# Generated manually for daily activity rollups
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pretixbase', '0288_invoice_transmission'),
+        ('pretix_sortir', '0023_swap_compact_usage_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SortirDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False)),
+                ('date', models.DateField(verbose_name='Jour')),
+                ('validations', models.PositiveIntegerField(default=0, verbose_name='Validations réussies')),
+                ('failures', models.PositiveIntegerField(default=0, verbose_name='Validations échouées')),
+                ('grants', models.PositiveIntegerField(default=0, verbose_name='Grants envoyés')),
+                ('grant_failures', models.PositiveIntegerField(default=0, verbose_name='Grants échoués')),
+                ('rate_limit_hits', models.PositiveIntegerField(default=0, verbose_name='Rate limits déclenchés')),
+                ('cancellations', models.PositiveIntegerField(default=0, verbose_name='Annulations')),
+                ('event', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pretixbase.event', verbose_name='Événement')),
+                ('organizer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pretixbase.organizer', verbose_name='Organisateur')),
+            ],
+            options={
+                'verbose_name': 'Statistiques journalières Sortir!',
+                'verbose_name_plural': 'Statistiques journalières Sortir!',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SortirRollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Nom')),
+                ('last_id', models.BigIntegerField(default=0, verbose_name='Dernier identifiant traité')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Dernière mise à jour')),
+            ],
+            options={
+                'verbose_name': "Filigrane d'agrégation Sortir!",
+                'verbose_name_plural': "Filigranes d'agrégation Sortir!",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='sortirdailystats',
+            constraint=models.UniqueConstraint(condition=models.Q(('event__isnull', False)), fields=('event', 'date'), name='sortir_daily_stats_event_day'),
+        ),
+        migrations.AddConstraint(
+            model_name='sortirdailystats',
+            constraint=models.UniqueConstraint(condition=models.Q(('event__isnull', True)), fields=('organizer', 'date'), name='sortir_daily_stats_org_day'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated manually for dedicated audit database support
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pretix_sortir', '0024_daily_stats'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sortirauditlog',
+            name='event',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='pretixbase.event', verbose_name='Événement'),
+        ),
+        migrations.AlterField(
+            model_name='sortirauditlog',
+            name='organizer',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='pretixbase.organizer', verbose_name='Organisateur'),
+        ),
+        migrations.AlterField(
+            model_name='sortirauditlog',
+            name='order',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='pretixbase.order', verbose_name='Commande'),
+        ),
+    ]
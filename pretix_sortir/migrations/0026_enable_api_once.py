@@ -0,0 +1,30 @@
+# Generated manually for moving API auto-activation out of app startup
+"""
+Active l'API pour les configurations créées désactivées depuis 0014.
+
+Remplace l'UPDATE exécuté à chaque démarrage dans SortirPluginConfig.ready() : les
+nouvelles configurations sont désormais créées avec api_enabled=True (défaut du modèle).
+"""
+
+from django.db import migrations
+
+
+def enable_api_for_existing(apps, schema_editor):
+    SortirOrganizerSettings = apps.get_model('pretix_sortir', 'SortirOrganizerSettings')
+    SortirOrganizerSettings.objects.using(schema_editor.connection.alias).filter(
+        api_enabled=False
+    ).update(api_enabled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pretix_sortir', '0025_audit_log_without_db_constraints'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            enable_api_for_existing, migrations.RunPython.noop,
+            hints={'model_name': 'sortirorganizersettings'},
+        ),
+    ]
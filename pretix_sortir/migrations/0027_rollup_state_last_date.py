@@ -0,0 +1,27 @@
+# Generated manually for daily activity rollups
+"""
+Le filigrane des statistiques journalières retient le dernier jour clos au lieu de la
+dernière clé primaire du journal d'audit. L'historique est recalculé par les passages suivants
+de la tâche périodique (ROLLUP_MAX_DAYS jours à la fois).
+"""
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pretix_sortir', '0026_enable_api_once'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='sortirrollupstate',
+            name='last_id',
+        ),
+        migrations.AddField(
+            model_name='sortirrollupstate',
+            name='last_date',
+            field=models.DateField(blank=True, null=True, verbose_name='Dernier jour clos'),
+        ),
+    ]
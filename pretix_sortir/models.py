@@ -6,12 +6,16 @@ et tracking au niveau événement pour les utilisations.
 """
 
 import hashlib
-from django.db import models
+import ipaddress
+import threading
+from collections import OrderedDict
+from django.db import models, router, transaction
+from django.db.models import Q
 from django.utils.crypto import get_random_string
 from django.utils.translation import gettext_lazy as _
 from pretix.base.models import Event, Item, ItemVariation, Order, Organizer
 from pretix.base.models.base import LoggedModel
-from .fields import EncryptedTextField
+from .fields import CodedChoiceField, EncryptedTextField, HexBinaryField
 
 
 class SortirOrganizerSettings(LoggedModel):
@@ -119,6 +123,10 @@ class SortirEventSettings(models.Model):
         help_text=_('Automatiquement activé quand le plugin est activé pour cet événement')
     )
 
+    # Clé du cache par événement (event.cache) de l'état d'activation
+    ENABLED_CACHE_KEY = 'sortir_event_enabled'
+    ENABLED_CACHE_TIMEOUT = 3600
+
     class Meta:
         verbose_name = _('Activation Sortir! événement')
         verbose_name_plural = _('Activations Sortir! événements')
@@ -126,6 +134,28 @@ class SortirEventSettings(models.Model):
     def __str__(self):
         return f"Sortir! - {self.event.name}"
 
+    @classmethod
+    def get_enabled(cls, event: Event):
+        """
+        Retourne l'état d'activation de Sortir! pour l'événement, depuis le cache de l'événement.
+
+        Returns:
+            True/False, ou None si l'événement n'a pas de SortirEventSettings
+        """
+        def load():
+            return {'enabled': cls.objects.filter(event=event).values_list('enabled', flat=True).first()}
+
+        from .assets import namespaced_key
+
+        return event.cache.get_or_set(namespaced_key(cls.ENABLED_CACHE_KEY), load, cls.ENABLED_CACHE_TIMEOUT)['enabled']
+
+    @classmethod
+    def invalidate_enabled(cls, event: Event):
+        """Invalide l'état d'activation mis en cache (appelé à chaque sauvegarde/suppression)."""
+        from .assets import namespaced_key
+
+        event.cache.delete(namespaced_key(cls.ENABLED_CACHE_KEY))
+
 
 class SortirItemConfig(models.Model):
     """
@@ -189,6 +219,15 @@ class SortirUsage(models.Model):
         ('expired', _('Expiré')),
     ]
 
+    # Codes stockés en base pour chaque statut (ne jamais renuméroter)
+    STATUS_CODES = {
+        'pending': 1,
+        'validated': 2,
+        'used': 3,
+        'cancelled': 4,
+        'expired': 5,
+    }
+
     event = models.ForeignKey(
         Event,
         on_delete=models.CASCADE,
@@ -203,9 +242,8 @@ class SortirUsage(models.Model):
         verbose_name=_('Commande')
     )
 
-    # Numéro hashé et suffixe pour support
-    sortir_number_hash = models.CharField(
-        max_length=64,
+    # Numéro hashé (SHA-256 stocké sur 32 octets, lu en hexadécimal) et suffixe pour support
+    sortir_number_hash = HexBinaryField(
         db_index=True,
         verbose_name=_('Hash du numéro')
     )
@@ -239,8 +277,9 @@ class SortirUsage(models.Model):
         verbose_name=_('Variation')
     )
 
-    status = models.CharField(
-        max_length=20,
+    # Entier court en base, chaîne ('pending', 'used', ...) côté Python
+    status = CodedChoiceField(
+        codes=STATUS_CODES,
         choices=STATUS_CHOICES,
         default='pending',
         db_index=True,
@@ -274,6 +313,23 @@ class SortirUsage(models.Model):
         help_text=_('Identifiant anonyme de session pour gérer les corrections')
     )
 
+    # Panier Pretix auquel la réservation est rattachée (cart_id de la session,
+    # ou session_id JS en repli) et position qui l'a réclamée à validate_cart
+    cart_id = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        verbose_name=_('ID de panier'),
+        help_text=_('Panier Pretix auquel la réservation est rattachée')
+    )
+
+    cart_position_id = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name=_('Position de panier'),
+        help_text=_('Position de panier qui a réclamé cette réservation')
+    )
+
     # ID de demande APRAS après POST
     apras_request_id = models.CharField(
         max_length=100,
@@ -285,9 +341,21 @@ class SortirUsage(models.Model):
         verbose_name = _('Utilisation Sortir!')
         verbose_name_plural = _('Utilisations Sortir!')
         indexes = [
-            models.Index(fields=['event', 'sortir_number_hash']),
-            models.Index(fields=['event', 'status']),
-            models.Index(fields=['order', 'status']),
+            models.Index(fields=['event', 'sortir_number_hash'], name='pretix_sort_event_hash_idx'),
+            models.Index(fields=['event', 'status'], name='pretix_sort_event_status_idx'),
+            models.Index(fields=['order', 'status'], name='pretix_sort_order_status_idx'),
+            models.Index(fields=['event', 'cart_id', 'status'], name='pretix_sort_cart_id_idx'),
+            # Pagination keyset et recherche de l'historique (SortirUsageListView)
+            models.Index(fields=['event', 'created_at', 'id'], name='pretix_sort_event_created_idx'),
+            models.Index(fields=['event', 'status', 'created_at', 'id'], name='pretix_sort_evt_status_crt_idx'),
+            models.Index(fields=['event', 'sortir_number_suffix'], name='pretix_sort_event_suffix_idx'),
+            models.Index(fields=['event', 'apras_request_id'], name='pretix_sort_event_apras_idx'),
+            # Purge des réservations abandonnées (sortir_cleanup, nettoyage AJAX)
+            models.Index(
+                fields=['created_at'],
+                condition=Q(status='pending', order__isnull=True),
+                name='pretix_sort_pending_orphan_idx'
+            ),
         ]
         # Contrainte d'unicité anti-fraude (Sécurité PHASE 1 - Point 3)
         # Empêche qu'une même carte hashée soit utilisée plusieurs fois pour le même événement
@@ -347,6 +415,136 @@ class SortirUsage(models.Model):
 
         return queryset.exists()
 
+    @classmethod
+    def claim_for_cart_position(cls, event: Event, cart_id: str, position_id: int,
+                                live_position_ids=()) -> 'SortirUsage':
+        """
+        Réserve une validation 'pending' du panier pour une position donnée.
+
+        Le verrou ligne (select_for_update skip_locked) garantit qu'une même
+        réservation ne peut pas être réclamée par deux positions en parallèle.
+        Les réservations liées à une position qui n'existe plus dans le panier
+        (article retiré puis rajouté) sont considérées comme libres.
+
+        Args:
+            event: L'événement concerné
+            cart_id: Identifiant du panier Pretix
+            position_id: ID de la CartPosition qui réclame la réservation
+            live_position_ids: IDs des positions encore présentes dans le panier
+
+        Returns:
+            Le SortirUsage réclamé, ou None si aucune réservation n'est disponible
+        """
+        if not cart_id:
+            return None
+
+        with transaction.atomic():
+            usage = cls.objects.select_for_update(skip_locked=True).filter(
+                Q(cart_position_id__isnull=True) | ~Q(cart_position_id__in=list(live_position_ids)),
+                event=event,
+                cart_id=cart_id,
+                status='pending',
+                order__isnull=True,
+            ).order_by('created_at', 'pk').first()
+
+            if usage:
+                usage.cart_position_id = position_id
+                usage.save(update_fields=['cart_position_id'])
+
+        return usage
+
+
+class SortirUserAgent(models.Model):
+    """
+    User agents distincts référencés par le journal d'audit.
+
+    Quelques centaines de valeurs se répètent sur des millions de lignes d'audit :
+    chaque valeur est stockée une seule fois, identifiée par son hash SHA-256.
+    """
+
+    # Nombre d'identifiants gardés en mémoire par processus
+    ID_CACHE_SIZE = 512
+
+    value_hash = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name=_('Hash du user agent')
+    )
+
+    value = models.TextField(
+        verbose_name=_('User Agent')
+    )
+
+    _id_cache = OrderedDict()
+    _id_cache_lock = threading.Lock()
+
+    class Meta:
+        verbose_name = _('User agent Sortir!')
+        verbose_name_plural = _('User agents Sortir!')
+
+    def __str__(self):
+        return self.value
+
+    @staticmethod
+    def hash_value(value: str) -> str:
+        return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def get_id(cls, value):
+        """
+        Retourne l'identifiant du user agent, en le créant si nécessaire.
+
+        Les identifiants sont gardés dans un cache LRU en mémoire : pour un user agent
+        déjà vu, l'insertion d'une ligne d'audit ne fait aucune requête supplémentaire.
+        Un identifiant n'entre dans le cache qu'une fois la transaction validée, pour
+        ne jamais référencer une ligne annulée par un rollback.
+
+        Returns:
+            L'identifiant, ou None si value est vide
+        """
+        if not value:
+            return None
+
+        with cls._id_cache_lock:
+            pk = cls._id_cache.get(value)
+            if pk is not None:
+                cls._id_cache.move_to_end(value)
+                return pk
+
+        value_hash = cls.hash_value(value)
+        pk = cls.objects.filter(value_hash=value_hash).values_list('pk', flat=True).first()
+        if pk is None:
+            pk = cls.objects.get_or_create(value_hash=value_hash, defaults={'value': value})[0].pk
+
+        transaction.on_commit(lambda: cls._remember_id(value, pk), using=router.db_for_write(cls))
+        return pk
+
+    @classmethod
+    def _remember_id(cls, value, pk):
+        with cls._id_cache_lock:
+            cls._id_cache[value] = pk
+            cls._id_cache.move_to_end(value)
+            while len(cls._id_cache) > cls.ID_CACHE_SIZE:
+                cls._id_cache.popitem(last=False)
+
+
+def compact_ip(value):
+    """
+    Normalise une adresse IP avant stockage.
+
+    Les adresses IPv4 encapsulées en IPv6 (::ffff:a.b.c.d) sont ramenées à leur forme
+    IPv4 (4 octets au lieu de 16 dans la colonne inet) ; une valeur invalide donne None.
+    """
+    if not value:
+        return None
+    try:
+        ip = ipaddress.ip_address(str(value).strip())
+    except ValueError:
+        return None
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return str(ip)
+
 
 class SortirAuditLog(models.Model):
     """
@@ -386,9 +584,12 @@ class SortirAuditLog(models.Model):
     )
 
     # Contexte
+    # Sans contrainte en base : le journal peut vivre sur une base dédiée (voir routers.py)
+    # et les entrées sont conservées jusqu'à leur purge RGPD, même après suppression
     event = models.ForeignKey(
         Event,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
         null=True,
         blank=True,
         verbose_name=_('Événement')
@@ -396,7 +597,8 @@ class SortirAuditLog(models.Model):
 
     organizer = models.ForeignKey(
         Organizer,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
         null=True,
         blank=True,
         verbose_name=_('Organisateur')
@@ -404,7 +606,8 @@ class SortirAuditLog(models.Model):
 
     order = models.ForeignKey(
         Order,
-        on_delete=models.SET_NULL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
         null=True,
         blank=True,
         verbose_name=_('Commande')
@@ -439,15 +642,20 @@ class SortirAuditLog(models.Model):
         verbose_name=_('Suffixe carte (4 derniers chiffres)')
     )
 
+    # Colonne inet sous PostgreSQL, valeurs normalisées par compact_ip
     ip_address = models.GenericIPAddressField(
         null=True,
         blank=True,
         verbose_name=_('Adresse IP')
     )
 
-    user_agent = models.TextField(
-        blank=True,
+    # User agent dédupliqué (voir SortirUserAgent)
+    user_agent_ref = models.ForeignKey(
+        SortirUserAgent,
+        on_delete=models.PROTECT,
         null=True,
+        blank=True,
+        related_name='+',
         verbose_name=_('User Agent')
     )
 
@@ -472,12 +680,18 @@ class SortirAuditLog(models.Model):
             models.Index(fields=['event', 'timestamp']),
             models.Index(fields=['action', 'timestamp']),
             models.Index(fields=['card_hash']),
+            # Purge par organisateur (sortir_cleanup)
+            models.Index(fields=['organizer', 'timestamp'], name='pretix_sort_audit_org_ts_idx'),
         ]
         ordering = ['-timestamp']
 
     def __str__(self):
         return f"[{self.get_severity_display()}] {self.get_action_display()} - {self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
 
+    @property
+    def user_agent(self):
+        return self.user_agent_ref.value if self.user_agent_ref_id else None
+
     @classmethod
     def log(cls, action, severity='info', event=None, organizer=None, order=None,
             card_number=None, salt=None, ip_address=None, user_agent=None,
@@ -513,8 +727,110 @@ class SortirAuditLog(models.Model):
             order=order,
             card_hash=card_hash,
             card_suffix=card_suffix,
-            ip_address=ip_address,
-            user_agent=user_agent,
+            ip_address=compact_ip(ip_address),
+            user_agent_ref_id=SortirUserAgent.get_id(user_agent),
             message=message,
             details=extra_details
-        )
\ No newline at end of file
+        )
+
+
+class SortirDailyStats(models.Model):
+    """
+    Compteurs journaliers d'activité Sortir!, agrégés depuis le journal d'audit.
+
+    Une ligne par (événement, jour) et une ligne par (organisateur, jour) avec event=NULL
+    qui cumule tous ses événements. Recalculées jour par jour par la tâche périodique
+    (voir rollups.py) : les rapports ne parcourent jamais les tables brutes.
+    """
+
+    organizer = models.ForeignKey(
+        Organizer,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_('Organisateur')
+    )
+
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name=_('Événement')
+    )
+
+    date = models.DateField(
+        verbose_name=_('Jour')
+    )
+
+    validations = models.PositiveIntegerField(default=0, verbose_name=_('Validations réussies'))
+    failures = models.PositiveIntegerField(default=0, verbose_name=_('Validations échouées'))
+    grants = models.PositiveIntegerField(default=0, verbose_name=_('Grants envoyés'))
+    grant_failures = models.PositiveIntegerField(default=0, verbose_name=_('Grants échoués'))
+    rate_limit_hits = models.PositiveIntegerField(default=0, verbose_name=_('Rate limits déclenchés'))
+    cancellations = models.PositiveIntegerField(default=0, verbose_name=_('Annulations'))
+
+    # Compteur alimenté par chaque action du journal d'audit
+    ACTION_COUNTERS = {
+        'card_validation_success': 'validations',
+        'card_validation_failed': 'failures',
+        'grant_success': 'grants',
+        'grant_failed': 'grant_failures',
+        'rate_limit_triggered': 'rate_limit_hits',
+        'usage_cancelled': 'cancellations',
+    }
+
+    COUNTERS = ['validations', 'failures', 'grants', 'grant_failures', 'rate_limit_hits', 'cancellations']
+
+    class Meta:
+        verbose_name = _('Statistiques journalières Sortir!')
+        verbose_name_plural = _('Statistiques journalières Sortir!')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['event', 'date'],
+                condition=Q(event__isnull=False),
+                name='sortir_daily_stats_event_day'
+            ),
+            models.UniqueConstraint(
+                fields=['organizer', 'date'],
+                condition=Q(event__isnull=True),
+                name='sortir_daily_stats_org_day'
+            ),
+        ]
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.event or self.organizer} - {self.date}"
+
+
+class SortirRollupState(models.Model):
+    """
+    Filigrane des agrégations journalières : dernier jour clos (plus recalculé).
+
+    Mis à jour dans la même transaction que les compteurs du jour et verrouillé pendant
+    l'agrégation (une seule exécution à la fois).
+    """
+
+    name = models.CharField(
+        max_length=50,
+        unique=True,
+        verbose_name=_('Nom')
+    )
+
+    last_date = models.DateField(
+        null=True,
+        blank=True,
+        verbose_name=_('Dernier jour clos')
+    )
+
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name=_('Dernière mise à jour')
+    )
+
+    class Meta:
+        verbose_name = _('Filigrane d\'agrégation Sortir!')
+        verbose_name_plural = _('Filigranes d\'agrégation Sortir!')
+
+    def __str__(self):
+        return f"{self.name}: {self.last_date}"
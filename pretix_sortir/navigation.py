@@ -33,57 +33,60 @@ def control_nav_organizer(sender, request=None, **kwargs):
 def control_nav_event(sender, request=None, **kwargs):
     """
     Ajoute le lien Sortir! dans le menu de l'événement.
+
+    L'état d'activation vient du cache de l'événement (SortirEventSettings.get_enabled)
+    et les entrées sont construites une seule fois par requête.
     """
     if not request.user.has_event_permission(request.organizer, request.event, 'can_change_event_settings', request=request):
         return []
 
-    # Vérifie si le plugin est activé pour cet événement
+    cache_attr = f'_sortir_nav_event_{request.event.pk}'
+    if not hasattr(request, cache_attr):
+        setattr(request, cache_attr, _build_nav_event(request))
+    return getattr(request, cache_attr)
+
+
+def _build_nav_event(request):
+    """Construit les entrées de menu Sortir! de l'événement."""
     from .models import SortirEventSettings
-    try:
-        event_settings = SortirEventSettings.objects.get(event=request.event)
-        if not event_settings.enabled:
-            # Si désactivé, ne montre le lien que dans les paramètres
-            return [{
-                'label': _('Sortir!'),
-                'icon': 'credit-card',
-                'url': reverse('plugins:pretix_sortir:event-settings', kwargs={
-                    'organizer': request.organizer.slug,
-                    'event': request.event.slug,
-                }),
-                'active': 'sortir' in request.resolver_match.url_name if request.resolver_match else False,
-                'parent': 'settings',  # Dans le sous-menu paramètres
-            }]
-    except SortirEventSettings.DoesNotExist:
-        pass
+
+    url_name = (request.resolver_match.url_name if request.resolver_match else '') or ''
+    url_kwargs = {
+        'organizer': request.organizer.slug,
+        'event': request.event.slug,
+    }
+    settings_url = reverse('plugins:pretix_sortir:event-settings', kwargs=url_kwargs)
+
+    # Vérifie si le plugin est activé pour cet événement
+    if SortirEventSettings.get_enabled(request.event) is False:
+        # Si désactivé, ne montre le lien que dans les paramètres
+        return [{
+            'label': _('Sortir!'),
+            'icon': 'credit-card',
+            'url': settings_url,
+            'active': 'sortir' in url_name,
+            'parent': 'settings',  # Dans le sous-menu paramètres
+        }]
 
     # Si activé, affiche le menu complet
     return [
         {
             'label': _('Sortir!'),
             'icon': 'credit-card',
-            'url': reverse('plugins:pretix_sortir:event-settings', kwargs={
-                'organizer': request.organizer.slug,
-                'event': request.event.slug,
-            }),
-            'active': 'sortir' in request.resolver_match.url_name if request.resolver_match else False,
+            'url': settings_url,
+            'active': 'sortir' in url_name,
             'parent': None,  # Menu principal si activé
             'children': [
                 {
                     'label': _('Configuration'),
-                    'url': reverse('plugins:pretix_sortir:event-settings', kwargs={
-                        'organizer': request.organizer.slug,
-                        'event': request.event.slug,
-                    }),
-                    'active': 'event-settings' in request.resolver_match.url_name if request.resolver_match else False,
+                    'url': settings_url,
+                    'active': 'event-settings' in url_name,
                 },
                 {
                     'label': _('Utilisations'),
-                    'url': reverse('plugins:pretix_sortir:usage-list', kwargs={
-                        'organizer': request.organizer.slug,
-                        'event': request.event.slug,
-                    }),
-                    'active': 'usage-list' in request.resolver_match.url_name if request.resolver_match else False,
+                    'url': reverse('plugins:pretix_sortir:usage-list', kwargs=url_kwargs),
+                    'active': 'usage-list' in url_name,
                 }
             ]
         }
-    ]
\ No newline at end of file
+    ]
@@ -0,0 +1,284 @@
+"""
+Partitionnement mensuel (PostgreSQL) de la table du journal d'audit Sortir!
+
+Optionnel : la table reste une table classique tant que la commande
+`sortir_audit_partitions --convert` n'a pas été lancée. Une fois partitionnée :
+
+- une partition par mois sur `timestamp` (+ une partition DEFAULT de secours)
+- les partitions des mois à venir sont créées par la tâche périodique
+- la rétention supprime des partitions entières (DROP TABLE) au lieu de DELETE massifs
+"""
+
+import logging
+import re
+from datetime import date, datetime, timezone as dt_timezone
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+logger = logging.getLogger('pretix.plugins.sortir')
+
+# Nombre de mois futurs pour lesquels une partition est créée à l'avance
+DEFAULT_MONTHS_AHEAD = 3
+
+PARTITION_SUFFIX_RE = re.compile(r'_p(\d{4})(\d{2})$')
+
+
+def _model():
+    from .models import SortirAuditLog
+    return SortirAuditLog
+
+
+def _table():
+    return _model()._meta.db_table
+
+
+def _connection():
+    return connections[router.db_for_write(_model())]
+
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _add_months(value, months):
+    month = value.month - 1 + months
+    return date(value.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(month):
+    """Nom de la partition d'un mois (ex: pretix_sortir_sortirauditlog_p202501)."""
+    return f'{_table()}_p{month.year:04d}{month.month:02d}'
+
+
+def is_supported():
+    """Le partitionnement n'est disponible que sous PostgreSQL."""
+    return _connection().vendor == 'postgresql'
+
+
+def is_partitioned():
+    """Indique si la table d'audit est actuellement partitionnée."""
+    if not is_supported():
+        return False
+    with _connection().cursor() as cursor:
+        cursor.execute("""
+            SELECT EXISTS (
+                SELECT 1 FROM pg_partitioned_table pt
+                JOIN pg_class c ON c.oid = pt.partrelid
+                WHERE c.relname = %s AND pg_table_is_visible(c.oid)
+            )
+        """, [_table()])
+        return cursor.fetchone()[0]
+
+
+def list_partitions():
+    """
+    Liste les partitions mensuelles existantes.
+
+    Returns:
+        Liste triée de (mois, nom de partition) ; la partition DEFAULT est exclue
+    """
+    with _connection().cursor() as cursor:
+        cursor.execute("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s AND pg_table_is_visible(parent.oid)
+        """, [_table()])
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        match = PARTITION_SUFFIX_RE.search(name)
+        if match:
+            partitions.append((date(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(partitions)
+
+
+def _create_partition(cursor, month):
+    table = _table()
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(month)}" PARTITION OF "{table}" '
+        f'FOR VALUES FROM (%s) TO (%s)',
+        [
+            datetime.combine(month, datetime.min.time(), tzinfo=dt_timezone.utc),
+            datetime.combine(_add_months(month, 1), datetime.min.time(), tzinfo=dt_timezone.utc),
+        ]
+    )
+
+
+def ensure_partitions(months_ahead=DEFAULT_MONTHS_AHEAD, start=None):
+    """
+    Crée les partitions manquantes du mois `start` (défaut: mois courant) à `months_ahead` mois plus tard.
+
+    Returns:
+        Liste des noms de partitions créées
+    """
+    if not is_partitioned():
+        return []
+
+    existing = {name for _month, name in list_partitions()}
+    month = _month_start(start or timezone.now())
+    created = []
+
+    with _connection().cursor() as cursor:
+        for _i in range(months_ahead + 1):
+            name = partition_name(month)
+            if name not in existing:
+                try:
+                    with transaction.atomic(using=_connection().alias):
+                        _create_partition(cursor, month)
+                    created.append(name)
+                    logger.info(f"[Sortir] Partition d'audit {name} créée")
+                except Exception as e:
+                    # Typiquement : la partition DEFAULT contient déjà des lignes de ce mois
+                    logger.error(f"[Sortir] Impossible de créer la partition d'audit {name} : {e}")
+            month = _add_months(month, 1)
+
+    return created
+
+
+def drop_partitions_before(cutoff, dry_run=False):
+    """
+    Supprime les partitions dont tout le mois est antérieur à `cutoff` (DROP TABLE, sans DELETE).
+
+    Returns:
+        Liste des noms de partitions supprimées (ou qui le seraient en dry-run)
+    """
+    if not is_partitioned():
+        return []
+
+    cutoff_month = _month_start(cutoff)
+    dropped = []
+    connection = _connection()
+
+    for month, name in list_partitions():
+        if _add_months(month, 1) > cutoff_month:
+            continue
+        dropped.append(name)
+        if dry_run:
+            continue
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE "{_table()}" DETACH PARTITION "{name}"')
+            cursor.execute(f'DROP TABLE "{name}"')
+        logger.info(f"[Sortir] Partition d'audit {name} supprimée (rétention)")
+
+    return dropped
+
+
+def convert_to_partitioned(months_ahead=DEFAULT_MONTHS_AHEAD, batch_size=10000, stdout=None):
+    """
+    Convertit la table d'audit en table partitionnée par mois.
+
+    1. Renomme la table existante en <table>_legacy et crée la table partitionnée à sa place
+       (mêmes colonnes, index, clés étrangères ; clé primaire (id, timestamp))
+    2. Recopie les lignes historiques par lots d'id (reprise possible si interrompu)
+    3. Supprime la table legacy
+
+    L'étape 1 est une courte opération de catalogue : les nouvelles entrées d'audit
+    sont écrites dans la table partitionnée pendant la recopie.
+    """
+    def write(msg):
+        if stdout:
+            stdout.write(msg)
+
+    table = _table()
+    legacy = f'{table}_legacy'
+    connection = _connection()
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [legacy])
+        legacy_exists = cursor.fetchone()[0]
+
+    if not is_partitioned():
+        if legacy_exists:
+            raise RuntimeError(f'La table {legacy} existe déjà alors que {table} n\'est pas partitionnée')
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            _swap_tables(cursor, table, legacy, months_ahead)
+        write(f'Table {table} partitionnée, recopie de {legacy}...')
+    elif not legacy_exists:
+        write(f'Table {table} déjà partitionnée')
+        ensure_partitions(months_ahead)
+        return
+
+    # Recopie par lots (reprend après le dernier id déjà copié)
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM "{legacy}"')
+        legacy_max = cursor.fetchone()[0]
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM "{table}" WHERE id <= %s', [legacy_max])
+        last_id = cursor.fetchone()[0]
+
+    copied = 0
+    while last_id < legacy_max:
+        upper = last_id + batch_size
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO "{table}" SELECT * FROM "{legacy}" WHERE id > %s AND id <= %s',
+                [last_id, upper]
+            )
+            copied += cursor.rowcount
+        last_id = upper
+        write(f'  {copied} entrées recopiées (id <= {min(upper, legacy_max)})')
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE "{legacy}"')
+    write(f'Table {legacy} supprimée')
+
+
+def _swap_tables(cursor, table, legacy, months_ahead):
+    """Remplace la table d'audit par une table partitionnée de même structure."""
+    cursor.execute(f'LOCK TABLE "{table}" IN ACCESS EXCLUSIVE MODE')
+
+    # Index et clés étrangères à recréer sur la nouvelle table
+    cursor.execute("""
+        SELECT i.relname, pg_get_indexdef(i.oid)
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = %s::regclass AND NOT x.indisprimary
+    """, [table])
+    indexes = cursor.fetchall()
+    cursor.execute("""
+        SELECT conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype = 'f'
+    """, [table])
+    foreign_keys = cursor.fetchall()
+    cursor.execute(f'SELECT MIN("timestamp") FROM "{table}"')
+    oldest = cursor.fetchone()[0]
+
+    cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{legacy}"')
+    for index_name, _definition in indexes:
+        cursor.execute(f'ALTER INDEX "{index_name}" RENAME TO "{index_name[:55]}_legacy"')
+
+    cursor.execute(
+        f'CREATE TABLE "{table}" (LIKE "{legacy}" INCLUDING DEFAULTS INCLUDING IDENTITY) '
+        f'PARTITION BY RANGE ("timestamp")'
+    )
+    cursor.execute(f'ALTER TABLE "{table}" ADD PRIMARY KEY (id, "timestamp")')
+
+    # Séquence des id : reprend après le dernier id existant
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+    sequence = cursor.fetchone()[0]
+    if sequence:
+        cursor.execute(
+            f'SELECT setval(%s, (SELECT COALESCE(MAX(id), 0) + 1 FROM "{legacy}"), false)', [sequence]
+        )
+    else:
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [legacy])
+        legacy_sequence = cursor.fetchone()[0]
+        if legacy_sequence:
+            cursor.execute(f'ALTER SEQUENCE {legacy_sequence} OWNED BY "{table}".id')
+
+    # Définitions lues avant le renommage : elles visent déjà le nom de la nouvelle table
+    for _index_name, definition in indexes:
+        cursor.execute(definition)
+    for constraint_name, definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{constraint_name}" {definition}')
+
+    # Partitions : du mois le plus ancien jusqu'à months_ahead mois, plus une DEFAULT de secours
+    month = _month_start(oldest or timezone.now())
+    last = _add_months(_month_start(timezone.now()), months_ahead)
+    while month <= last:
+        _create_partition(cursor, month)
+        month = _add_months(month, 1)
+    cursor.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
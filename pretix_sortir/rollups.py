@@ -0,0 +1,198 @@
+"""
+Statistiques journalières d'activité Sortir! (SortirDailyStats)
+
+Chaque jour est agrégé depuis le journal d'audit par plage d'horodatage, puis ses lignes
+(événement, jour) et (organisateur, jour) sont réécrites en entier. Les derniers jours
+(ROLLUP_RECOMPUTE_DAYS) sont recalculés à chaque passage de la tâche périodique ; les
+jours plus anciens sont clos une fois pour toutes et le filigrane (SortirRollupState)
+retient le dernier jour clos. Le tableau de bord et l'endpoint JSON ne lisent que ces lignes.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from django.db import transaction
+from django.db.models import Count, Min, Sum
+from django.utils import timezone
+
+logger = logging.getLogger('pretix.plugins.sortir')
+
+ROLLUP_NAME = 'daily_stats'
+
+# Aujourd'hui et la veille sont recalculés à chaque passage : une entrée validée tard
+# (transaction longue, clé primaire inférieure à des entrées déjà visibles) y est comptée
+ROLLUP_RECOMPUTE_DAYS = 2
+
+# Jours clos agrégés au plus par passage (rattrapage de l'historique)
+ROLLUP_MAX_DAYS = 31
+
+# Période par défaut du tableau de bord et de l'endpoint JSON
+DEFAULT_DAYS = 30
+
+
+def update_daily_stats(max_days=ROLLUP_MAX_DAYS):
+    """
+    Clôt les jours pas encore agrégés, puis recalcule les ROLLUP_RECOMPUTE_DAYS derniers jours.
+
+    Returns:
+        Le nombre de jours recalculés
+    """
+    from .models import SortirRollupState
+
+    state, _created = SortirRollupState.objects.get_or_create(name=ROLLUP_NAME)
+
+    today = timezone.localdate()
+    window_start = today - timedelta(days=ROLLUP_RECOMPUTE_DAYS - 1)
+
+    day = state.last_date + timedelta(days=1) if state.last_date else _first_audit_day()
+    recomputed = 0
+    while day is not None and day < window_start and recomputed < max_days:
+        if not _recompute_day(day, close=True):
+            # Une exécution concurrente détient déjà le verrou : elle fera le travail
+            return recomputed
+        recomputed += 1
+        day += timedelta(days=1)
+
+    day = window_start
+    while day <= today:
+        if not _recompute_day(day, close=False):
+            return recomputed
+        recomputed += 1
+        day += timedelta(days=1)
+
+    logger.debug(f"[Sortir] Statistiques journalières : {recomputed} jour(s) recalculé(s)")
+    return recomputed
+
+
+def _first_audit_day():
+    """Jour de la plus ancienne entrée d'audit (None si le journal est vide)."""
+    from .models import SortirAuditLog
+
+    first = SortirAuditLog.objects.aggregate(first=Min('timestamp'))['first']
+    return timezone.localdate(first) if first else None
+
+
+def _recompute_day(day, close):
+    """
+    Réécrit les compteurs d'un jour, dans une seule transaction.
+
+    Avec close=True, le jour devient le dernier jour clos du filigrane.
+
+    Returns:
+        False si une autre exécution détient le verrou du filigrane
+    """
+    from .models import SortirAuditLog, SortirDailyStats, SortirRollupState
+
+    # Jour calculé dans le fuseau horaire du serveur (TIME_ZONE)
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+    with transaction.atomic():
+        state = SortirRollupState.objects.select_for_update(skip_locked=True).filter(name=ROLLUP_NAME).first()
+        if state is None:
+            return False
+
+        # Pas de jointure : le journal d'audit peut vivre sur une base dédiée (voir routers.py)
+        rows = list(SortirAuditLog.objects.filter(
+            timestamp__gte=start,
+            timestamp__lt=end,
+            action__in=list(SortirDailyStats.ACTION_COUNTERS),
+            organizer_id__isnull=False,
+        ).values('organizer_id', 'event_id', 'action').annotate(n=Count('pk')).order_by())
+
+        # Les entrées d'audit survivent à la suppression d'un événement ou d'un organisateur
+        existing_organizers, existing_events = _existing_ids(rows)
+
+        counters = defaultdict(lambda: defaultdict(int))
+        for row in rows:
+            if row['organizer_id'] not in existing_organizers:
+                continue
+            counter = SortirDailyStats.ACTION_COUNTERS[row['action']]
+            if row['event_id'] in existing_events:
+                counters[(row['organizer_id'], row['event_id'])][counter] += row['n']
+            counters[(row['organizer_id'], None)][counter] += row['n']
+
+        SortirDailyStats.objects.filter(date=day).delete()
+        SortirDailyStats.objects.bulk_create([
+            SortirDailyStats(organizer_id=organizer_id, event_id=event_id, date=day, **values)
+            for (organizer_id, event_id), values in counters.items()
+        ])
+
+        if close:
+            state.last_date = day
+            state.save(update_fields=['last_date', 'updated_at'])
+        return True
+
+
+def _existing_ids(rows):
+    """Organisateurs et événements des lignes agrégées qui existent encore."""
+    from django_scopes import scopes_disabled
+    from pretix.base.models import Event, Organizer
+
+    organizer_ids = {row['organizer_id'] for row in rows}
+    event_ids = {row['event_id'] for row in rows if row['event_id']}
+    existing_organizers, existing_events = set(), set()
+    with scopes_disabled():
+        if organizer_ids:
+            existing_organizers = set(Organizer.objects.filter(pk__in=organizer_ids).values_list('pk', flat=True))
+        if event_ids:
+            existing_events = set(Event.objects.filter(pk__in=event_ids).values_list('pk', flat=True))
+    return existing_organizers, existing_events
+
+
+def stats_queryset(event=None, organizer=None, date_from=None, date_to=None):
+    """Lignes journalières d'un événement, ou cumulées d'un organisateur."""
+    from .models import SortirDailyStats
+    from .routers import read_database
+
+    queryset = SortirDailyStats.objects.using(read_database(SortirDailyStats))
+    if event is not None:
+        queryset = queryset.filter(event=event)
+    else:
+        queryset = queryset.filter(organizer=organizer, event__isnull=True)
+    if date_from:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(date__lte=date_to)
+    return queryset.order_by('date')
+
+
+def get_totals(queryset):
+    """Somme des compteurs sur la période (0 si aucune ligne)."""
+    from .models import SortirDailyStats
+
+    totals = queryset.aggregate(**{counter: Sum(counter) for counter in SortirDailyStats.COUNTERS})
+    return {counter: value or 0 for counter, value in totals.items()}
+
+
+def get_recent_totals(event=None, organizer=None, days=DEFAULT_DAYS):
+    """Totaux des `days` derniers jours (aujourd'hui inclus)."""
+    date_to = timezone.localdate()
+    return get_totals(stats_queryset(
+        event=event, organizer=organizer, date_from=date_to - timedelta(days=days - 1), date_to=date_to
+    ))
+
+
+def get_stats(event=None, organizer=None, date_from=None, date_to=None):
+    """
+    Statistiques sérialisables en JSON : une entrée par jour et les totaux.
+
+    Par défaut, les DEFAULT_DAYS derniers jours.
+    """
+    from .models import SortirDailyStats
+
+    if date_to is None:
+        date_to = timezone.localdate()
+    if date_from is None:
+        date_from = date_to - timedelta(days=DEFAULT_DAYS - 1)
+
+    queryset = stats_queryset(event=event, organizer=organizer, date_from=date_from, date_to=date_to)
+    return {
+        'from': date_from.isoformat(),
+        'to': date_to.isoformat(),
+        'days': [
+            dict(row, date=row['date'].isoformat())
+            for row in queryset.values('date', *SortirDailyStats.COUNTERS)
+        ],
+        'totals': get_totals(queryset),
+    }
@@ -0,0 +1,91 @@
+"""
+Routage des bases de données du plugin Sortir! (optionnel)
+
+Deux réglages Django, indépendants :
+
+- SORTIR_AUDIT_DATABASE : alias de la base dédiée au journal d'audit. SortirAuditLog et
+  SortirUserAgent y sont lus, écrits et migrés ; rien d'autre n'y est migré.
+  Nécessite SortirAuditRouter dans DATABASE_ROUTERS.
+- SORTIR_REPLICA_DATABASE : alias d'une réplique en lecture seule, utilisée par les vues
+  de contrôle sans écriture (historique, statistiques) et par les exports.
+
+Sans ces réglages, tout reste sur la base par défaut de Pretix.
+
+Exemple (module de settings Django) :
+    DATABASES['sortir_audit'] = {...}
+    SORTIR_AUDIT_DATABASE = 'sortir_audit'
+    DATABASE_ROUTERS = ['pretix_sortir.routers.SortirAuditRouter'] + DATABASE_ROUTERS
+"""
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, router
+
+APP_LABEL = 'pretix_sortir'
+
+# Modèles hébergés par la base d'audit (SortirUserAgent est référencé par SortirAuditLog)
+AUDIT_MODELS = {'sortirauditlog', 'sortiruseragent'}
+
+
+def audit_database():
+    """Alias de la base d'audit dédiée, ou None."""
+    return getattr(settings, 'SORTIR_AUDIT_DATABASE', None) or None
+
+
+def replica_database():
+    """Alias de la réplique en lecture seule, ou None."""
+    return getattr(settings, 'SORTIR_REPLICA_DATABASE', None) or None
+
+
+def is_audit_model(model):
+    return model._meta.app_label == APP_LABEL and model._meta.model_name in AUDIT_MODELS
+
+
+def read_database(model):
+    """
+    Base à utiliser pour une lecture sans écriture ultérieure (vues de contrôle, exports).
+
+    Le journal d'audit est toujours lu sur sa base dédiée si elle existe ; sinon la réplique
+    est préférée à la base principale.
+    """
+    if is_audit_model(model) and audit_database():
+        return audit_database()
+    return replica_database() or router.db_for_read(model)
+
+
+class SortirAuditRouter:
+    """Envoie le journal d'audit vers SORTIR_AUDIT_DATABASE (lectures, écritures et migrations)."""
+
+    def _db_for(self, model, **hints):
+        alias = audit_database()
+        if not alias:
+            return None
+        if is_audit_model(model):
+            return alias
+        # Relation suivie depuis une ligne d'audit (audit.event, audit.order) : sans cela,
+        # Django interrogerait la base de l'instance, c'est-à-dire la base d'audit
+        instance = hints.get('instance')
+        if instance is not None and is_audit_model(type(instance)):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._db_for(model, **hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Les clés étrangères de l'audit vers Pretix n'ont pas de contrainte en base
+        if audit_database() and (is_audit_model(type(obj1)) or is_audit_model(type(obj2))):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        alias = audit_database()
+        if not alias:
+            return None
+        if app_label == APP_LABEL and model_name in AUDIT_MODELS:
+            return db == alias
+        if db == alias:
+            return False
+        return None
@@ -3,18 +3,24 @@ Signaux pour le plugin Sortir! - Version simplifiée et fonctionnelle
 """
 
 import json
-import logging
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
-from pretix.base.signals import validate_cart_addons, order_placed, order_approved, order_paid, validate_cart
+from pretix.base.signals import (
+    validate_cart_addons, order_placed, order_approved, order_paid, validate_cart, order_canceled, order_expired,
+    register_data_exporters, register_multievent_data_exporters, periodic_task,
+)
+from pretix.control.signals import event_dashboard_widgets
 from pretix.presale.signals import html_head, item_description
 
+from .logevents import get_event_logger
 from .models import SortirItemConfig, SortirEventSettings
 
-logger = logging.getLogger('pretix.plugins.sortir')
+event_log = get_event_logger()
 
 
 @receiver(validate_cart, dispatch_uid='sortir_validate_cart_main')
@@ -23,13 +29,19 @@ def check_sortir_required(sender, positions, **kwargs):
     Vérifie que les numéros de carte Sortir sont fournis et validés pour les positions requises
     SÉCURITÉ CRITIQUE : Validation côté serveur obligatoire
 
-    Note: La validation AJAX a déjà vérifié la carte auprès de l'API APRAS.
-    Ce signal vérifie juste que la validation est présente en meta_info.
+    Note: La validation AJAX a déjà vérifié la carte auprès de l'API APRAS et créé une
+    réservation 'pending' rattachée au panier (cart_id). Ce signal rattache chaque position
+    Sortir à une réservation de SON panier, sous verrou, et note l'ID dans meta_info.
+    meta_info est recopié sur l'OrderPosition à la création de la commande.
     """
     from django_scopes import scopes_disabled
     from pretix.base.services.cart import CartError
+    from .models import SortirUsage
 
-    logger.info("[Sortir] Validation du panier - vérification sécurisée")
+    event_log.debug('cart_validation', event=sender.slug)
+
+    positions = list(positions)
+    live_position_ids = [p.pk for p in positions if p.pk]
 
     with scopes_disabled():
         for position in positions:
@@ -42,37 +54,82 @@ def check_sortir_required(sender, positions, **kwargs):
                     requires_sortir=True
                 )
 
-                logger.info(f"[Sortir] Item {position.item.name} nécessite validation Sortir")
-
-                # Parse meta_info si nécessaire (peut être une string JSON)
-                meta_info = position.meta_info
-                if isinstance(meta_info, str):
-                    try:
-                        meta_info = json.loads(meta_info)
-                    except (json.JSONDecodeError, TypeError):
-                        meta_info = {}
-                elif not meta_info:
-                    meta_info = {}
-
-                # Vérifie que la position a les métadonnées de validation
-                # Ces métadonnées sont ajoutées par le JavaScript lors de la validation AJAX
-                if not meta_info.get('sortir_validated'):
-                    logger.warning(f"[Sortir] Position {position.item.name} sans validation Sortir dans meta_info")
+                event_log.debug('cart_item_requires_sortir', item=position.item_id)
+
+                meta_info = _parse_meta_info(position.meta_info)
+
+                # Position déjà rattachée à une réservation encore valide de ce panier
+                usage_id = meta_info.get('sortir_usage_id')
+                if usage_id and SortirUsage.objects.filter(
+                    pk=usage_id,
+                    event=sender,
+                    cart_id=position.cart_id,
+                    cart_position_id=position.pk,
+                    status='pending',
+                    order__isnull=True
+                ).exists():
+                    continue
+
+                usage = SortirUsage.claim_for_cart_position(
+                    event=sender,
+                    cart_id=position.cart_id,
+                    position_id=position.pk,
+                    live_position_ids=live_position_ids
+                )
+
+                if not usage:
+                    event_log.warning('cart_position_without_usage', item=position.item_id, position=position.pk)
                     # On laisse passer car la validation sera re-vérifiée à order_placed
-                    # Ceci permet au checkout de fonctionner même si le meta_info n'est pas encore set
+                    # Ceci permet au checkout de fonctionner même si la carte est validée après l'ajout
                     continue
 
-                card_number = meta_info.get('sortir_card_number')
-                if card_number:
-                    logger.info(f"[Sortir] Carte ***{card_number[-4:]} déjà validée pour {position.item.name}")
-                else:
-                    logger.warning(f"[Sortir] Pas de numéro de carte dans meta_info pour {position.item.name}")
+                meta_info['sortir_validated'] = True
+                meta_info['sortir_usage_id'] = usage.pk
+                position.meta_info = json.dumps(meta_info)
+                position.save(update_fields=['meta_info'])
+
+                event_log.info('usage_attached_to_cart', card=usage.sortir_number_suffix, position=position.pk)
 
             except SortirItemConfig.DoesNotExist:
                 # Pas de configuration Sortir pour cet item
                 continue
 
 
+def _parse_meta_info(meta_info):
+    """Parse meta_info si nécessaire (peut être une string JSON)."""
+    if isinstance(meta_info, str):
+        try:
+            meta_info = json.loads(meta_info)
+        except (json.JSONDecodeError, TypeError):
+            meta_info = {}
+    elif not meta_info:
+        meta_info = {}
+    return meta_info
+
+
+@receiver(register_data_exporters, dispatch_uid='sortir_export_usages')
+@receiver(register_multievent_data_exporters, dispatch_uid='sortir_export_usages_multievent')
+def register_usage_exporter(sender, **kwargs):
+    """Export des utilisations Sortir! (événement et organisateur)."""
+    from .exporters import SortirUsageExporter
+    return SortirUsageExporter
+
+
+@receiver(register_data_exporters, dispatch_uid='sortir_export_audit_log')
+@receiver(register_multievent_data_exporters, dispatch_uid='sortir_export_audit_log_multievent')
+def register_audit_log_exporter(sender, **kwargs):
+    """Export du journal d'audit Sortir! (événement et organisateur)."""
+    from .exporters import SortirAuditLogExporter
+    return SortirAuditLogExporter
+
+
+@receiver(post_save, sender=SortirEventSettings, dispatch_uid='sortir_event_settings_saved')
+@receiver(post_delete, sender=SortirEventSettings, dispatch_uid='sortir_event_settings_deleted')
+def invalidate_event_enabled_cache(sender, instance, **kwargs):
+    """Invalide l'état d'activation mis en cache pour l'événement."""
+    SortirEventSettings.invalidate_enabled(instance.event)
+
+
 @receiver(html_head, dispatch_uid='sortir_html_head')
 def add_sortir_html_head(sender, request=None, **kwargs):
     """Ajoute le CSS et JavaScript pour Sortir! dans le <head>"""
@@ -81,13 +138,8 @@ def add_sortir_html_head(sender, request=None, **kwargs):
     if not hasattr(request, 'event') or not request.event:
         return ""
 
-    # Vérifie si Sortir est activé pour cet événement
-    try:
-        event_settings = SortirEventSettings.objects.get(
-            event=request.event,
-            enabled=True
-        )
-    except SortirEventSettings.DoesNotExist:
+    # Vérifie si Sortir est activé pour cet événement (valeur en cache)
+    if not SortirEventSettings.get_enabled(request.event):
         # Plugin pas activé pour cet événement
         return ""
 
@@ -110,15 +162,12 @@ def add_sortir_html_head(sender, request=None, **kwargs):
     if not sortir_items:
         return ""
 
-    from django.templatetags.static import static
-    import time
-
-    # Cache buster pour forcer le rechargement du JS/CSS (comme Pretix le fait pour les thèmes)
-    sortir_version = request.event.cache.get_or_set("sortir_version", default=lambda: int(time.time()))
+    from .assets import asset_url
 
+    # Cache buster : empreinte du contenu de chaque asset (manifeste publié)
     return mark_safe(f"""
-<link rel="stylesheet" type="text/css" href="{static('pretix_sortir/sortir.css')}?v={sortir_version}">
-<script src="{static('pretix_sortir/sortir.js')}?v={sortir_version}" data-sortir-config='{json.dumps(sortir_items)}'></script>
+<link rel="stylesheet" type="text/css" href="{asset_url('sortir.css')}">
+<script src="{asset_url('sortir.js')}" data-sortir-config='{json.dumps(sortir_items)}'></script>
 """)
 
 
@@ -126,13 +175,8 @@ def add_sortir_html_head(sender, request=None, **kwargs):
 def add_sortir_item_description(sender, item=None, variation=None, **kwargs):
     """Ajoute une indication dans la description de l'item s'il nécessite Sortir"""
 
-    # Vérifie si Sortir est activé pour cet événement
-    try:
-        event_settings = SortirEventSettings.objects.get(
-            event=sender,
-            enabled=True
-        )
-    except SortirEventSettings.DoesNotExist:
+    # Vérifie si Sortir est activé pour cet événement (valeur en cache)
+    if not SortirEventSettings.get_enabled(sender):
         return ""
 
     # Vérifie si cet item nécessite Sortir
@@ -144,7 +188,7 @@ def add_sortir_item_description(sender, item=None, variation=None, **kwargs):
     ).first()
 
     if config:
-        logger.info(f"Item {item.name} nécessite Sortir")
+        event_log.debug('item_requires_sortir', item=item.pk)
         return mark_safe("""
 <div style="background-color: #e3f2fd; padding: 10px; margin-top: 10px; border-radius: 4px; border-left: 4px solid #2196f3;">
     Une carte Sortir! valide sera requise lors de la commande.
@@ -169,69 +213,38 @@ def final_sortir_verification(sender, order, **kwargs):
     from django_scopes import scopes_disabled
     from .api import APRASClient
     from .models import SortirOrganizerSettings, SortirUsage
+    from .timing import RequestTimer
 
-    logger.info(f"[Sortir] Vérification finale commande {order.code}")
+    event_log.info('order_check', order=order.code)
 
     # Évite les doubles exécutions : vérifie si des SortirUsage sont déjà liés à cette commande
     existing_usages = SortirUsage.objects.filter(order=order).count()
     if existing_usages > 0:
-        logger.info(f"[Sortir] Commande {order.code} déjà traitée ({existing_usages} usages), skip")
+        event_log.info('order_already_processed', order=order.code, usages=existing_usages)
         return
 
-    with scopes_disabled():
-        # Récupère les settings de l'organisateur
-        try:
-            org_settings = SortirOrganizerSettings.objects.get(
-                organizer=order.event.organizer,
-                api_enabled=True
-            )
-        except SortirOrganizerSettings.DoesNotExist:
-            logger.error(f"[Sortir] Pas de configuration API pour l'organisateur {order.event.organizer}")
-            # Continue sans bloquer si pas de config (ne devrait pas arriver)
-            return
-
-        # Client API pour revalidation
-        api_client = APRASClient(
-            base_url=org_settings.api_url,
-            token=org_settings.api_token,
-            timeout=org_settings.api_timeout
-        )
+    # Temps par poste (SORTIR_AUDIT_TIMINGS, voir timing.py)
+    timer = RequestTimer.from_settings()
 
-        # Compte combien de positions nécessitent Sortir
-        sortir_positions_count = 0
-        for position in order.positions.all():
+    with timer, scopes_disabled():
+        # Récupère les settings de l'organisateur
+        with timer.span('settings'):
             try:
-                SortirItemConfig.objects.get(
-                    event=order.event,
-                    item=position.item,
-                    variation=position.variation,
-                    requires_sortir=True
+                org_settings = SortirOrganizerSettings.objects.get(
+                    organizer=order.event.organizer,
+                    api_enabled=True
                 )
-                sortir_positions_count += 1
-            except SortirItemConfig.DoesNotExist:
-                pass
-
-        # Récupère les N plus récents SortirUsage pending (créés dans les 5 dernières minutes)
-        from datetime import timedelta
-        recent_threshold = timezone.now() - timedelta(minutes=5)
-
-        recent_pending_usages = SortirUsage.objects.filter(
-            event=order.event,
-            status='pending',
-            order__isnull=True,
-            created_at__gte=recent_threshold  # Seulement les récents
-        ).order_by('-created_at')[:sortir_positions_count]  # Les N plus récents
-
-        if len(recent_pending_usages) < sortir_positions_count:
-            logger.error(f"[Sortir] Pas assez de SortirUsage récents : besoin de {sortir_positions_count}, trouvé {len(recent_pending_usages)}")
-            raise ValidationError(_(f"Erreur : Validations Sortir manquantes. Veuillez rafraîchir et réessayer."))
-
-        # Convertit en liste pour itération facile
-        pending_usages_list = list(recent_pending_usages)
-        usage_index = 0
-
-        # Liste des IDs de SortirUsage déjà traités dans cette commande
-        processed_usage_ids = []
+            except SortirOrganizerSettings.DoesNotExist:
+                event_log.error('missing_api_settings', organizer=order.event.organizer.slug)
+                # Continue sans bloquer si pas de config (ne devrait pas arriver)
+                return
+
+            # Client API pour revalidation (déchiffre le token)
+            api_client = APRASClient(
+                base_url=org_settings.api_url,
+                token=org_settings.api_token,
+                timeout=org_settings.api_timeout
+            )
 
         for position in order.positions.all():
             try:
@@ -243,40 +256,37 @@ def final_sortir_verification(sender, order, **kwargs):
                     requires_sortir=True
                 )
 
-                # Parse meta_info si nécessaire (peut être une string JSON)
-                meta_info = position.meta_info
-                if isinstance(meta_info, str):
-                    try:
-                        meta_info = json.loads(meta_info)
-                    except (json.JSONDecodeError, TypeError):
-                        meta_info = {}
-                elif not meta_info:
-                    meta_info = {}
-
-                # Prend le prochain SortirUsage dans la liste des récents
-                if usage_index >= len(pending_usages_list):
-                    logger.error(f"[Sortir] Index hors limites : {usage_index} >= {len(pending_usages_list)}")
-                    raise ValidationError(_(f"Erreur : Pas assez de validations Sortir"))
-
-                pending_usage = pending_usages_list[usage_index]
-                usage_index += 1
+                meta_info = _parse_meta_info(position.meta_info)
+
+                # Réclame la réservation rattachée à cette position lors de validate_cart.
+                # Le verrou (skip_locked) empêche deux commandes concurrentes de prendre
+                # la même réservation : celle qui perd la course ne la voit simplement pas.
+                usage_id = meta_info.get('sortir_usage_id')
+                pending_usage = None
+                if usage_id:
+                    with timer.span('usage'), transaction.atomic():
+                        pending_usage = SortirUsage.objects.select_for_update(skip_locked=True).filter(
+                            pk=usage_id,
+                            event=order.event,
+                            status='pending',
+                            order__isnull=True
+                        ).first()
+
+                        if pending_usage:
+                            pending_usage.order = order
+                            pending_usage.item = position.item
+                            pending_usage.variation = position.variation
+                            pending_usage.status = 'validated'
+                            pending_usage.validated_at = timezone.now()
+                            pending_usage.save()
 
                 if not pending_usage:
-                    logger.error(f"[Sortir] SÉCURITÉ : Aucun SortirUsage pending trouvé pour position {position.pk} commande {order.code}")
-                    raise ValidationError(_(f"Erreur critique : Aucune validation Sortir trouvée pour {position.item.name}"))
-
-                # Met à jour le SortirUsage avec la commande
-                pending_usage.order = order
-                pending_usage.item = position.item
-                pending_usage.variation = position.variation
-                pending_usage.status = 'validated'
-                pending_usage.validated_at = timezone.now()
-                pending_usage.save()
+                    event_log.error('pending_usage_missing', order=order.code, position=position.pk)
+                    raise ValidationError(
+                        _("Erreur : Validations Sortir manquantes. Veuillez rafraîchir et réessayer.")
+                    )
 
-                # Marque cet usage comme traité
-                processed_usage_ids.append(pending_usage.id)
-
-                logger.info(f"[Sortir] SortirUsage {pending_usage.id} lié à la commande {order.code}")
+                event_log.info('usage_linked', order=order.code, usage=pending_usage.id)
 
                 # Ajoute un commentaire interne à la commande pour le support (RGPD)
                 # Ne pas écraser les commentaires existants, ajouter une ligne
@@ -291,127 +301,212 @@ def final_sortir_verification(sender, order, **kwargs):
                     order.comment = sortir_comment
                     order.save(update_fields=['comment'])
 
-                logger.info(f"[Sortir] Commentaire ajouté à la commande {order.code} : ***{pending_usage.sortir_number_suffix}")
+                event_log.info('order_comment_added', order=order.code, card=pending_usage.sortir_number_suffix)
 
                 # Audit trail enregistrement utilisation (PHASE 2 - Point 9)
                 from .models import SortirAuditLog
-                SortirAuditLog.log(
-                    action='usage_recorded',
-                    severity='info',
-                    event=order.event,
-                    organizer=order.event.organizer,
-                    order=order,
-                    message=f'Utilisation finalisée (ID: {pending_usage.id}) pour commande {order.code}'
-                )
-
-                logger.info(f"[Sortir] Position {position.pk} validée pour commande {order.code}")
+                with timer.span('audit'):
+                    SortirAuditLog.log(
+                        action='usage_recorded',
+                        severity='info',
+                        event=order.event,
+                        organizer=order.event.organizer,
+                        order=order,
+                        message=f'Utilisation finalisée (ID: {pending_usage.id}) pour commande {order.code}',
+                        **timer.audit_details()
+                    )
+
+                event_log.info('position_validated', order=order.code, position=position.pk)
 
             except SortirItemConfig.DoesNotExist:
                 # Pas de config Sortir pour cet item
                 continue
 
+    if timer.audit_enabled:
+        event_log.info('timings', scope='order_check', order=order.code, **timer.log_fields())
+
 
 @receiver(order_paid, dispatch_uid='sortir_order_paid_grant')
 def order_paid_handler(sender, **kwargs):
     """
     Handler appelé lorsqu'une commande est payée (order_paid signal).
 
-    Envoie les appels POST /api/partners/grant à l'API APRAS pour chaque carte validée.
-    C'est à ce moment que l'APRAS enregistre la vente pour sa traçabilité.
+    Met en file la tâche Celery qui envoie les appels POST /api/partners/grant à l'API APRAS
+    pour chaque carte validée. C'est à ce moment que l'APRAS enregistre la vente pour sa traçabilité.
 
     IMPORTANT : Ce n'est PAS dans order_placed qu'on fait le grant, mais dans order_paid,
     car l'APRAS doit être notifié uniquement pour les paiements confirmés.
+    Le signal est émis dans les webhooks de paiement : aucun appel APRAS n'est fait ici,
+    la tâche gère ses propres retries (voir tasks.send_order_grants).
     """
-    from django_scopes import scopes_disabled
-    from .api import APRASClient
-    from .models import SortirOrganizerSettings, SortirUsage
+    from .tasks import send_order_grants
 
     order = kwargs['order']
-    logger.info(f"[Sortir] order_paid_handler appelé pour commande {order.code}")
+    event_log.info('order_paid', order=order.code)
+
+    # Paiement tardif d'une commande expirée : ses numéros avaient été libérés
+    restore_expired_usages(sender, order)
+
+    # Enfile après le commit pour que le worker voie les SortirUsage à jour
+    transaction.on_commit(
+        lambda: send_order_grants.apply_async(kwargs={'event': order.event_id, 'order': order.pk})
+    )
+
+
+@receiver(order_canceled, dispatch_uid='sortir_order_canceled_release')
+@receiver(order_expired, dispatch_uid='sortir_order_expired_release')
+def release_order_usages(sender, order, **kwargs):
+    """
+    Libère les numéros Sortir! d'une commande annulée ou expirée (option release_on_cancel).
+
+    Pretix n'a pas de signal dédié au remboursement : un remboursement complet passe par
+    l'annulation de la commande, donc par order_canceled.
+
+    Tous les SortirUsage actifs de la commande passent en 'cancelled' (ou 'expired' pour une
+    commande expirée) en un seul UPDATE, ce qui les sort de la contrainte
+    unique_card_per_event_active : la carte est réutilisable. Une commande expirée peut encore
+    être payée : ses usages 'expired' sont alors rétablis (voir restore_expired_usages).
+    """
+    from django_scopes import scopes_disabled
+    from pretix.base.models import Order
+    from .models import SortirAuditLog, SortirOrganizerSettings, SortirUsage
 
     with scopes_disabled():
-        # Récupère tous les SortirUsage de cette commande avec status='validated'
-        usages = SortirUsage.objects.filter(
+        release_on_cancel = SortirOrganizerSettings.objects.filter(
+            organizer_id=sender.organizer_id
+        ).values_list('release_on_cancel', flat=True).first()
+
+        if not release_on_cancel:
+            return
+
+        released = SortirUsage.objects.filter(
             order=order,
-            status='validated'
-        ).select_related('event', 'order')
+            status__in=['pending', 'validated', 'used']
+        ).update(status='expired' if order.status == Order.STATUS_EXPIRED else 'cancelled')
 
-        if not usages.exists():
-            logger.info(f"[Sortir] Aucun SortirUsage à notifier pour commande {order.code}")
+        if not released:
             return
 
-        # Récupère les settings de l'organisateur
-        try:
-            org_settings = SortirOrganizerSettings.objects.get(
-                organizer=order.event.organizer,
-                api_enabled=True
-            )
-        except SortirOrganizerSettings.DoesNotExist:
-            logger.error(f"[Sortir] Pas de configuration API pour l'organisateur {order.event.organizer}")
+        event_log.info('usages_released', order=order.code, status=order.status, count=released)
+
+        SortirAuditLog.log(
+            action='usage_cancelled',
+            severity='info',
+            event=sender,
+            organizer=sender.organizer,
+            order=order,
+            message=f'{released} utilisation(s) libérée(s) pour commande {order.code}',
+            released=released,
+            order_status=order.status
+        )
+
+
+def restore_expired_usages(event, order):
+    """
+    Rétablit les numéros Sortir! d'une commande expirée qui est finalement payée.
+
+    Les usages 'expired' de la commande repassent en 'validated' : send_order_grants
+    enverra leur grant. Si la carte a été utilisée entre-temps par une autre commande
+    (contrainte unique_card_per_event_active), l'usage reste 'expired' et le conflit
+    est tracé dans le journal d'audit.
+    """
+    from django.db import IntegrityError
+    from django_scopes import scopes_disabled
+    from .models import SortirAuditLog, SortirUsage
+
+    with scopes_disabled():
+        expired_ids = list(SortirUsage.objects.filter(order=order, status='expired').values_list('pk', flat=True))
+        if not expired_ids:
             return
 
-        # Crée le client API
-        api_client = APRASClient(
-            base_url=org_settings.api_url,
-            token=org_settings.api_token,
-            timeout=org_settings.api_timeout
+        restored = 0
+        conflicts = []
+        for usage_id in expired_ids:
+            try:
+                with transaction.atomic():
+                    restored += SortirUsage.objects.filter(pk=usage_id, status='expired').update(status='validated')
+            except IntegrityError:
+                conflicts.append(usage_id)
+
+        event_log.info('usages_restored', order=order.code, count=restored, conflicts=len(conflicts))
+
+        SortirAuditLog.log(
+            action='usage_recorded',
+            severity='error' if conflicts else 'info',
+            event=event,
+            organizer=event.organizer,
+            order=order,
+            message=(
+                f'{restored} utilisation(s) rétablie(s) pour commande expirée puis payée {order.code}'
+                + (f', {len(conflicts)} carte(s) déjà utilisée(s) par une autre commande' if conflicts else '')
+            ),
+            restored=restored,
+            conflicts=conflicts
         )
 
-        # Pour chaque usage, envoie le grant à l'APRAS
-        for usage in usages:
-            if not usage.service_key:
-                logger.error(f"[Sortir] SortirUsage {usage.id} sans service_key - impossible d'envoyer le grant")
 
-                # Audit trail erreur
-                from .models import SortirAuditLog
-                SortirAuditLog.log(
-                    action='grant_failed',
-                    severity='error',
-                    event=order.event,
-                    organizer=order.event.organizer,
-                    order=order,
-                    message=f'service_key manquant pour SortirUsage {usage.id}'
-                )
-                continue
+@receiver(periodic_task, dispatch_uid='sortir_audit_partitions')
+def ensure_audit_partitions(sender, **kwargs):
+    """
+    Crée à l'avance les partitions mensuelles du journal d'audit (si la table est partitionnée).
+
+    Vérifié au plus toutes les 6 heures.
+    """
+    from django.core.cache import cache
+    from . import partitioning
 
-            # Appel POST /api/partners/grant
-            success, result = api_client.post_grant(service_key=usage.service_key)
+    cache_key = 'sortir_audit_partitions_checked'
+    if cache.get(cache_key):
+        return
+    cache.set(cache_key, True, 6 * 3600)
 
-            if success:
-                # Grant réussi - stocke l'ID de la demande APRAS
-                usage.apras_request_id = str(result.id)
-                usage.status = 'used'  # Marque comme utilisé
-                usage.save(update_fields=['apras_request_id', 'status'])
+    if partitioning.is_partitioned():
+        partitioning.ensure_partitions()
 
-                logger.info(f"[Sortir] Grant envoyé avec succès pour SortirUsage {usage.id} - APRAS request_id: {result.id}")
 
-                # Audit trail succès
-                from .models import SortirAuditLog
-                SortirAuditLog.log(
-                    action='grant_success',
-                    severity='info',
-                    event=order.event,
-                    organizer=order.event.organizer,
-                    order=order,
-                    message=f'Grant envoyé avec succès (APRAS request_id: {result.id}, SortirUsage: {usage.id})'
-                )
-            else:
-                # Grant échoué - garde en status='validated' pour retry ultérieur
-                error_message = str(result) if result else "Erreur inconnue"
-                logger.error(f"[Sortir] Échec grant pour SortirUsage {usage.id} : {error_message}")
+@receiver(periodic_task, dispatch_uid='sortir_daily_stats')
+def update_daily_stats(sender, **kwargs):
+    """Agrège les nouvelles entrées du journal d'audit dans les statistiques journalières"""
+    from .rollups import update_daily_stats
+
+    update_daily_stats()
 
-                # Audit trail échec
-                from .models import SortirAuditLog
-                SortirAuditLog.log(
-                    action='grant_failed',
-                    severity='error',
-                    event=order.event,
-                    organizer=order.event.organizer,
-                    order=order,
-                    message=f'Échec grant pour SortirUsage {usage.id} : {error_message}'
-                )
 
-                # TODO: Implémenter un système de retry automatique pour les grants échoués
-                # Pour l'instant, l'usage reste en status='validated' pour retry manuel
+@receiver(event_dashboard_widgets, dispatch_uid='sortir_dashboard_widgets')
+def add_dashboard_widgets(sender, subevent=None, lazy=False, **kwargs):
+    """
+    Widgets du tableau de bord de l'événement : activité Sortir! des 30 derniers jours.
 
-    logger.info(f"[Sortir] Validation finale OK pour commande {order.code}")
\ No newline at end of file
+    Lus dans les statistiques journalières (une seule requête d'agrégation).
+    """
+    from django.urls import reverse
+    from django.utils.html import format_html
+    from .rollups import get_recent_totals
+
+    if SortirEventSettings.get_enabled(sender) is False:
+        return []
+
+    totals = get_recent_totals(event=sender)
+    url = reverse('plugins:pretix_sortir:usage-list', kwargs={
+        'organizer': sender.organizer.slug,
+        'event': sender.slug,
+    })
+
+    widgets = [
+        (totals['validations'], _('Cartes Sortir! validées (30 jours)')),
+        (totals['failures'], _('Validations Sortir! échouées (30 jours)')),
+        (totals['grants'], _('Grants APRAS envoyés (30 jours)')),
+        (totals['rate_limit_hits'], _('Rate limits Sortir! (30 jours)')),
+    ]
+    return [
+        {
+            'content': format_html(
+                '<div class="numwidget"><span class="num">{}</span><span class="text">{}</span></div>',
+                num, text
+            ),
+            'display_size': 'small',
+            'priority': 50,
+            'url': url,
+        }
+        for num, text in widgets
+    ]
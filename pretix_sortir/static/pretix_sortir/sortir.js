@@ -1,5 +1,6 @@
 // JavaScript pour le plugin Sortir!
-// Version: 2025-10-28-15:30 - Fix: suppression des champs quand quantité diminue
+// Version: 2026-10-19 - Piloté par événements : aucun setInterval ni MutationObserver,
+// validation différée (debounce) et annulable (AbortController), une requête par champ au plus
 
 // FONCTION GLOBALE DE BLOCAGE - Intercepte TOUS les clics
 window.sortirBlockerActive = false;
@@ -119,6 +120,68 @@ document.addEventListener('DOMContentLoaded', function() {
     // Nettoie les anciennes sessions au chargement
     cleanOldSessionData();
 
+    // Délai après la dernière frappe avant d'appeler l'API de validation
+    var VALIDATION_DEBOUNCE_MS = 300;
+
+    // Requête de validation de chaque champ (clé : id de l'input) :
+    // { timer, controller, seq } - seq identifie la dernière demande, les réponses plus
+    // anciennes sont ignorées
+    var fieldRequests = {};
+
+    // Mise à jour des boutons regroupée : une seule par frame, quel que soit le nombre d'appels
+    var buttonUpdateScheduled = false;
+    function scheduleButtonUpdate() {
+        if (buttonUpdateScheduled || !globalCheckSortirState) {
+            return;
+        }
+        buttonUpdateScheduled = true;
+        window.requestAnimationFrame(function() {
+            buttonUpdateScheduled = false;
+            globalCheckSortirState();
+        });
+    }
+
+    // Annule la validation en attente ou en cours d'un champ
+    function cancelValidation(input) {
+        var request = input && fieldRequests[input.id];
+        if (!request) {
+            return;
+        }
+        clearTimeout(request.timer);
+        if (request.controller) {
+            request.controller.abort();
+        }
+        request.seq++;
+        request.timer = null;
+        request.controller = null;
+    }
+
+    // Planifie la validation d'un champ après VALIDATION_DEBOUNCE_MS sans nouvelle saisie
+    function scheduleValidation(cardNumber, validationDiv, input) {
+        cancelValidation(input);
+        var request = fieldRequests[input.id] || (fieldRequests[input.id] = { timer: null, controller: null, seq: 0 });
+        var seq = request.seq;
+
+        validationDiv.innerHTML = '<i class="fa fa-spinner fa-spin"></i> Vérification en cours...';
+        validationDiv.className = 'sortir-validation loading';
+        request.timer = setTimeout(function() {
+            request.timer = null;
+            validateCardWithAPI(cardNumber, validationDiv, input, request, seq);
+        }, VALIDATION_DEBOUNCE_MS);
+    }
+
+    function getCsrfToken() {
+        return document.querySelector('[name=csrfmiddlewaretoken]')?.value || '';
+    }
+
+    // Quantité demandée (les produits limités à 1 utilisent une case à cocher)
+    function getQuantity(quantityInput) {
+        if (quantityInput.type === 'checkbox') {
+            return quantityInput.checked ? 1 : 0;
+        }
+        return parseInt(quantityInput.value) || 0;
+    }
+
     // Récupère la configuration depuis l'attribut data-sortir-config
     var scriptTag = document.querySelector('script[data-sortir-config]');
     var sortirConfig = {};
@@ -137,6 +200,27 @@ document.addEventListener('DOMContentLoaded', function() {
         return;
     }
 
+    // URL d'une vue Sortir de l'événement courant (/<organisateur>/<événement>/sortir/<nom>/)
+    // Dans le widget (/<organisateur>/<événement>/w/<namespace>/...), le panier est celui du
+    // widget : l'espace de noms du panier et take_cart_id sont transmis à la vue
+    function getSortirUrl(name) {
+        var pathParts = window.location.pathname.split('/');
+        var url = '/' + pathParts[1] + '/' + pathParts[2] + '/';
+        if (pathParts[3] === 'w' && pathParts[4]) {
+            url += 'w/' + pathParts[4] + '/';
+        }
+        url += 'sortir/' + name + '/';
+
+        var takeCartId = new URLSearchParams(window.location.search).get('take_cart_id');
+        if (takeCartId) {
+            url += '?take_cart_id=' + encodeURIComponent(takeCartId);
+        }
+        return url;
+    }
+
+    // Vérification des quantités de chaque item, appelée après un clic sur +/-
+    var quantityChangeHandlers = [];
+
     // Pour chaque item Sortir, surveille les changements de quantité
     Object.keys(sortirConfig).forEach(function(itemKey) {
         var config = sortirConfig[itemKey];
@@ -242,7 +326,8 @@ document.addEventListener('DOMContentLoaded', function() {
 
                 // Fonction pour ajuster le nombre de champs selon la quantité
                 function updateSortirFields() {
-                    var quantity = parseInt(quantityInput.value) || 0;
+                    var quantity = getQuantity(quantityInput);
+                    lastQuantity = quantity;
 
                     if (quantity > 0) {
                         window.sortirValidationRequired = true;
@@ -303,6 +388,7 @@ document.addEventListener('DOMContentLoaded', function() {
                         for (var i = quantity + 1; i <= 20; i++) {
                             if (existingFieldsMap[i]) {
                                 // Ce champ existe mais ne devrait plus : on le supprime
+                                cancelValidation(existingFieldsMap[i].querySelector('.sortir-card-input'));
                                 existingFieldsMap[i].remove();
                             }
                         }
@@ -335,6 +421,7 @@ document.addEventListener('DOMContentLoaded', function() {
 
                     } else {
                         // Quantité = 0 : supprime tous les champs
+                        sortirFieldsContainer.querySelectorAll('.sortir-card-input').forEach(cancelValidation);
                         while (sortirFieldsContainer.firstChild) {
                             sortirFieldsContainer.removeChild(sortirFieldsContainer.firstChild);
                         }
@@ -346,155 +433,154 @@ document.addEventListener('DOMContentLoaded', function() {
                     }
 
                     // Met à jour l'état des boutons
-                    if (globalCheckSortirState) {
-                        setTimeout(globalCheckSortirState, 100);
-                    }
+                    scheduleButtonUpdate();
                 }
 
-                // Écoute MULTIPLE pour capturer tous les changements (Pretix peut modifier via JS)
-                quantityInput.addEventListener('change', function() {
-                    updateSortirFields();
-                });
-                quantityInput.addEventListener('input', function() {
-                    updateSortirFields();
-                });
-
-                // Observer les changements de valeur via MutationObserver (si Pretix modifie l'attribut)
-                var observer = new MutationObserver(function(mutations) {
-                    mutations.forEach(function(mutation) {
-                        if (mutation.type === 'attributes' && mutation.attributeName === 'value') {
-                            updateSortirFields();
-                        }
-                    });
-                });
-                observer.observe(quantityInput, { attributes: true, attributeFilter: ['value'] });
-
-                // Polling de secours toutes les 500ms pour détecter les changements
-                var lastQuantity = parseInt(quantityInput.value) || 0;
-                setInterval(function() {
-                    var currentQuantity = parseInt(quantityInput.value) || 0;
-                    if (currentQuantity !== lastQuantity) {
-                        lastQuantity = currentQuantity;
+                // Ne reconstruit les champs que si la quantité a réellement changé
+                var lastQuantity = null;
+                function onQuantityMaybeChanged() {
+                    if (getQuantity(quantityInput) !== lastQuantity) {
                         updateSortirFields();
                     }
-                }, 500);
+                }
+
+                // Saisie directe dans le champ quantité
+                quantityInput.addEventListener('change', onQuantityMaybeChanged);
+                quantityInput.addEventListener('input', onQuantityMaybeChanged);
+
+                // Boutons +/- de Pretix : ils modifient la valeur en JS et déclenchent un
+                // 'change' jQuery, invisible pour addEventListener
+                if (window.jQuery) {
+                    window.jQuery(quantityInput).on('change', onQuantityMaybeChanged);
+                }
+                quantityChangeHandlers.push(onQuantityMaybeChanged);
 
                 // Génération initiale
                 updateSortirFields();
+            }
+        }
+    });
 
-                // NETTOYAGE DES PENDING : Appel automatique au cleanup au chargement
-                // Cela nettoie les cartes "pending" si l'utilisateur revient ou recharge la page
+    // Clic sur un bouton +/- de quantité : vérifie les quantités une fois le clic traité
+    // par Pretix (un seul écouteur délégué pour tous les produits)
+    if (quantityChangeHandlers.length > 0) {
+        document.addEventListener('click', function(e) {
+            if (e.target.closest && e.target.closest('[data-step], .input-item-count-inc, .input-item-count-dec')) {
                 setTimeout(function() {
-                    var pathParts = window.location.pathname.split('/');
-                    var organizer = pathParts[1];
-                    var event = pathParts[2];
-                    var cleanupUrl = '/' + organizer + '/' + event + '/sortir/cleanup-session/';
-
-                    fetch(cleanupUrl, {
-                        method: 'POST',
-                        headers: {
-                            'Content-Type': 'application/json',
-                            'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]')?.value || ''
-                        },
-                        body: JSON.stringify({
-                            session_id: sessionId
-                        })
-                    })
-                    .then(function(response) {
-                        return response.json();
-                    })
-                    .then(function(data) {
-                        if (data.success && data.deleted > 0) {
-                            // Nettoyage réussi
-                        }
-                    })
-                    .catch(function(err) {
-                        // Erreur lors du nettoyage
+                    quantityChangeHandlers.forEach(function(handler) {
+                        handler();
                     });
-                }, 1000); // Délai pour être sûr que la page est chargée
+                }, 0);
             }
-        }
-    });
+        });
+
+        // NETTOYAGE DES PENDING : Appel unique au cleanup au chargement
+        // Cela nettoie les cartes "pending" si l'utilisateur revient ou recharge la page
+        fetch(getSortirUrl('cleanup-session'), {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCsrfToken()
+            },
+            body: JSON.stringify({
+                session_id: sessionId
+            })
+        })
+        .catch(function(err) {
+            // Erreur lors du nettoyage
+        });
+    }
 
     // Variable globale pour la fonction de vérification des boutons
     var globalCheckSortirState = null;
 
     // Fonction de validation via API
-    function validateCardWithAPI(cardNumber, validationDiv, input) {
+    // request/seq : demande en cours du champ (voir scheduleValidation) ; une réponse dont
+    // seq n'est plus le dernier (saisie modifiée, champ supprimé) est ignorée
+    function validateCardWithAPI(cardNumber, validationDiv, input, request, seq) {
         // Affiche un loading
         validationDiv.innerHTML = '<i class="fa fa-spinner fa-spin"></i> Vérification en cours...';
         validationDiv.className = 'sortir-validation loading';
         input.setAttribute('data-valid', 'false');
 
         // Déclenche la vérification des boutons (mise en attente)
-        if (globalCheckSortirState) {
-            globalCheckSortirState();
-        }
+        scheduleButtonUpdate();
 
-        // Récupère l'URL de base depuis l'URL actuelle
-        var pathParts = window.location.pathname.split('/');
-        var organizer = pathParts[1];
-        var event = pathParts[2];
-        var validateUrl = '/' + organizer + '/' + event + '/sortir/validate/';
-        var cleanupUrl = '/' + organizer + '/' + event + '/sortir/cleanup-session/';
+        var controller = typeof AbortController !== 'undefined' ? new AbortController() : null;
+        var signal = controller ? controller.signal : undefined;
+        request.controller = controller;
+
+        function isCurrent() {
+            return request.seq === seq;
+        }
 
         // ÉTAPE 1: Nettoie d'abord les cartes "pending" de cette session avant validation
         // Cela permet de revalider une carte qu'on vient de supprimer/retaper
         var itemKey = input.dataset.item;
         var sessionId = sessionStorage.getItem(SESSION_ID_KEY);
 
-        fetch(cleanupUrl, {
+        fetch(getSortirUrl('cleanup-session'), {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
-                'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]')?.value || ''
+                'X-CSRFToken': getCsrfToken()
             },
             body: JSON.stringify({
                 session_id: sessionId,
                 card_number: cardNumber  // Nettoie spécifiquement cette carte
-            })
+            }),
+            signal: signal
         })
-        .then(function(response) {
-            return response.json();
+        .catch(function(err) {
+            // Si le cleanup échoue, continue quand même avec la validation (sauf annulation)
+            if (err.name === 'AbortError') {
+                throw err;
+            }
         })
-        .then(function(cleanupData) {
+        .then(function() {
             // ÉTAPE 2: Après le cleanup, lance la validation
-            return validateCardWithBackend(cardNumber, validateUrl);
-        })
-        .catch(function(err) {
-            // Si le cleanup échoue, continue quand même avec la validation
-            return validateCardWithBackend(cardNumber, validateUrl);
+            if (!isCurrent()) {
+                return null;
+            }
+            return validateCardWithBackend(cardNumber, signal);
         })
         .then(function(data) {
+            if (data === null || !isCurrent()) {
+                return;  // Réponse périmée
+            }
+            request.controller = null;
             handleValidationResponse(data, cardNumber, validationDiv, input, itemKey);
         })
         .catch(function(err) {
+            if (err.name === 'AbortError' || !isCurrent()) {
+                return;  // Requête annulée par une saisie plus récente
+            }
+            request.controller = null;
             validationDiv.innerHTML = '<i class="fa fa-exclamation-triangle"></i> Erreur de vérification';
             validationDiv.className = 'sortir-validation error';
             input.setAttribute('data-valid', 'false');
 
             // Met à jour l'état des boutons même en cas d'erreur
-            if (globalCheckSortirState) {
-                setTimeout(globalCheckSortirState, 100);
-            }
+            scheduleButtonUpdate();
         });
     }
 
     // Fonction helper pour appeler l'API de validation
-    function validateCardWithBackend(cardNumber, validateUrl) {
+    function validateCardWithBackend(cardNumber, signal) {
         // Récupère le session_id depuis sessionStorage (RGPD-compliant)
         var sessionId = sessionStorage.getItem(SESSION_ID_KEY) || '';
 
-        return fetch(validateUrl, {
+        return fetch(getSortirUrl('validate'), {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
-                'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]')?.value || ''
+                'X-CSRFToken': getCsrfToken()
             },
             body: JSON.stringify({
                 card_number: cardNumber,
                 session_id: sessionId  // Envoie le session_id pour gérer les corrections
-            })
+            }),
+            signal: signal
         })
         .then(function(response) {
             return response.json();
@@ -532,9 +618,7 @@ document.addEventListener('DOMContentLoaded', function() {
         }
 
         // CRUCIAL : Met à jour l'état des boutons après validation
-        if (globalCheckSortirState) {
-            setTimeout(globalCheckSortirState, 100);
-        }
+        scheduleButtonUpdate();
     }
 
     // Fonction pour sauvegarder le numéro validé en session
@@ -557,6 +641,9 @@ document.addEventListener('DOMContentLoaded', function() {
             var cleanValue = input.value.replace(/[^0-9]/g, '');
             input.value = cleanValue;
 
+            // Toute saisie rend périmée la validation précédente de ce champ
+            cancelValidation(input);
+
             // Validation du format et appel API
             if (cleanValue.length === 0) {
                 validationDiv.innerHTML = '';
@@ -583,19 +670,14 @@ document.addEventListener('DOMContentLoaded', function() {
                     validationDiv.className = 'sortir-validation error';
                     input.setAttribute('data-valid', 'false');
                 } else {
-                    // Pas de doublon : appel API automatique
-                    validateCardWithAPI(cleanValue, validationDiv, input);
+                    // Pas de doublon : appel API après une courte pause de saisie
+                    input.setAttribute('data-valid', 'false');
+                    scheduleValidation(cleanValue, validationDiv, input);
                 }
             }
 
-            // Met à jour l'état des boutons à chaque saisie (avec délai pour éviter surcharge)
-            if (globalCheckSortirState && !window.sortirCheckPending) {
-                window.sortirCheckPending = true;
-                setTimeout(function() {
-                    globalCheckSortirState();
-                    window.sortirCheckPending = false;
-                }, 200);
-            }
+            // Met à jour l'état des boutons (une fois par frame au plus)
+            scheduleButtonUpdate();
         }
     });
 
@@ -738,13 +820,9 @@ document.addEventListener('DOMContentLoaded', function() {
         // Assigne la fonction globale pour accès depuis validateCardWithAPI
         globalCheckSortirState = checkSortirStateAndUpdateButtons;
 
-        // Vérifie l'état initial
-        setTimeout(function() {
-            checkSortirStateAndUpdateButtons();
-        }, 100);
-
-        // Surveillance continue (toutes les 2 secondes pour éviter la surcharge)
-        setInterval(checkSortirStateAndUpdateButtons, 2000);
+        // Vérifie l'état initial ; ensuite, uniquement sur saisie, changement de quantité
+        // ou réponse de validation (aucune surveillance périodique)
+        scheduleButtonUpdate();
 
         // Blocage sur submit en dernier recours
         cartForm.addEventListener('submit', function(e) {
@@ -770,22 +848,6 @@ document.addEventListener('DOMContentLoaded', function() {
                 }
             });
         }, true); // useCapture = true pour intercepter en premier
-
-        // Observer les changements de DOM pour nouveaux boutons
-        var observer = new MutationObserver(function(mutations) {
-            mutations.forEach(function(mutation) {
-                mutation.addedNodes.forEach(function(node) {
-                    if (node.nodeType === 1) { // Element node
-                        var newButtons = node.querySelectorAll ? node.querySelectorAll('button[type="submit"], input[type="submit"]') : [];
-                        if (newButtons.length > 0) {
-                            checkSortirStateAndUpdateButtons();
-                        }
-                    }
-                });
-            });
-        });
-
-        observer.observe(cartForm, { childList: true, subtree: true });
     } else {
         // Tente une recherche tardive (cas où le form est généré dynamiquement)
         setTimeout(function() {
@@ -0,0 +1,192 @@
+"""
+Tâches asynchrones (Celery) du plugin Sortir!
+
+Les appels à l'API APRAS déclenchés par les signaux de commande sont exécutés ici,
+hors du chemin de paiement (webhooks des prestataires, « marquer comme payé »).
+"""
+
+from django.db import transaction
+from django.utils import timezone
+from django_scopes import scopes_disabled
+from pretix.base.models import Event, Order
+from pretix.base.services.tasks import EventTask
+from pretix.celery_app import app
+
+from .logevents import get_event_logger
+
+event_log = get_event_logger()
+
+# Backoff des retries du grant : 1 min, 2 min, 4 min... (plafonné à 1h)
+GRANT_MAX_RETRIES = 8
+GRANT_RETRY_BASE_DELAY = 60
+GRANT_RETRY_MAX_DELAY = 3600
+
+
+# Pas d'acks_late : une tâche relivrée après une coupure du worker renverrait les grants
+# déjà acceptés par l'APRAS mais pas encore enregistrés (status='used')
+@app.task(base=EventTask, bind=True, max_retries=GRANT_MAX_RETRIES)
+def send_order_grants(self, event: Event, order: int):
+    """
+    Envoie les POST /api/partners/grant à l'APRAS pour les cartes validées d'une commande payée.
+
+    Idempotente : seuls les SortirUsage encore en status='validated' sont traités, ceux déjà
+    notifiés passent en 'used'. Chaque usage est verrouillé pendant son envoi : une exécution
+    concurrente pour la même commande passe les usages déjà pris. En cas d'échec d'au moins
+    un grant, la tâche est relancée avec un backoff exponentiel.
+    """
+    from .api import APRASClient
+    from .models import SortirOrganizerSettings, SortirUsage
+    from .timing import RequestTimer
+
+    # Temps par poste (SORTIR_AUDIT_TIMINGS, voir timing.py)
+    timer = RequestTimer.from_settings()
+
+    with timer, scopes_disabled():
+        try:
+            order = Order.objects.get(pk=order, event=event)
+        except Order.DoesNotExist:
+            event_log.error('grant_order_missing', order=order)
+            return
+
+        # Récupère tous les SortirUsage de cette commande avec status='validated'
+        with timer.span('usage'):
+            usages = list(SortirUsage.objects.filter(
+                order=order,
+                status='validated'
+            ))
+
+        if not usages:
+            event_log.info('grant_nothing_to_send', order=order.code)
+            return
+
+        # Récupère les settings de l'organisateur
+        with timer.span('settings'):
+            try:
+                org_settings = SortirOrganizerSettings.objects.get(
+                    organizer=event.organizer,
+                    api_enabled=True
+                )
+            except SortirOrganizerSettings.DoesNotExist:
+                event_log.error('missing_api_settings', organizer=event.organizer.slug)
+                return
+
+            # Crée le client API (déchiffre le token)
+            api_client = APRASClient(
+                base_url=org_settings.api_url,
+                token=org_settings.api_token,
+                timeout=org_settings.api_timeout
+            )
+
+        # Pour chaque usage, envoie le grant à l'APRAS (et compte les échecs à rejouer)
+        attempt = self.request.retries + 1
+        failed = sum(
+            1 for usage in usages
+            if not _claim_and_send_grant(api_client, usage, event, order, timer, attempt=attempt)
+        )
+
+    if timer.audit_enabled:
+        event_log.info('timings', scope='grants', order=order.code, **timer.log_fields())
+
+    if failed:
+        if self.request.retries >= self.max_retries:
+            event_log.error('grant_abandoned', order=order.code, retries=self.request.retries)
+            return
+        countdown = min(GRANT_RETRY_BASE_DELAY * (2 ** self.request.retries), GRANT_RETRY_MAX_DELAY)
+        event_log.warning('grant_retry', order=order.code, failed=failed, countdown=countdown)
+        raise self.retry(countdown=countdown)
+
+    event_log.info('grants_sent', order=order.code)
+
+
+def _claim_and_send_grant(api_client, usage, event, order, timer, attempt):
+    """
+    Verrouille le SortirUsage puis envoie son grant, le verrou tenu jusqu'à l'enregistrement.
+
+    Returns:
+        True si l'usage est déjà pris par une autre exécution ou déjà notifié, sinon le
+        résultat de _send_grant
+    """
+    from .models import SortirUsage
+
+    with transaction.atomic():
+        with timer.span('usage'):
+            claimed = SortirUsage.objects.select_for_update(skip_locked=True).filter(
+                pk=usage.pk,
+                status='validated'
+            ).first()
+        if claimed is None:
+            event_log.info('grant_already_claimed', order=order.code, usage=usage.id)
+            return True
+        return _send_grant(api_client, claimed, event, order, timer, attempt=attempt)
+
+
+def _send_grant(api_client, usage, event, order, timer, attempt):
+    """
+    Envoie le grant d'un SortirUsage et trace le résultat (log, audit).
+
+    Returns:
+        False si le grant a échoué et doit être rejoué, True sinon (envoyé, ou
+        non rejouable faute de service_key)
+    """
+    from .models import SortirAuditLog
+
+    if not usage.service_key:
+        event_log.error('grant_missing_service_key', order=order.code, usage=usage.id)
+
+        # Audit trail erreur (non rejouable : pas de retry)
+        with timer.span('audit'):
+            SortirAuditLog.log(
+                action='grant_failed',
+                severity='error',
+                event=event,
+                organizer=event.organizer,
+                order=order,
+                message=f'service_key manquant pour SortirUsage {usage.id}',
+                **timer.audit_details()
+            )
+        return True
+
+    # Appel POST /api/partners/grant
+    with timer.span('apras'):
+        success, result = api_client.post_grant(service_key=usage.service_key)
+
+    if success:
+        # Grant réussi - stocke l'ID de la demande APRAS
+        usage.apras_request_id = str(result.id)
+        usage.status = 'used'  # Marque comme utilisé
+        usage.used_at = timezone.now()
+        with timer.span('usage'):
+            usage.save(update_fields=['apras_request_id', 'status', 'used_at'])
+
+        event_log.info('grant_sent', order=order.code, usage=usage.id, request_id=result.id)
+
+        # Audit trail succès
+        with timer.span('audit'):
+            SortirAuditLog.log(
+                action='grant_success',
+                severity='info',
+                event=event,
+                organizer=event.organizer,
+                order=order,
+                message=f'Grant envoyé avec succès (APRAS request_id: {result.id}, SortirUsage: {usage.id})',
+                **timer.audit_details()
+            )
+        return True
+
+    # Grant échoué - garde en status='validated' pour le prochain essai
+    error_message = str(result) if result else "Erreur inconnue"
+    event_log.error('grant_failed', order=order.code, usage=usage.id, error=error_message)
+
+    # Audit trail échec
+    with timer.span('audit'):
+        SortirAuditLog.log(
+            action='grant_failed',
+            severity='error',
+            event=event,
+            organizer=event.organizer,
+            order=order,
+            message=f'Échec grant pour SortirUsage {usage.id} : {error_message}',
+            attempt=attempt,
+            **timer.audit_details()
+        )
+    return False
@@ -0,0 +1,143 @@
+"""
+Mesure des temps des chemins critiques du plugin Sortir! (optionnel)
+
+Deux réglages Django, indépendants :
+
+- SORTIR_SERVER_TIMING = True : en-tête Server-Timing sur les réponses de la validation
+  de carte (visible dans l'onglet réseau du navigateur) ;
+- SORTIR_AUDIT_TIMINGS = True : détail des temps dans details['timings'] des entrées
+  d'audit écrites par la validation de carte, la vérification finale de commande et
+  l'envoi des grants (et un événement de log 'timings' en fin de traitement).
+
+Sans ces réglages, rien n'est mesuré. Postes mesurés : spans nommés (lookup, settings,
+apras, usage, audit, cache), et nombre et durée cumulée des requêtes SQL sur toutes les
+bases pendant la mesure. Les spans peuvent contenir des requêtes SQL : db n'est pas à
+additionner aux spans.
+
+    timer = RequestTimer.from_settings()
+    with timer:
+        with timer.span('apras'):
+            ...
+    response['Server-Timing'] = timer.server_timing()
+"""
+
+import time
+from contextlib import ExitStack, contextmanager
+
+
+class RequestTimer:
+    """Spans nommés et requêtes SQL d'un traitement (requête HTTP, signal, tâche)"""
+
+    def __init__(self, server_timing=False, audit=False):
+        self.server_timing_enabled = server_timing
+        self.audit_enabled = audit
+        self.enabled = server_timing or audit
+        self.spans = {}  # nom -> [durée cumulée en s, nombre]
+        self.db_queries = 0
+        self.db_time = 0.0
+        self._started = None
+        self._stopped = None
+        self._wrappers = None
+
+    @classmethod
+    def from_settings(cls):
+        from django.conf import settings
+
+        return cls(
+            server_timing=getattr(settings, 'SORTIR_SERVER_TIMING', False),
+            audit=getattr(settings, 'SORTIR_AUDIT_TIMINGS', False),
+        )
+
+    def start(self):
+        if not self.enabled or self._started is not None:
+            return self
+        from django.db import connections
+
+        self._started = time.perf_counter()
+        # Compte les requêtes de toutes les bases (audit dédiée, réplique) du thread courant
+        self._wrappers = ExitStack()
+        for connection in connections.all():
+            self._wrappers.enter_context(connection.execute_wrapper(self._count_query))
+        return self
+
+    def stop(self):
+        if self._wrappers is not None:
+            self._wrappers.close()
+            self._wrappers = None
+        if self._started is not None and self._stopped is None:
+            self._stopped = time.perf_counter()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _count_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_time += time.perf_counter() - started
+
+    @contextmanager
+    def span(self, name):
+        """Ajoute la durée du bloc au span name (cumulée si le span est répété)"""
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            span = self.spans.setdefault(name, [0.0, 0])
+            span[0] += time.perf_counter() - started
+            span[1] += 1
+
+    def total(self):
+        """Durée depuis start() (jusqu'à stop() s'il a été appelé), en secondes"""
+        if self._started is None:
+            return 0.0
+        return (self._stopped or time.perf_counter()) - self._started
+
+    def as_dict(self):
+        """Temps en millisecondes, prêts à sérialiser en JSON"""
+        return {
+            'total_ms': round(self.total() * 1000, 1),
+            'db': {'queries': self.db_queries, 'ms': round(self.db_time * 1000, 1)},
+            'spans': {
+                name: {'ms': round(duration * 1000, 1), 'count': count}
+                for name, (duration, count) in self.spans.items()
+            },
+        }
+
+    def server_timing(self):
+        """Valeur de l'en-tête Server-Timing"""
+        metrics = []
+        for name, (duration, count) in self.spans.items():
+            metric = f'{name};dur={duration * 1000:.1f}'
+            if count > 1:
+                metric += f';desc="{count}x"'
+            metrics.append(metric)
+        # En-tête HTTP : ASCII uniquement
+        metrics.append(f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} SQL"')
+        metrics.append(f'total;dur={self.total() * 1000:.1f}')
+        return ', '.join(metrics)
+
+    def log_fields(self):
+        """Champs à plat pour un événement de log 'timings' (total_ms, db_queries, db_ms, <span>_ms)"""
+        fields = {
+            'total_ms': round(self.total() * 1000, 1),
+            'db_queries': self.db_queries,
+            'db_ms': round(self.db_time * 1000, 1),
+        }
+        for name, (duration, _count) in self.spans.items():
+            fields[f'{name}_ms'] = round(duration * 1000, 1)
+        return fields
+
+    def audit_details(self):
+        """Détails à passer à SortirAuditLog.log (vide si SORTIR_AUDIT_TIMINGS est désactivé)"""
+        if not self.audit_enabled:
+            return {}
+        return {'timings': self.as_dict()}
@@ -6,6 +6,9 @@ urlpatterns = [
     path('control/organizer/<str:organizer>/settings/sortir/',
          views.SortirOrganizerSettingsView.as_view(),
          name='organizer-settings'),
+    path('control/organizer/<str:organizer>/sortir/stats.json',
+         views.SortirOrganizerStatsView.as_view(),
+         name='organizer-stats'),
 
     # Niveau événement
     path('control/event/<str:organizer>/<str:event>/settings/sortir/',
@@ -17,13 +20,25 @@ urlpatterns = [
          views.SortirUsageListView.as_view(),
          name='usage-list'),
 
+    # Statistiques journalières (JSON)
+    path('control/event/<str:organizer>/<str:event>/sortir/stats.json',
+         views.SortirEventStatsView.as_view(),
+         name='event-stats'),
+
     # API AJAX pour validation carte (boutique)
     path('<str:organizer>/<str:event>/sortir/validate/',
          views.SortirCardValidationView.as_view(),
          name='validate-card'),
+    # Même vue depuis le widget : le panier du widget est dans l'espace de noms cart_namespace
+    path('<str:organizer>/<str:event>/w/<str:cart_namespace>/sortir/validate/',
+         views.SortirCardValidationView.as_view(),
+         name='validate-card-widget'),
 
     # API pour nettoyer les pending de la session
     path('<str:organizer>/<str:event>/sortir/cleanup-session/',
          views.SortirCleanupSessionView.as_view(),
          name='cleanup-session'),
+    path('<str:organizer>/<str:event>/w/<str:cart_namespace>/sortir/cleanup-session/',
+         views.SortirCleanupSessionView.as_view(),
+         name='cleanup-session-widget'),
 ]
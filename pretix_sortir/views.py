@@ -13,11 +13,14 @@ from django.utils.translation import gettext_lazy as _
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views.generic import UpdateView, ListView, TemplateView
-from pretix.control.permissions import OrganizerPermissionRequiredMixin
+from pretix.control.permissions import EventPermissionRequiredMixin, OrganizerPermissionRequiredMixin
 from pretix.control.views.event import EventSettingsViewMixin
 
+from .assets import namespaced_key
 from .forms import SortirOrganizerSettingsForm
+from .logevents import get_event_logger
 from .models import SortirOrganizerSettings, SortirEventSettings, SortirItemConfig, SortirUsage
+from .routers import read_database
 
 logger = logging.getLogger('pretix.plugins.sortir')
 
@@ -28,6 +31,8 @@ if not any(isinstance(f, SensitiveDataFilter) for f in logger.filters):
 if not any(isinstance(f, SortirSecurityFilter) for f in logger.filters):
     logger.addFilter(SortirSecurityFilter())
 
+event_log = get_event_logger()
+
 
 class SortirOrganizerSettingsView(OrganizerPermissionRequiredMixin, UpdateView):
     """Vue de configuration au niveau organisateur."""
@@ -37,9 +42,9 @@ class SortirOrganizerSettingsView(OrganizerPermissionRequiredMixin, UpdateView):
     permission = 'can_change_organizer_settings'
 
     def get_object(self, queryset=None):
+        # api_enabled=True par défaut : l'API est active dès que le plugin est installé
         obj, created = SortirOrganizerSettings.objects.get_or_create(
-            organizer=self.request.organizer,
-            defaults={'api_enabled': False}
+            organizer=self.request.organizer
         )
         return obj
 
@@ -75,81 +80,94 @@ class SortirEventSettingsView(EventSettingsViewMixin, TemplateView):
                              'event': self.request.event.slug})
 
     def post(self, request, *args, **kwargs):
-        """Gère directement les checkboxes des tarifs sans formulaire Django."""
+        """
+        Gère directement les checkboxes des tarifs sans formulaire Django.
+
+        Calcule la différence avec les configs existantes et l'applique en une transaction :
+        un bulk_create pour les tarifs cochés, un DELETE filtré pour les tarifs décochés.
+        """
+        from django.db import transaction
+        from pretix.base.models import ItemVariation
+
         self.object = self.get_object()
+        event = self.request.event
+
+        # Gère les checkboxes des tarifs ("<item>" ou "<item>_<variation>")
+        requested = set()
+        for item_id_str in request.POST.getlist('requires_sortir'):
+            item_id, _sep, variation_id = item_id_str.partition('_')
+            if not item_id.isdigit() or (variation_id and not variation_id.isdigit()):
+                continue
+            requested.add((int(item_id), int(variation_id) if variation_id else None))
+
+        # Ne garde que les produits/variations de cet événement
+        item_ids = set(event.items.filter(
+            pk__in={item_id for item_id, _var in requested}
+        ).values_list('pk', flat=True))
+        variation_pairs = set(ItemVariation.objects.filter(
+            item__event=event,
+            pk__in={var_id for _item, var_id in requested if var_id}
+        ).values_list('item_id', 'pk'))
+        desired = {
+            (item_id, var_id) for item_id, var_id in requested
+            if (var_id is None and item_id in item_ids) or (item_id, var_id) in variation_pairs
+        }
+
+        with transaction.atomic():
+            existing = {
+                (item_id, var_id): pk
+                for pk, item_id, var_id in SortirItemConfig.objects.filter(
+                    event=event, requires_sortir=True
+                ).values_list('pk', 'item_id', 'variation_id')
+            }
+
+            # Supprime les configs décochées (et les éventuelles configs requires_sortir=False)
+            keep_pks = [pk for key, pk in existing.items() if key in desired]
+            SortirItemConfig.objects.filter(event=event).exclude(pk__in=keep_pks).delete()
+
+            # Crée les configs pour les tarifs nouvellement cochés
+            SortirItemConfig.objects.bulk_create([
+                SortirItemConfig(event=event, item_id=item_id, variation_id=var_id, requires_sortir=True)
+                for item_id, var_id in desired - existing.keys()
+            ])
 
-        # Gère les checkboxes des tarifs
-        requires_sortir_ids = request.POST.getlist('requires_sortir')
-
-        # Supprime toutes les configs existantes
-        SortirItemConfig.objects.filter(event=self.request.event).delete()
-        
-        # Crée les nouvelles configs pour les tarifs cochés
-        for item_id_str in requires_sortir_ids:
-            if '_' in item_id_str:
-                item_id, variation_id = item_id_str.split('_')
-                item_id = int(item_id)
-                variation_id = int(variation_id)
-            else:
-                item_id = int(item_id_str)
-                variation_id = None
-
-            from pretix.base.models import Item, ItemVariation
-            item = Item.objects.get(pk=item_id, event=self.request.event)
-            variation = ItemVariation.objects.get(pk=variation_id, item=item) if variation_id else None
-
-            SortirItemConfig.objects.create(
-                event=self.request.event,
-                item=item,
-                variation=variation,
-                requires_sortir=True
-            )
-        
         messages.success(request, _('Paramètres Sortir! mis à jour.'))
         return redirect(self.get_success_url())
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        
+
         # Vérifie si l'organisateur a configuré l'API
-        try:
-            org_settings = SortirOrganizerSettings.objects.get(
-                organizer=self.request.event.organizer
-            )
-            context['organizer_configured'] = org_settings.api_enabled
-        except SortirOrganizerSettings.DoesNotExist:
-            context['organizer_configured'] = False
-
-        # Récupère tous les items de l'événement
+        context['organizer_configured'] = bool(SortirOrganizerSettings.objects.filter(
+            organizer=self.request.event.organizer
+        ).values_list('api_enabled', flat=True).first())
+
+        # Toutes les configs de l'événement en une requête
+        configs = {
+            (item_id, var_id): requires_sortir
+            for item_id, var_id, requires_sortir in SortirItemConfig.objects.filter(
+                event=self.request.event
+            ).values_list('item_id', 'variation_id', 'requires_sortir')
+        }
+
+        # Récupère tous les items de l'événement (variations préchargées)
         items_data = []
-        for item in self.request.event.items.all():
+        for item in self.request.event.items.prefetch_related('variations'):
             if not item.has_variations:
-                config = SortirItemConfig.objects.filter(
-                    event=self.request.event,
-                    item=item,
-                    variation__isnull=True
-                ).first()
-
                 items_data.append({
                     'item': item,
                     'variation': None,
-                    'requires_sortir': config.requires_sortir if config else False,
+                    'requires_sortir': configs.get((item.id, None), False),
                     'name': item.name,
                     'price': item.default_price,
                     'id_str': str(item.id)
                 })
 
             for variation in item.variations.all():
-                var_config = SortirItemConfig.objects.filter(
-                    event=self.request.event,
-                    item=item,
-                    variation=variation
-                ).first()
-
                 items_data.append({
                     'item': item,
                     'variation': variation,
-                    'requires_sortir': var_config.requires_sortir if var_config else False,
+                    'requires_sortir': configs.get((item.id, variation.id), False),
                     'name': f"{item.name} - {variation.value}",
                     'price': variation.default_price or item.default_price,
                     'id_str': f"{item.id}_{variation.id}"
@@ -160,17 +178,144 @@ class SortirEventSettingsView(EventSettingsViewMixin, TemplateView):
 
 
 class SortirUsageListView(EventSettingsViewMixin, ListView):
-    """Vue pour l'historique des utilisations."""
+    """
+    Vue pour l'historique des utilisations.
+
+    Pagination par curseur (keyset) sur (created_at, id) plutôt que par OFFSET :
+    chaque page est une lecture d'index de taille fixe, quelle que soit sa profondeur.
+    Lecture seule : servie par la réplique si SORTIR_REPLICA_DATABASE est configuré.
+    """
     model = SortirUsage
     template_name = 'pretix_sortir/usage_list.html'
     context_object_name = 'usages'
-    paginate_by = 50
+    page_size = 50
     permission = 'can_view_orders'
 
+    # Durée de cache des statistiques (secondes)
+    stats_cache_timeout = 60
+
+    @staticmethod
+    def _encode_cursor(usage):
+        return f"{usage.created_at.isoformat()}_{usage.pk}"
+
+    @staticmethod
+    def _decode_cursor(value):
+        """Décode un curseur 'created_at_id', retourne None si invalide."""
+        from django.utils.dateparse import parse_datetime
+
+        if not value or '_' not in value:
+            return None
+        created_at, _sep, pk = value.rpartition('_')
+        created_at = parse_datetime(created_at)
+        if created_at is None or not pk.isdigit():
+            return None
+        return created_at, int(pk)
+
+    def get_filtered_queryset(self):
+        """Applique les filtres statut / recherche (suffixe, code commande, ID APRAS)."""
+        from django.db.models import Q
+
+        queryset = SortirUsage.objects.using(read_database(SortirUsage)).filter(event=self.request.event)
+
+        status = self.request.GET.get('status', '')
+        if status in dict(SortirUsage.STATUS_CHOICES):
+            queryset = queryset.filter(status=status)
+
+        search = self.request.GET.get('search', '').strip()
+        if search:
+            # Recherches exactes uniquement : chaque branche est servie par un index. La commande
+            # est résolue dans une sous-requête (pas de OR à travers une jointure sur Order)
+            from pretix.base.models import Order
+
+            orders = Order.objects.filter(event=self.request.event, code=search.upper()).values('pk')
+            condition = Q(order_id__in=orders) | Q(apras_request_id=search)
+            if search.isdigit() and len(search) <= 4:
+                condition |= Q(sortir_number_suffix=search)
+            queryset = queryset.filter(condition)
+
+        return queryset
+
     def get_queryset(self):
-        return SortirUsage.objects.filter(
-            event=self.request.event
-        ).select_related('order', 'item', 'variation').order_by('-created_at')
+        from django.db.models import Q
+
+        queryset = self.get_filtered_queryset().select_related('order', 'item', 'variation')
+
+        self.after = self._decode_cursor(self.request.GET.get('after'))
+        self.before = None if self.after else self._decode_cursor(self.request.GET.get('before'))
+
+        if self.after:
+            created_at, pk = self.after
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+            ).order_by('-created_at', '-pk')
+        elif self.before:
+            created_at, pk = self.before
+            queryset = queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk)
+            ).order_by('created_at', 'pk')
+        else:
+            queryset = queryset.order_by('-created_at', '-pk')
+
+        # Une ligne de plus pour savoir s'il reste une page dans ce sens
+        rows = list(queryset[:self.page_size + 1])
+        self.has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.before:
+            rows.reverse()
+        return rows
+
+    def _page_url(self, key, usage):
+        params = self.request.GET.copy()
+        params.pop('after', None)
+        params.pop('before', None)
+        params[key] = self._encode_cursor(usage)
+        return f"?{params.urlencode()}"
+
+    def get_pagination(self, usages):
+        """Liens vers les pages précédente/suivante (None si pas de page dans ce sens)."""
+        if not usages:
+            return {'previous_url': None, 'next_url': None}
+
+        has_previous = self.has_more if self.before else bool(self.after)
+        has_next = bool(self.before) or self.has_more
+        return {
+            'previous_url': self._page_url('before', usages[0]) if has_previous else None,
+            'next_url': self._page_url('after', usages[-1]) if has_next else None,
+        }
+
+    def get_stats(self):
+        """
+        Compte les utilisations par statut en une seule requête (agrégation conditionnelle).
+
+        Le taux de succès des grants APRAS rapporte les usages notifiés ('used') à ceux
+        qui devraient l'être (commande payée, 'validated' = grant en attente ou en échec).
+        """
+        from django.db.models import Count, Q
+        from pretix.base.models import Order
+
+        stats = SortirUsage.objects.using(read_database(SortirUsage)).filter(event=self.request.event).aggregate(
+            total=Count('id'),
+            pending=Count('id', filter=Q(status='pending')),
+            validated=Count('id', filter=Q(status='validated')),
+            used=Count('id', filter=Q(status='used')),
+            cancelled=Count('id', filter=Q(status='cancelled')),
+            grant_pending=Count('id', filter=Q(status='validated', order__status=Order.STATUS_PAID)),
+        )
+
+        grant_expected = stats['used'] + stats['grant_pending']
+        stats['grant_success_rate'] = round(100 * stats['used'] / grant_expected, 1) if grant_expected else None
+        return stats
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['stats'] = self.request.event.cache.get_or_set(
+            namespaced_key('sortir_usage_stats'), self.get_stats, self.stats_cache_timeout
+        )
+        context['pagination'] = self.get_pagination(context['usages'])
+        context['status_choices'] = SortirUsage.STATUS_CHOICES
+        context['filter_status'] = self.request.GET.get('status', '')
+        context['filter_search'] = self.request.GET.get('search', '')
+        return context
 
 
 from django.views import View
@@ -192,8 +337,39 @@ class SortirCardValidationView(View):
             ip = request.META.get('HTTP_X_REAL_IP') or request.META.get('REMOTE_ADDR')
         return ip
 
+    def _get_cart_id(self, request):
+        """
+        Récupère (ou crée) l'identifiant du panier Pretix de cette session.
+
+        C'est ce même cart_id qui portera les CartPosition ajoutées ensuite au panier.
+        Dans le widget, l'URL contient l'espace de noms du panier (w/<cart_namespace>/,
+        et éventuellement ?take_cart_id=) : Pretix résout alors le panier du widget et non
+        le panier par défaut de la session.
+
+        Returns:
+            Le cart_id, ou None s'il n'a pas pu être déterminé
+        """
+        try:
+            from pretix.presale.views.cart import get_or_create_cart_id
+            return get_or_create_cart_id(request)
+        except Exception as e:
+            event_log.error('cart_id_unavailable', error=e)
+            return None
+
     def dispatch(self, request, *args, **kwargs):
-        """Setup l'event et l'organizer dans le contexte"""
+        """Setup l'event et l'organizer dans le contexte, mesure les temps (voir timing.py)"""
+        from .timing import RequestTimer
+
+        self.timer = RequestTimer.from_settings()
+        with self.timer:
+            response = self._dispatch(request, *args, **kwargs)
+        if self.timer.server_timing_enabled:
+            response['Server-Timing'] = self.timer.server_timing()
+        if self.timer.audit_enabled:
+            event_log.info('timings', scope='card_validation', **self.timer.log_fields())
+        return response
+
+    def _dispatch(self, request, *args, **kwargs):
         from pretix.base.models import Event, Organizer
         from django_scopes import scopes_disabled
 
@@ -203,7 +379,7 @@ class SortirCardValidationView(View):
 
         try:
             # Désactive temporairement les scopes pour les requêtes
-            with scopes_disabled():
+            with self.timer.span('lookup'), scopes_disabled():
                 organizer = Organizer.objects.get(slug=organizer_slug)
                 event = Event.objects.get(slug=event_slug, organizer=organizer)
 
@@ -232,22 +408,25 @@ class SortirCardValidationView(View):
         # Limite : 10 tentatives par IP toutes les 5 minutes
         ip_address = self._get_client_ip(request)
         rate_limit_key = f'sortir_rate_limit_{ip_address}'
-        attempts = cache.get(rate_limit_key, 0)
+        with self.timer.span('cache'):
+            attempts = cache.get(rate_limit_key, 0)
 
         if attempts >= 10:
-            logger.warning(f"[Sortir] Rate limit dépassé pour IP {ip_address}")
+            event_log.warning('rate_limited', ip=ip_address)
 
             # Audit trail (PHASE 2 - Point 9)
             from .models import SortirAuditLog
-            SortirAuditLog.log(
-                action='rate_limit_triggered',
-                severity='warning',
-                event=request.event,
-                organizer=request.organizer,
-                ip_address=ip_address,
-                user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                message=f'Rate limit dépassé : {attempts} tentatives en 5 minutes'
-            )
+            with self.timer.span('audit'):
+                SortirAuditLog.log(
+                    action='rate_limit_triggered',
+                    severity='warning',
+                    event=request.event,
+                    organizer=request.organizer,
+                    ip_address=ip_address,
+                    user_agent=request.META.get('HTTP_USER_AGENT', ''),
+                    message=f'Rate limit dépassé : {attempts} tentatives en 5 minutes',
+                    **self.timer.audit_details()
+                )
 
             return JsonResponse({
                 'valid': False,
@@ -255,7 +434,8 @@ class SortirCardValidationView(View):
             }, status=429)
 
         # Incrémente le compteur (expire après 5 minutes)
-        cache.set(rate_limit_key, attempts + 1, 300)
+        with self.timer.span('cache'):
+            cache.set(rate_limit_key, attempts + 1, 300)
 
         try:
             # Récupère le numéro de carte et le session_id
@@ -269,6 +449,15 @@ class SortirCardValidationView(View):
                     'error': 'Numéro de carte requis'
                 })
 
+            # Panier auquel la réservation sera rattachée : sans lui, elle ne pourrait
+            # jamais être réclamée au checkout (voir claim_for_cart_position)
+            cart_id = self._get_cart_id(request)
+            if not cart_id:
+                return JsonResponse({
+                    'valid': False,
+                    'error': 'Panier introuvable, veuillez recharger la page'
+                }, status=503)
+
             # Nettoie le numéro (seulement chiffres)
             clean_card_number = ''.join(filter(str.isdigit, card_number))
 
@@ -283,7 +472,7 @@ class SortirCardValidationView(View):
             organizer = request.organizer
 
             # Désactive les scopes pour toutes les requêtes de la base de données
-            with scopes_disabled():
+            with self.timer.span('settings'), scopes_disabled():
                 # Vérifie si Sortir est activé pour cet événement
                 try:
                     event_settings = SortirEventSettings.objects.get(
@@ -308,122 +497,124 @@ class SortirCardValidationView(View):
                         'error': 'API Sortir non configurée'
                     })
 
+                # Déchiffrement du token (au premier accès)
+                api_token = org_settings.api_token
+
             # Crée le client API et vérifie l'éligibilité
-            api_client = APRASClient(
-                base_url=org_settings.api_url,
-                token=org_settings.api_token,
-                timeout=org_settings.api_timeout
-            )
+            with self.timer.span('apras'):
+                api_client = APRASClient(
+                    base_url=org_settings.api_url,
+                    token=api_token,
+                    timeout=org_settings.api_timeout
+                )
 
-            is_eligible, result = api_client.verify_rights(clean_card_number)
+                is_eligible, result = api_client.verify_rights(clean_card_number)
 
             if is_eligible:
                 # VÉRIFICATION ANTI-FRAUDE (PHASE 1 - Point 3)
                 # Vérifie que la carte n'est pas déjà utilisée pour cet événement
                 from .models import SortirUsage
-                from pretix.base.models import Order
-                card_hash = SortirUsage.hash_number(clean_card_number, org_settings.salt)
-
-                # NETTOYAGE PRÉALABLE : Supprime les SortirUsage 'pending' trop vieux (>10 min = panier abandonné)
-                from datetime import timedelta
-                expiry_threshold = timezone.now() - timedelta(minutes=10)
-
-                old_pending_usages = SortirUsage.objects.filter(
-                    event=event,
-                    sortir_number_hash=card_hash,
-                    status='pending',
-                    order__isnull=True,  # Pas encore de commande
-                    created_at__lt=expiry_threshold
-                )
+                with self.timer.span('usage'):
+                    card_hash = SortirUsage.hash_number(clean_card_number, org_settings.salt)
+
+                    # NETTOYAGE PRÉALABLE : Supprime les SortirUsage 'pending' trop vieux (>10 min = panier abandonné)
+                    from datetime import timedelta
+                    expiry_threshold = timezone.now() - timedelta(minutes=10)
+
+                    old_pending_usages = SortirUsage.objects.filter(
+                        event=event,
+                        sortir_number_hash=card_hash,
+                        status='pending',
+                        order__isnull=True,  # Pas encore de commande
+                        created_at__lt=expiry_threshold
+                    )
+
+                    deleted_count = old_pending_usages.count()
+                    if deleted_count > 0:
+                        old_pending_usages.delete()
+                        event_log.info('expired_pending_deleted', card=clean_card_number, count=deleted_count)
+
+                    # Récupère un usage actif existant (après nettoyage)
+                    # Les usages des commandes annulées/expirées sont passés en 'cancelled' par
+                    # release_order_usages : le filtre de statut suffit, sans jointure sur la commande.
+                    # IMPORTANT : On ignore les 'pending' de la MÊME SESSION (< 5 min)
+                    # car c'est la même personne qui corrige son numéro (RGPD-compliant : pas d'IP stockée)
+                    from datetime import timedelta
+                    recent_threshold = timezone.now() - timedelta(minutes=5)
+
+                    existing_usages = SortirUsage.objects.filter(
+                        event=event,
+                        sortir_number_hash=card_hash,
+                        status__in=['validated', 'used', 'pending']
+                    )
+                    if session_id:
+                        existing_usages = existing_usages.exclude(
+                            order__isnull=True,
+                            session_id=session_id,
+                            created_at__gte=recent_threshold
+                        )
 
-                deleted_count = old_pending_usages.count()
-                if deleted_count > 0:
-                    old_pending_usages.delete()
-                    logger.info(f"[Sortir] Nettoyage : {deleted_count} SortirUsage pending expirés supprimés pour carte ***{clean_card_number[-4:]}")
-
-                # Récupère les usages existants (après nettoyage)
-                existing_usages = SortirUsage.objects.filter(
-                    event=event,
-                    sortir_number_hash=card_hash,
-                    status__in=['validated', 'used', 'pending']
-                ).select_related('order')
-
-                # Filtre pour ne garder que les usages avec commandes valides
-                # IMPORTANT : On ignore les 'pending' de la MÊME SESSION (< 5 min)
-                # car c'est la même personne qui corrige son numéro (RGPD-compliant : pas d'IP stockée)
-                from datetime import timedelta
-                recent_threshold = timezone.now() - timedelta(minutes=5)
-
-                valid_existing_usage = None
-                for usage in existing_usages:
-                    # Si pas de commande associée, c'est un usage 'pending' récent (< 10 min)
-                    if not usage.order:
-                        # NOUVEAU : Ignore les pending de la MÊME SESSION récents (< 5 min)
-                        # Si session_id match ET récent : c'est la même personne qui corrige
-                        if session_id and usage.session_id == session_id and usage.created_at >= recent_threshold:
-                            age_seconds = (timezone.now() - usage.created_at).total_seconds()
-                            logger.info(f"[Sortir] Carte ***{clean_card_number[-4:]} : pending ignoré (même session, créé il y a {age_seconds:.0f}s)")
-                            continue
-                        # Sinon : pending d'une autre session ou trop vieux → on bloque
-                        else:
-                            valid_existing_usage = usage
-                            break
-                    # Si commande associée, vérifie son statut
-                    elif usage.order.status not in [Order.STATUS_CANCELED, Order.STATUS_EXPIRED]:
-                        # Commande valide (pending ou paid)
-                        valid_existing_usage = usage
-                        break
+                    valid_existing_usage = existing_usages.only('id').first()
 
                 if valid_existing_usage:
-                    logger.warning(f"[Sortir] ANTI-FRAUDE : Carte ***{clean_card_number[-4:]} déjà utilisée pour l'événement {event.slug}")
+                    event_log.warning('card_already_used', card=clean_card_number, event=event.slug)
 
                     # Audit trail tentative fraude
                     from .models import SortirAuditLog
-                    SortirAuditLog.log(
-                        action='card_validation_failed',
-                        severity='critical',
-                        event=event,
-                        organizer=organizer,
-                        card_number=clean_card_number,
-                        salt=org_settings.salt,
-                        ip_address=ip_address,
-                        user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                        message=f'Tentative de réutilisation de carte déjà utilisée (Usage ID: {valid_existing_usage.id})'
-                    )
+                    with self.timer.span('audit'):
+                        SortirAuditLog.log(
+                            action='card_validation_failed',
+                            severity='critical',
+                            event=event,
+                            organizer=organizer,
+                            card_number=clean_card_number,
+                            salt=org_settings.salt,
+                            ip_address=ip_address,
+                            user_agent=request.META.get('HTTP_USER_AGENT', ''),
+                            message=(
+                                f'Tentative de réutilisation de carte déjà utilisée '
+                                f'(Usage ID: {valid_existing_usage.id})'
+                            ),
+                            **self.timer.audit_details()
+                        )
 
                     return JsonResponse({
                         'valid': False,
                         'error': 'Cette carte a déjà été utilisée pour cet événement'
                     })
 
-                # AVANT de créer un nouveau pending, supprime les anciens pending de cette session pour cette carte
-                # Cela évite les violations de contrainte unique
-                if session_id:
-                    old_pending_same_session = SortirUsage.objects.filter(
+                with self.timer.span('usage'):
+                    # AVANT de créer un nouveau pending, supprime les anciens pending de cette session pour cette carte
+                    # Cela évite les violations de contrainte unique
+                    if session_id:
+                        old_pending_same_session = SortirUsage.objects.filter(
+                            event=event,
+                            sortir_number_hash=card_hash,
+                            status='pending',
+                            order__isnull=True,
+                            session_id=session_id
+                        )
+                        deleted = old_pending_same_session.count()
+                        if deleted > 0:
+                            old_pending_same_session.delete()
+                            event_log.info('session_pending_replaced', card=clean_card_number, count=deleted)
+
+                    # Crée un SortirUsage en statut 'pending' (sera validé à order_placed)
+                    # Le service_key est retourné par l'API et sera utilisé pour le grant
+                    # La réservation est rattachée au panier Pretix de la session : elle ne pourra
+                    # être réclamée que par une position de ce panier (voir check_sortir_required)
+                    usage = SortirUsage.objects.create(
                         event=event,
                         sortir_number_hash=card_hash,
+                        sortir_number_suffix=clean_card_number[-4:],
                         status='pending',
-                        order__isnull=True,
-                        session_id=session_id
+                        validated_at=timezone.now(),
+                        session_id=session_id,  # Stocke le session_id pour ignorer les corrections (RGPD-compliant)
+                        cart_id=cart_id,
+                        service_key=result.key  # Stocke la clé de service pour le POST grant ultérieur
                     )
-                    deleted = old_pending_same_session.count()
-                    if deleted > 0:
-                        old_pending_same_session.delete()
-                        logger.info(f"[Sortir] Supprimé {deleted} ancien(s) pending de cette session pour carte ***{clean_card_number[-4:]}")
-
-                # Crée un SortirUsage en statut 'pending' (sera validé à order_placed)
-                # Le service_key est retourné par l'API et sera utilisé pour le grant
-                usage = SortirUsage.objects.create(
-                    event=event,
-                    sortir_number_hash=card_hash,
-                    sortir_number_suffix=clean_card_number[-4:],
-                    status='pending',
-                    validated_at=timezone.now(),
-                    session_id=session_id,  # Stocke le session_id pour ignorer les corrections (RGPD-compliant)
-                    service_key=result.key  # Stocke la clé de service pour le POST grant ultérieur
-                )
 
-                logger.info(f"[Sortir] SortirUsage créé (ID: {usage.id}) pour carte ***{clean_card_number[-4:]}")
+                event_log.info('usage_created', card=clean_card_number, usage=usage.id)
 
                 # Sauvegarde sécurisée en session pour le checkout
                 session_key = f'sortir_card_validated_{clean_card_number}'
@@ -436,21 +627,23 @@ class SortirCardValidationView(View):
                 }
                 request.session.save()
 
-                logger.info(f"[Sortir] Carte {clean_card_number} validée et sauvée en session")
+                event_log.info('card_validated', card=clean_card_number, event=event.slug)
 
                 # Audit trail succès (PHASE 2 - Point 9)
                 from .models import SortirAuditLog
-                SortirAuditLog.log(
-                    action='card_validation_success',
-                    severity='info',
-                    event=event,
-                    organizer=organizer,
-                    card_number=clean_card_number,
-                    salt=org_settings.salt,
-                    ip_address=ip_address,
-                    user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                    message=f'Validation carte réussie via AJAX (Usage ID: {usage.id})'
-                )
+                with self.timer.span('audit'):
+                    SortirAuditLog.log(
+                        action='card_validation_success',
+                        severity='info',
+                        event=event,
+                        organizer=organizer,
+                        card_number=clean_card_number,
+                        salt=org_settings.salt,
+                        ip_address=ip_address,
+                        user_agent=request.META.get('HTTP_USER_AGENT', ''),
+                        message=f'Validation carte réussie via AJAX (Usage ID: {usage.id})',
+                        **self.timer.audit_details()
+                    )
 
                 return JsonResponse({
                     'valid': True,
@@ -462,17 +655,19 @@ class SortirCardValidationView(View):
 
                 # Audit trail échec (PHASE 2 - Point 9)
                 from .models import SortirAuditLog
-                SortirAuditLog.log(
-                    action='card_validation_failed',
-                    severity='warning',
-                    event=event,
-                    organizer=organizer,
-                    card_number=clean_card_number,
-                    salt=org_settings.salt,
-                    ip_address=ip_address,
-                    user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                    message=f'Validation échouée: {error_message}'
-                )
+                with self.timer.span('audit'):
+                    SortirAuditLog.log(
+                        action='card_validation_failed',
+                        severity='warning',
+                        event=event,
+                        organizer=organizer,
+                        card_number=clean_card_number,
+                        salt=org_settings.salt,
+                        ip_address=ip_address,
+                        user_agent=request.META.get('HTTP_USER_AGENT', ''),
+                        message=f'Validation échouée: {error_message}',
+                        **self.timer.audit_details()
+                    )
 
                 return JsonResponse({
                     'valid': False,
@@ -486,7 +681,7 @@ class SortirCardValidationView(View):
             })
 
         except Exception as e:
-            logger.error(f"Erreur lors de la validation AJAX: {e}")
+            event_log.error('validation_error', error=e)
             return JsonResponse({
                 'valid': False,
                 'error': 'Erreur de validation'
@@ -542,9 +737,9 @@ class SortirCleanupSessionView(View):
             deleted_count = SortirUsage.objects.filter(**filter_kwargs).delete()[0]  # delete() renvoie (count, dict)
 
             if card_number:
-                logger.info(f"[Sortir] Nettoyage session {session_id}: carte {card_number} supprimée pour IP {ip_address}")
+                event_log.info('session_card_cleared', session=session_id, card=card_number, ip=ip_address)
             else:
-                logger.info(f"[Sortir] Nettoyage session {session_id}: {deleted_count} SortirUsage pending supprimés pour IP {ip_address}")
+                event_log.info('session_pending_deleted', session=session_id, count=deleted_count, ip=ip_address)
 
             # Nettoie aussi les vieux pending (>10 minutes) toutes IPs confondues
             old_threshold = timezone.now() - timedelta(minutes=10)
@@ -556,7 +751,7 @@ class SortirCleanupSessionView(View):
             ).delete()[0]
 
             if old_deleted > 0:
-                logger.info(f"[Sortir] Nettoyage global: {old_deleted} vieux SortirUsage pending supprimés")
+                event_log.info('stale_pending_deleted', count=old_deleted)
 
             return JsonResponse({
                 'success': True,
@@ -565,8 +760,57 @@ class SortirCleanupSessionView(View):
             })
 
         except Exception as e:
-            logger.error(f"Erreur nettoyage session: {e}")
+            event_log.error('session_cleanup_error', error=e)
             return JsonResponse({
                 'success': False,
                 'error': str(e)
             })
+
+
+class SortirStatsMixin:
+    """Paramètres communs des endpoints de statistiques (?from=AAAA-MM-JJ&to=AAAA-MM-JJ)."""
+
+    # Période maximale d'une requête (jours)
+    max_days = 366
+
+    def get_period(self):
+        from datetime import timedelta
+        from django.utils.dateparse import parse_date
+
+        try:
+            date_from = parse_date(self.request.GET.get('from', ''))
+            date_to = parse_date(self.request.GET.get('to', ''))
+        except ValueError:
+            date_from = date_to = None
+
+        date_to = date_to or timezone.localdate()
+        if date_from is None or date_from > date_to or (date_to - date_from).days >= self.max_days:
+            from .rollups import DEFAULT_DAYS
+            date_from = date_to - timedelta(days=DEFAULT_DAYS - 1)
+        return date_from, date_to
+
+
+class SortirEventStatsView(SortirStatsMixin, EventPermissionRequiredMixin, View):
+    """Statistiques journalières d'un événement en JSON (lues dans SortirDailyStats)."""
+    permission = 'can_view_orders'
+
+    def get(self, request, *args, **kwargs):
+        from .rollups import get_stats
+
+        date_from, date_to = self.get_period()
+        stats = get_stats(event=request.event, date_from=date_from, date_to=date_to)
+        stats['event'] = request.event.slug
+        return JsonResponse(stats)
+
+
+class SortirOrganizerStatsView(SortirStatsMixin, OrganizerPermissionRequiredMixin, View):
+    """Statistiques journalières cumulées de l'organisateur en JSON."""
+    permission = 'can_change_organizer_settings'
+
+    def get(self, request, *args, **kwargs):
+        from .rollups import get_stats
+
+        date_from, date_to = self.get_period()
+        stats = get_stats(organizer=request.organizer, date_from=date_from, date_to=date_to)
+        stats['organizer'] = request.organizer.slug
+        return JsonResponse(stats)
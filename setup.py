@@ -64,8 +64,9 @@ setup(
     package_data={
         'pretix_sortir': [
             'templates/pretix_sortir/*.html',
-            'static/pretix_sortir/css/*.css',
-            'static/pretix_sortir/js/*.js',
+            'static/pretix_sortir/*.css',
+            'static/pretix_sortir/*.js',
+            'static/pretix_sortir/manifest.json',
             'locale/*/LC_MESSAGES/*.po',
             'locale/*/LC_MESSAGES/*.mo',
         ],
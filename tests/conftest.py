@@ -0,0 +1,73 @@
+import pytest
+from django.utils import timezone
+from django_scopes import scopes_disabled
+
+
+@pytest.fixture
+def organizer(db):
+    from pretix.base.models import Organizer
+
+    with scopes_disabled():
+        return Organizer.objects.create(name='Orga', slug='orga')
+
+
+@pytest.fixture
+def event(organizer):
+    from pretix.base.models import Event
+
+    with scopes_disabled():
+        return Event.objects.create(
+            organizer=organizer, name='Concert', slug='concert', date_from=timezone.now()
+        )
+
+
+@pytest.fixture
+def org_settings(organizer):
+    from pretix_sortir.models import SortirOrganizerSettings
+
+    return SortirOrganizerSettings.objects.create(organizer=organizer)
+
+
+@pytest.fixture
+def make_usage(event):
+    """Crée un SortirUsage (carte 10 chiffres, hash dérivé du numéro)"""
+    from pretix_sortir.models import SortirUsage
+
+    def factory(card='0123456789', **kwargs):
+        kwargs.setdefault('event', event)
+        kwargs.setdefault('sortir_number_hash', SortirUsage.hash_number(card, 'salt'))
+        kwargs.setdefault('sortir_number_suffix', card[-4:])
+        with scopes_disabled():
+            return SortirUsage.objects.create(**kwargs)
+
+    return factory
+
+
+@pytest.fixture
+def make_order(event):
+    """Crée une commande de l'événement (statut Pretix : 'n', 'p', 'e', 'c')"""
+    from datetime import timedelta
+
+    from pretix.base.models import Order
+
+    def factory(code='ABC12', status=Order.STATUS_PENDING):
+        with scopes_disabled():
+            return Order.objects.create(
+                event=event, code=code, status=status, email='acheteur@example.org', locale='fr',
+                datetime=timezone.now(), expires=timezone.now() + timedelta(days=10), total=0,
+            )
+
+    return factory
+
+
+@pytest.fixture
+def sortir_item(event):
+    """Produit au tarif Sortir! (validation de carte requise)"""
+    from pretix.base.models import Item
+
+    from pretix_sortir.models import SortirItemConfig
+
+    with scopes_disabled():
+        item = Item.objects.create(event=event, name='Tarif Sortir!', default_price=4.5)
+        SortirItemConfig.objects.create(event=event, item=item, requires_sortir=True)
+    return item
@@ -0,0 +1,48 @@
+"""
+Rattachement des réservations Sortir! au panier Pretix (SortirCardValidationView._get_cart_id)
+"""
+
+import pytest
+from django.contrib.sessions.backends.db import SessionStore
+from django.test import RequestFactory
+from django.urls import ResolverMatch
+
+from pretix_sortir.views import SortirCardValidationView
+
+
+def make_request(event, path, url_kwargs, carts):
+    request = RequestFactory().post(path)
+    request.event = event
+    request.organizer = event.organizer
+    request.session = SessionStore()
+    request.session['carts'] = {cart_id: {} for cart_id in carts.values()}
+    for session_key, cart_id in carts.items():
+        request.session[session_key] = cart_id
+    request.resolver_match = ResolverMatch(SortirCardValidationView.as_view(), (), url_kwargs)
+    return request
+
+
+@pytest.mark.django_db
+def test_cart_id_default_cart(event):
+    request = make_request(
+        event, '/orga/concert/sortir/validate/',
+        {'organizer': 'orga', 'event': 'concert'},
+        {f'current_cart_event_{event.pk}': 'defaultcart'},
+    )
+
+    assert SortirCardValidationView()._get_cart_id(request) == 'defaultcart'
+
+
+@pytest.mark.django_db
+def test_cart_id_widget_cart_namespace(event):
+    # Le widget a son propre panier, distinct du panier par défaut de la session
+    request = make_request(
+        event, '/orga/concert/w/abcdef0123456789/sortir/validate/',
+        {'organizer': 'orga', 'event': 'concert', 'cart_namespace': 'abcdef0123456789'},
+        {
+            f'current_cart_event_{event.pk}': 'defaultcart',
+            f'current_cart_event_{event.pk}_abcdef0123456789': 'widgetcart',
+        },
+    )
+
+    assert SortirCardValidationView()._get_cart_id(request) == 'widgetcart'
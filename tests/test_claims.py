@@ -0,0 +1,183 @@
+"""
+Réclamation des réservations Sortir! par les positions du panier et par la commande
+(SortirUsage.claim_for_cart_position, check_sortir_required, final_sortir_verification)
+"""
+
+import json
+from datetime import timedelta
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from django_scopes import scopes_disabled
+
+from pretix_sortir.models import SortirUsage
+from pretix_sortir.signals import check_sortir_required, final_sortir_verification
+
+
+@pytest.fixture
+def make_cart_position(event, sortir_item):
+    from pretix.base.models import CartPosition
+
+    def factory(cart_id='cart-a'):
+        with scopes_disabled():
+            return CartPosition.objects.create(
+                event=event, item=sortir_item, cart_id=cart_id, price=4.5,
+                expires=timezone.now() + timedelta(minutes=30),
+            )
+
+    return factory
+
+
+@pytest.fixture
+def make_order_position(sortir_item):
+    from pretix.base.models import OrderPosition
+
+    def factory(order, usage_id=None, positionid=1):
+        meta_info = json.dumps({'sortir_usage_id': usage_id} if usage_id else {})
+        with scopes_disabled():
+            return OrderPosition.objects.create(
+                order=order, item=sortir_item, price=4.5, positionid=positionid, meta_info=meta_info,
+            )
+
+    return factory
+
+
+def reload(usage):
+    with scopes_disabled():
+        usage.refresh_from_db()
+    return usage
+
+
+@pytest.mark.django_db
+def test_claim_takes_oldest_pending_of_the_cart(event, make_usage):
+    first = make_usage(card='1111111111', cart_id='cart-a')
+    make_usage(card='2222222222', cart_id='cart-a')
+
+    usage = SortirUsage.claim_for_cart_position(event, 'cart-a', position_id=10, live_position_ids=[10])
+
+    assert usage.pk == first.pk
+    assert reload(first).cart_position_id == 10
+
+
+@pytest.mark.django_db
+def test_claim_refuses_other_cart(event, make_usage):
+    make_usage(cart_id='cart-a')
+
+    assert SortirUsage.claim_for_cart_position(event, 'cart-b', position_id=20, live_position_ids=[20]) is None
+
+
+@pytest.mark.django_db
+def test_claim_without_cart_id(event, make_usage):
+    make_usage(cart_id='')
+
+    assert SortirUsage.claim_for_cart_position(event, '', position_id=20) is None
+
+
+@pytest.mark.django_db
+def test_claim_skips_usage_held_by_live_position(event, make_usage):
+    make_usage(cart_id='cart-a', cart_position_id=10)
+
+    assert SortirUsage.claim_for_cart_position(event, 'cart-a', position_id=11, live_position_ids=[10, 11]) is None
+
+
+@pytest.mark.django_db
+def test_claim_frees_usage_of_removed_position(event, make_usage):
+    held = make_usage(cart_id='cart-a', cart_position_id=10)
+
+    # La position 10 a été retirée du panier
+    usage = SortirUsage.claim_for_cart_position(event, 'cart-a', position_id=11, live_position_ids=[11])
+
+    assert usage.pk == held.pk
+    assert reload(held).cart_position_id == 11
+
+
+@pytest.mark.django_db
+def test_claim_ignores_usage_already_in_an_order(event, make_order, make_usage):
+    make_usage(cart_id='cart-a', order=make_order(), status='validated')
+
+    assert SortirUsage.claim_for_cart_position(event, 'cart-a', position_id=10, live_position_ids=[10]) is None
+
+
+@pytest.mark.django_db
+def test_validate_cart_attaches_usage_to_position(event, make_usage, make_cart_position):
+    usage = make_usage(cart_id='cart-a')
+    position = make_cart_position('cart-a')
+
+    check_sortir_required(sender=event, positions=[position])
+
+    assert json.loads(position.meta_info)['sortir_usage_id'] == usage.pk
+    assert reload(usage).cart_position_id == position.pk
+
+
+@pytest.mark.django_db
+def test_validate_cart_is_idempotent(event, make_usage, make_cart_position):
+    first = make_usage(card='1111111111', cart_id='cart-a')
+    make_usage(card='2222222222', cart_id='cart-a')
+    position = make_cart_position('cart-a')
+
+    check_sortir_required(sender=event, positions=[position])
+    check_sortir_required(sender=event, positions=[position])
+
+    # La position garde sa réservation, la seconde reste libre
+    assert json.loads(position.meta_info)['sortir_usage_id'] == first.pk
+    assert SortirUsage.objects.filter(cart_id='cart-a', cart_position_id__isnull=True).count() == 1
+
+
+@pytest.mark.django_db
+def test_validate_cart_second_cart_gets_nothing(event, make_usage, make_cart_position):
+    usage = make_usage(cart_id='cart-a')
+    other = make_cart_position('cart-b')
+
+    check_sortir_required(sender=event, positions=[other])
+
+    assert 'sortir_usage_id' not in json.loads(other.meta_info or '{}')
+    assert reload(usage).cart_position_id is None
+
+
+@pytest.mark.django_db
+def test_validate_cart_two_positions_need_two_usages(event, make_usage, make_cart_position):
+    make_usage(cart_id='cart-a')
+    first, second = make_cart_position('cart-a'), make_cart_position('cart-a')
+
+    check_sortir_required(sender=event, positions=[first, second])
+
+    assert 'sortir_usage_id' in json.loads(first.meta_info)
+    assert 'sortir_usage_id' not in json.loads(second.meta_info or '{}')
+
+
+@pytest.mark.django_db
+def test_order_placed_links_claimed_usage(event, org_settings, make_order, make_usage, make_order_position):
+    usage = make_usage(cart_id='cart-a', cart_position_id=10)
+    order = make_order()
+    make_order_position(order, usage_id=usage.pk)
+
+    final_sortir_verification(sender=event, order=order)
+
+    usage = reload(usage)
+    assert usage.order_id == order.pk
+    assert usage.status == 'validated'
+
+
+@pytest.mark.django_db
+def test_order_placed_without_usage_is_refused(event, org_settings, make_order, make_order_position):
+    order = make_order()
+    make_order_position(order)
+
+    with pytest.raises(ValidationError):
+        final_sortir_verification(sender=event, order=order)
+
+
+@pytest.mark.django_db
+def test_second_order_cannot_take_claimed_usage(event, org_settings, make_order, make_usage, make_order_position):
+    usage = make_usage(cart_id='cart-a', cart_position_id=10)
+    first = make_order(code='FIRST')
+    make_order_position(first, usage_id=usage.pk)
+    final_sortir_verification(sender=event, order=first)
+
+    second = make_order(code='SECND')
+    make_order_position(second, usage_id=usage.pk)
+
+    with pytest.raises(ValidationError):
+        final_sortir_verification(sender=event, order=second)
+    assert reload(usage).order_id == first.pk
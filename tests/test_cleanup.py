@@ -0,0 +1,82 @@
+"""
+Purge RGPD des SortirUsage (sortir_cleanup.Command.expired_usages)
+"""
+
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+from django_scopes import scopes_disabled
+
+from pretix_sortir.management.commands.sortir_cleanup import Command
+
+
+def expired_ids(days=90):
+    with scopes_disabled():
+        return set(Command().expired_usages(days).values_list('pk', flat=True))
+
+
+def move_event(event, **dates):
+    with scopes_disabled():
+        for name, value in dates.items():
+            setattr(event, name, value)
+        event.save()
+
+
+@pytest.mark.django_db
+def test_finished_event_is_purged(event, org_settings, make_usage):
+    move_event(event, date_from=timezone.now() - timedelta(days=120))
+    usage = make_usage(status='used')
+
+    assert expired_ids() == {usage.pk}
+
+
+@pytest.mark.django_db
+def test_recent_event_is_kept(event, org_settings, make_usage):
+    move_event(event, date_from=timezone.now() - timedelta(days=30))
+    make_usage(status='used')
+
+    assert expired_ids() == set()
+
+
+@pytest.mark.django_db
+def test_unsent_grant_is_kept(event, org_settings, make_usage):
+    move_event(event, date_from=timezone.now() - timedelta(days=120))
+    make_usage(status='validated')
+
+    assert expired_ids() == set()
+
+
+@pytest.mark.django_db
+def test_series_with_mixed_subevents_is_kept(event, org_settings, make_usage):
+    from pretix.base.models import SubEvent
+
+    now = timezone.now()
+    move_event(event, has_subevents=True, date_from=now - timedelta(days=200), date_to=None)
+    with scopes_disabled():
+        # Première date terminée (avec date_to), dernière date récente sans date_to
+        SubEvent.objects.create(
+            event=event, name='Date 1', active=True,
+            date_from=now - timedelta(days=200), date_to=now - timedelta(days=199),
+        )
+        SubEvent.objects.create(event=event, name='Date 2', active=True, date_from=now - timedelta(days=10))
+    make_usage(status='used')
+
+    assert expired_ids() == set()
+
+
+@pytest.mark.django_db
+def test_finished_series_is_purged(event, org_settings, make_usage):
+    from pretix.base.models import SubEvent
+
+    now = timezone.now()
+    move_event(event, has_subevents=True, date_from=now - timedelta(days=200), date_to=None)
+    with scopes_disabled():
+        SubEvent.objects.create(event=event, name='Date 1', active=True, date_from=now - timedelta(days=200))
+        SubEvent.objects.create(
+            event=event, name='Date 2', active=True,
+            date_from=now - timedelta(days=150), date_to=now - timedelta(days=149),
+        )
+    usage = make_usage(status='used')
+
+    assert expired_ids() == {usage.pk}
@@ -0,0 +1,70 @@
+"""
+Rotation des clés de chiffrement des tokens API (fields.py, sortir_reencrypt)
+"""
+
+import pytest
+from cryptography.fernet import Fernet, InvalidToken
+
+from pretix_sortir import fields
+from pretix_sortir.fields import EncryptedValue, EncryptionKeyring
+
+
+@pytest.fixture
+def key_file(tmp_path, settings, monkeypatch):
+    """Clés lues depuis le fichier du datadir (ni variable d'environnement, ni setting)"""
+    monkeypatch.delenv('SORTIR_ENCRYPTION_KEY', raising=False)
+    settings.SORTIR_ENCRYPTION_KEY = None
+    settings.DATA_DIR = str(tmp_path)
+    fields.reset_keyring()
+    yield tmp_path / '.sortir_encryption_key'
+    fields.reset_keyring()
+
+
+def test_keyring_without_new_key_fails_loudly():
+    key_a, key_b = Fernet.generate_key(), Fernet.generate_key()
+    token = EncryptionKeyring([key_a]).encrypt('secret')
+
+    rotated = EncryptionKeyring([key_b, key_a]).rotate(token)
+
+    # Un processus qui n'a que l'ancienne clé ne doit pas obtenir une valeur vide
+    with pytest.raises(InvalidToken):
+        EncryptionKeyring([key_a]).decrypt(rotated)
+
+
+def test_rotate_only_adds_key(key_file):
+    key_a = Fernet.generate_key()
+    key_file.write_bytes(key_a + b'\n')
+
+    assert fields.add_encryption_key() == 2
+
+    keys = fields.load_encryption_keys()
+    assert len(keys) == 2 and keys[1] == key_a
+
+
+def test_stale_keyring_reloads_key_file(key_file):
+    key_a = Fernet.generate_key()
+    key_file.write_bytes(key_a + b'\n')
+    token_a = fields.get_keyring().encrypt('secret')
+    stale = fields.get_keyring()
+
+    # Rotation faite par un autre processus : ce processus garde son trousseau [A]
+    key_b = Fernet.generate_key()
+    key_file.write_bytes(key_b + b'\n' + key_a + b'\n')
+    rotated = EncryptionKeyring([key_b, key_a]).rotate(token_a)
+    assert fields.get_keyring() is stale
+
+    assert EncryptedValue(rotated).decrypt() == 'secret'
+    assert fields.get_keyring() is not stale
+
+
+def test_reencrypt_with_rotate_does_not_reencrypt(key_file, monkeypatch):
+    from django.core.management import call_command
+
+    from pretix_sortir.management.commands.sortir_reencrypt import Command
+
+    key_file.write_bytes(Fernet.generate_key() + b'\n')
+    monkeypatch.setattr(Command, 'reencrypted_value', lambda *args: pytest.fail('rechiffrement avec --rotate'))
+
+    call_command('sortir_reencrypt', rotate=True)
+
+    assert len(fields.load_encryption_keys()) == 2
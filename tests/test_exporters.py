@@ -0,0 +1,101 @@
+"""
+Exports CSV / JSON Lines des utilisations et du journal d'audit (exporters.py, sortir_export)
+"""
+
+import csv
+import io
+import json
+from datetime import timedelta
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+from django_scopes import scopes_disabled
+
+from pretix_sortir.exporters import (
+    AUDIT_FIELDS, AUDIT_RELATED, USAGE_FIELDS, audit_queryset, usage_queryset, write_export,
+)
+from pretix_sortir.models import SortirAuditLog, SortirUsage
+
+
+def export(queryset, fields, fmt, related=None, chunk_size=2):
+    fp = io.StringIO()
+    with scopes_disabled():
+        count = write_export(queryset, fields, fmt, fp, chunk_size=chunk_size, related=related)
+    return count, fp.getvalue()
+
+
+@pytest.mark.django_db
+def test_usage_csv_export(event, make_order, make_usage):
+    order = make_order(code='ABC12')
+    make_usage(card='1111111111', order=order, status='validated')
+    make_usage(card='2222222222', status='pending')
+
+    count, content = export(usage_queryset(), USAGE_FIELDS, 'csv')
+
+    rows = list(csv.DictReader(io.StringIO(content)))
+    assert count == 2
+    assert [row['card_suffix'] for row in rows] == ['1111', '2222']
+    assert rows[0]['order'] == 'ABC12' and rows[0]['event'] == 'concert'
+    assert rows[0]['status'] == 'validated'
+    # Jamais le hash ni la clé de service
+    assert 'sortir_number_hash' not in content and 'service_key' not in rows[0]
+
+
+@pytest.mark.django_db
+def test_usage_jsonl_export_filters(event, make_usage):
+    make_usage(card='1111111111', status='used')
+    old = make_usage(card='2222222222', status='used')
+    make_usage(card='3333333333', status='cancelled')
+    SortirUsage.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=10))
+
+    queryset = usage_queryset(date_from=(timezone.now() - timedelta(days=1)).date(), status='used')
+    count, content = export(queryset, USAGE_FIELDS, 'jsonl')
+
+    lines = [json.loads(line) for line in content.splitlines()]
+    assert count == 1
+    assert lines[0]['card_suffix'] == '1111'
+
+
+@pytest.mark.django_db
+def test_audit_export_resolves_related_labels(event, make_order):
+    order = make_order(code='ABC12')
+    SortirAuditLog.log(action='usage_recorded', event=event, organizer=event.organizer, order=order,
+                       message='enregistrée', usage=1)
+    SortirAuditLog.log(action='config_changed', organizer=event.organizer, message='config')
+
+    with scopes_disabled():
+        events = event.organizer.events.filter(pk=event.pk)
+    count, content = export(
+        audit_queryset(events=events, organizer=event.organizer), AUDIT_FIELDS, 'jsonl', related=AUDIT_RELATED
+    )
+
+    lines = [json.loads(line) for line in content.splitlines()]
+    assert count == 2
+    assert (lines[0]['organizer'], lines[0]['event'], lines[0]['order']) == ('orga', 'concert', 'ABC12')
+    assert lines[0]['details'] == {'usage': 1}
+    # Entrée de niveau organisateur incluse avec l'export des événements
+    assert lines[1]['event'] is None and lines[1]['organizer'] == 'orga'
+
+
+@pytest.mark.django_db
+def test_export_command_rejects_unknown_status(event):
+    with pytest.raises(CommandError):
+        call_command('sortir_export', 'usages', '--status=inconnu')
+
+
+@pytest.mark.django_db
+def test_export_command_rejects_unknown_severity(event):
+    with pytest.raises(CommandError):
+        call_command('sortir_export', 'audit', '--severity=inconnue')
+
+
+@pytest.mark.django_db
+def test_export_command_writes_file(event, make_usage, tmp_path):
+    make_usage(status='used')
+    output = tmp_path / 'usages.jsonl'
+
+    call_command('sortir_export', 'usages', organizer='orga', event='concert', format='jsonl',
+                 status='used', output=str(output))
+
+    assert json.loads(output.read_text(encoding='utf-8'))['card_suffix'] == '6789'
@@ -0,0 +1,132 @@
+"""
+Échantillonnage et limitation de débit des logs répétitifs (logging_filters.LogRateLimitFilter)
+"""
+
+import logging
+from contextlib import contextmanager
+
+import pytest
+
+from pretix_sortir.logevents import EventMessage
+from pretix_sortir.logging_filters import LogRateLimitFilter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@contextmanager
+def captured_summaries():
+    """
+    Résumés logs_suppressed émis sur le logger de test.
+
+    Configuré dans le corps du test : pytest ajoute son handler de capture aux loggers
+    sans propagation qui existent au début de chaque phase (setup, call).
+    """
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logger = logging.getLogger('tests.sortir.ratelimit')
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    try:
+        yield records
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(logging.NOTSET)
+        logger.propagate = True
+
+
+def record(msg='cart_validation', level=logging.INFO, event=None):
+    extra = {'sortir_event': event} if event is not None else None
+    logger = logging.getLogger('tests.sortir.ratelimit')
+    return logger.makeRecord(logger.name, level, __file__, 1, msg, (), None, extra=extra)
+
+
+def kept(log_filter, count, **kwargs):
+    return [log_filter.filter(record(**kwargs)) for _ in range(count)]
+
+
+def test_rate_per_window(clock):
+    log_filter = LogRateLimitFilter(limits={'cart_validation': {'rate': 2}}, clock=clock)
+
+    assert kept(log_filter, 5) == [True, True, False, False, False]
+
+
+def test_sampling(clock):
+    log_filter = LogRateLimitFilter(limits={'cart_validation': {'sample': 0.5}}, clock=clock)
+
+    assert kept(log_filter, 5) == [True, False, True, False, True]
+
+
+def test_default_limit_spares_warnings(clock):
+    log_filter = LogRateLimitFilter(limits={'default': {'rate': 1}}, clock=clock)
+
+    assert kept(log_filter, 3, msg='autre') == [True, False, False]
+    assert kept(log_filter, 3, msg='autre', level=logging.WARNING) == [True, True, True]
+
+
+def test_configured_key_limits_warnings(clock):
+    log_filter = LogRateLimitFilter(limits={'grant_failed': {'rate': 1}}, clock=clock)
+
+    assert kept(log_filter, 2, msg='grant_failed', level=logging.ERROR) == [True, False]
+
+
+def test_key_is_event_name(clock):
+    log_filter = LogRateLimitFilter(limits={'card_validated': {'rate': 1}}, clock=clock)
+
+    first = record(msg='texte 1', event=EventMessage('card_validated', {'card': '1'}))
+    second = record(msg='texte 2', event=EventMessage('card_validated', {'card': '2'}))
+
+    assert [log_filter.filter(first), log_filter.filter(second)] == [True, False]
+
+
+def test_new_window_emits_summary(clock):
+    log_filter = LogRateLimitFilter(limits={'cart_validation': {'rate': 1}}, window=60, clock=clock)
+    with captured_summaries() as summaries:
+        kept(log_filter, 3)
+        log_filter.filter(record(level=logging.WARNING))
+
+        clock.now += 60
+        assert log_filter.filter(record()) is True
+
+    assert len(summaries) == 1
+    summary = summaries[0]
+    assert summary.levelno == logging.WARNING
+    assert summary.sortir_event.as_dict() == {
+        'event_name': 'logs_suppressed', 'key': 'cart_validation', 'suppressed': 3, 'window_seconds': 60,
+    }
+    # Le résumé n'est pas lui-même limité
+    assert log_filter.filter(summary) is True
+
+
+def test_sweep_summarises_keys_that_stop(clock):
+    log_filter = LogRateLimitFilter(limits={'cart_validation': {'rate': 1}, 'default': {'rate': 10}}, clock=clock)
+    with captured_summaries() as summaries:
+        kept(log_filter, 2)
+
+        clock.now += 60
+        log_filter.filter(record(msg='autre'))
+
+    assert [summary.sortir_event.fields['key'] for summary in summaries] == ['cart_validation']
+
+
+def test_no_summary_without_suppressed_messages(clock):
+    log_filter = LogRateLimitFilter(limits={'cart_validation': {'rate': 5}}, clock=clock)
+    with captured_summaries() as summaries:
+        kept(log_filter, 2)
+
+        clock.now += 60
+        log_filter.filter(record())
+
+    assert summaries == []
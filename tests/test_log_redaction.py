@@ -0,0 +1,78 @@
+"""
+Masquage des données sensibles dans les logs (logging_filters.redact, SensitiveDataFilter)
+"""
+
+import logging
+from contextlib import contextmanager
+
+import pytest
+
+from pretix_sortir.logging_filters import SensitiveDataFilter, redact
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('Carte 1234567890 refusée', 'Carte ******7890 refusée'),
+    ('carte=123456789012', 'carte=********9012'),
+    ('token=abc123def456ghi789', 'token=abc123def4**********'),
+    ('api_key: short', 'api_key: *****'),
+    ('Authorization: Bearer abcdefghijklmnop', 'Authorization: Bearer abcdefghij**********'),
+    ('clé: abcdefghijkl', 'clé: abcdefghij**********'),
+    ('token=abc, carte 0123456789', 'token=***, carte ******6789'),
+])
+def test_redact(text, expected):
+    assert redact(text) == expected
+
+
+@pytest.mark.parametrize('text', [
+    'Commande ABC12 payée',
+    'Numéro trop court : 123456789',
+    'Référence X1234567890Y',
+])
+def test_redact_leaves_other_text(text):
+    assert redact(text) == text
+
+
+@contextmanager
+def isolated_logger(level=logging.WARNING):
+    """
+    Logger sans propagation avec un seul handler au niveau `level`.
+
+    Configuré dans le corps du test : pytest ajoute son handler de capture aux loggers
+    sans propagation qui existent au début de chaque phase (setup, call).
+    """
+    logger = logging.getLogger('tests.sortir.redaction')
+    handler = logging.NullHandler()
+    handler.setLevel(level)
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        yield logger
+    finally:
+        logger.removeHandler(handler)
+        logger.propagate = True
+
+
+def make_record(logger, level, msg, args=()):
+    return logger.makeRecord(logger.name, level, __file__, 1, msg, args, None)
+
+
+def test_filter_redacts_message_and_args():
+    with isolated_logger() as logger:
+        record = make_record(logger, logging.WARNING, 'Carte %s (%s)', ('1234567890', 'token=abcdefghijklmnop'))
+        assert SensitiveDataFilter().filter(record) is True
+    assert record.getMessage() == 'Carte ******7890 (token=abcdefghij**********)'
+
+
+def test_filter_redacts_dict_args():
+    with isolated_logger() as logger:
+        record = make_record(logger, logging.ERROR, 'Carte %(card)s', ({'card': '1234567890', 'n': 3},))
+        SensitiveDataFilter().filter(record)
+
+    assert record.args == {'card': '******7890', 'n': 3}
+
+
+def test_filter_skips_records_no_handler_emits():
+    with isolated_logger(logging.WARNING) as logger:
+        record = make_record(logger, logging.INFO, 'Carte 1234567890')
+        assert SensitiveDataFilter().filter(record) is True
+    assert record.msg == 'Carte 1234567890'
@@ -0,0 +1,83 @@
+"""
+Libération des numéros à l'annulation/expiration et rétablissement après paiement tardif
+"""
+
+import pytest
+from django_scopes import scopes_disabled
+from pretix.base.models import Order
+
+from pretix_sortir.signals import order_paid_handler, release_order_usages
+
+
+def status_of(usage):
+    with scopes_disabled():
+        usage.refresh_from_db()
+    return usage.status
+
+
+@pytest.fixture
+def grants_enqueued(monkeypatch):
+    from pretix_sortir.tasks import send_order_grants
+
+    calls = []
+    monkeypatch.setattr(send_order_grants, 'apply_async', lambda **kwargs: calls.append(kwargs['kwargs']))
+    return calls
+
+
+@pytest.mark.django_db
+def test_cancel_releases_usages(event, org_settings, make_order, make_usage):
+    order = make_order(status=Order.STATUS_CANCELED)
+    usage = make_usage(order=order, status='validated')
+
+    release_order_usages(sender=event, order=order)
+
+    assert status_of(usage) == 'cancelled'
+
+
+@pytest.mark.django_db
+def test_release_disabled_keeps_usages(event, org_settings, make_order, make_usage):
+    org_settings.release_on_cancel = False
+    org_settings.save()
+    order = make_order(status=Order.STATUS_CANCELED)
+    usage = make_usage(order=order, status='validated')
+
+    release_order_usages(sender=event, order=order)
+
+    assert status_of(usage) == 'validated'
+
+
+@pytest.mark.django_db
+def test_expired_then_paid_restores_usages_and_sends_grant(
+    event, org_settings, make_order, make_usage, grants_enqueued, django_capture_on_commit_callbacks
+):
+    order = make_order(status=Order.STATUS_EXPIRED)
+    usage = make_usage(order=order, status='validated')
+
+    release_order_usages(sender=event, order=order)
+    assert status_of(usage) == 'expired'
+
+    order.status = Order.STATUS_PAID
+    with django_capture_on_commit_callbacks(execute=True):
+        order_paid_handler(sender=event, order=order)
+
+    assert status_of(usage) == 'validated'
+    assert grants_enqueued == [{'event': event.pk, 'order': order.pk}]
+
+
+@pytest.mark.django_db
+def test_expired_then_paid_keeps_card_reused_meanwhile(
+    event, org_settings, make_order, make_usage, grants_enqueued, django_capture_on_commit_callbacks
+):
+    order = make_order(status=Order.STATUS_EXPIRED)
+    usage = make_usage(order=order, status='validated')
+    release_order_usages(sender=event, order=order)
+
+    # La carte libérée est reprise par une autre commande
+    other = make_usage(order=make_order(code='XYZ99'), status='validated')
+
+    order.status = Order.STATUS_PAID
+    with django_capture_on_commit_callbacks(execute=True):
+        order_paid_handler(sender=event, order=order)
+
+    assert status_of(usage) == 'expired'
+    assert status_of(other) == 'validated'
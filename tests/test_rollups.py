@@ -0,0 +1,123 @@
+"""
+Statistiques journalières depuis le journal d'audit (rollups.update_daily_stats)
+"""
+
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+from django_scopes import scopes_disabled
+
+from pretix_sortir.models import SortirAuditLog, SortirDailyStats, SortirRollupState
+from pretix_sortir.rollups import ROLLUP_NAME, update_daily_stats
+
+
+def log(event, action='card_validation_success', days_ago=0, **kwargs):
+    entry = SortirAuditLog.log(action=action, event=event, organizer=event.organizer, **kwargs)
+    if days_ago:
+        SortirAuditLog.objects.filter(pk=entry.pk).update(timestamp=timezone.now() - timedelta(days=days_ago))
+    return entry
+
+
+def counters(event=None, organizer=None, days_ago=0):
+    day = timezone.localdate() - timedelta(days=days_ago)
+    with scopes_disabled():
+        if event is not None:
+            row = SortirDailyStats.objects.filter(event=event, date=day).first()
+        else:
+            row = SortirDailyStats.objects.filter(organizer=organizer, event__isnull=True, date=day).first()
+    if row is None:
+        return {}
+    return {counter: getattr(row, counter) for counter in SortirDailyStats.COUNTERS if getattr(row, counter)}
+
+
+@pytest.mark.django_db
+def test_event_and_organizer_rows(event):
+    log(event)
+    log(event)
+    log(event, action='grant_failed')
+    log(event, action='config_changed')
+
+    update_daily_stats()
+
+    assert counters(event=event) == {'validations': 2, 'grant_failures': 1}
+    assert counters(organizer=event.organizer) == {'validations': 2, 'grant_failures': 1}
+
+
+@pytest.mark.django_db
+def test_rerun_does_not_count_twice(event):
+    log(event)
+    update_daily_stats()
+    log(event)
+
+    update_daily_stats()
+    update_daily_stats()
+
+    assert counters(event=event) == {'validations': 2}
+
+
+@pytest.mark.django_db
+def test_entry_committed_late_with_lower_pk_is_counted(event):
+    # Une transaction longue valide son entrée après une entrée de clé primaire supérieure
+    late = log(event, action='grant_success')
+    log(event)
+    late_values = {field.attname: getattr(late, field.attname) for field in SortirAuditLog._meta.concrete_fields}
+    late.delete()
+
+    update_daily_stats()
+    SortirAuditLog.objects.create(**late_values)
+    update_daily_stats()
+
+    assert counters(event=event) == {'validations': 1, 'grants': 1}
+
+
+@pytest.mark.django_db
+def test_older_days_are_closed(event):
+    log(event, days_ago=5)
+    log(event, days_ago=1)
+
+    update_daily_stats()
+
+    assert counters(event=event, days_ago=5) == {'validations': 1}
+    assert counters(event=event, days_ago=1) == {'validations': 1}
+    state = SortirRollupState.objects.get(name=ROLLUP_NAME)
+    assert state.last_date == timezone.localdate() - timedelta(days=2)
+
+
+@pytest.mark.django_db
+def test_closed_days_are_not_recomputed(event):
+    log(event, days_ago=5)
+    update_daily_stats()
+
+    # Entrée d'un jour déjà clos : hors fenêtre de recalcul
+    log(event, days_ago=5)
+    update_daily_stats()
+
+    assert counters(event=event, days_ago=5) == {'validations': 1}
+
+
+@pytest.mark.django_db
+def test_backlog_is_closed_in_steps(event):
+    log(event, days_ago=10)
+
+    assert update_daily_stats(max_days=3) == 3 + 2
+    state = SortirRollupState.objects.get(name=ROLLUP_NAME)
+    assert state.last_date == timezone.localdate() - timedelta(days=8)
+    assert counters(event=event, days_ago=10) == {'validations': 1}
+
+
+@pytest.mark.django_db
+def test_deleted_event_only_counts_for_organizer(event, organizer):
+    from pretix.base.models import Event
+
+    with scopes_disabled():
+        other = Event.objects.create(organizer=organizer, name='Autre', slug='autre', date_from=timezone.now())
+    log(other)
+    log(event)
+    with scopes_disabled():
+        other.delete()
+
+    update_daily_stats()
+
+    assert counters(event=event) == {'validations': 1}
+    assert counters(organizer=organizer) == {'validations': 2}
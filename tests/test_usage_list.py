@@ -0,0 +1,97 @@
+"""
+Historique des utilisations : pagination par curseur et recherche (SortirUsageListView)
+"""
+
+from datetime import timedelta
+
+import pytest
+from django.test import RequestFactory
+from django.utils import timezone
+from django_scopes import scopes_disabled
+
+from pretix_sortir.models import SortirUsage
+from pretix_sortir.views import SortirUsageListView
+
+
+@pytest.fixture
+def usages(event, make_usage):
+    """7 utilisations, dont deux paires créées au même instant (départage par id)"""
+    base = timezone.now() - timedelta(hours=1)
+    offsets = [0, 1, 1, 2, 3, 3, 4]
+    created = []
+    for index, offset in enumerate(offsets):
+        usage = make_usage(card=f'{index:010d}', status='used')
+        SortirUsage.objects.filter(pk=usage.pk).update(created_at=base + timedelta(minutes=offset))
+        created.append(usage.pk)
+    # Ordre attendu : plus récent d'abord, id décroissant à instant égal
+    return sorted(created, key=lambda pk: (offsets[created.index(pk)], pk), reverse=True)
+
+
+def list_page(event, **params):
+    view = SortirUsageListView()
+    view.page_size = 3
+    view.request = RequestFactory().get('/', params)
+    view.request.event = event
+    view.kwargs = {}
+    with scopes_disabled():
+        rows = view.get_queryset()
+        return [usage.pk for usage in rows], view.get_pagination(rows)
+
+
+def cursor(url, key):
+    from urllib.parse import parse_qs
+
+    return parse_qs(url.lstrip('?'))[key][0]
+
+
+@pytest.mark.django_db
+def test_pages_forward_cover_every_row_once(event, usages):
+    seen = []
+    params = {}
+    while True:
+        pks, pagination = list_page(event, **params)
+        seen += pks
+        if not pagination['next_url']:
+            break
+        params = {'after': cursor(pagination['next_url'], 'after')}
+
+    assert seen == usages
+
+
+@pytest.mark.django_db
+def test_first_page_has_no_previous(event, usages):
+    pks, pagination = list_page(event)
+
+    assert pks == usages[:3]
+    assert pagination['previous_url'] is None
+    assert pagination['next_url'] is not None
+
+
+@pytest.mark.django_db
+def test_previous_page_returns_same_rows(event, usages):
+    _pks, first = list_page(event)
+    second_pks, second = list_page(event, after=cursor(first['next_url'], 'after'))
+
+    back_pks, back = list_page(event, before=cursor(second['previous_url'], 'before'))
+
+    assert second_pks == usages[3:6]
+    assert back_pks == usages[:3]
+    assert back['previous_url'] is None
+
+
+@pytest.mark.django_db
+def test_invalid_cursor_falls_back_to_first_page(event, usages):
+    pks, _pagination = list_page(event, after='pas-un-curseur')
+
+    assert pks == usages[:3]
+
+
+@pytest.mark.django_db
+def test_search_by_order_code_and_suffix(event, make_order, make_usage):
+    order = make_order(code='ABC12')
+    by_order = make_usage(card='1111111111', order=order, status='validated')
+    by_suffix = make_usage(card='2222223456', status='used')
+
+    assert list_page(event, search='abc12')[0] == [by_order.pk]
+    assert list_page(event, search='3456')[0] == [by_suffix.pk]
+    assert list_page(event, search='ZZZ99')[0] == []